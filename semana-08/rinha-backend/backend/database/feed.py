@@ -0,0 +1,11 @@
+"""Configuração do feed de transações, compartilhada pelo trigger (`database.schema`) e pelo LISTEN.
+
+Fica num módulo à parte para a aplicação não importar `database.schema` (DDL do SQLAlchemy e
+partições) na subida: o schema é do `migrate.py`.
+"""
+import os
+
+# Feed de mudanças (`GET /transactions/stream`): cada escrita em `transaction` vira um NOTIFY.
+# Desligado por padrão, porque o NOTIFY serializa os commits num lock global do Postgres
+TRANSACTION_FEED = os.environ.get("TRANSACTION_FEED", "false").lower() in ("1", "true", "yes")
+FEED_CHANNEL = "transaction_feed"
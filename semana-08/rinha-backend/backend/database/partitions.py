@@ -0,0 +1,287 @@
+"""Particionamento opcional de `transaction` por faixa de `timestamp`, com retenção por partição.
+
+Com `TRANSACTION_PARTITIONING=true` o `migrate.py` converte a tabela em particionada (uma
+partição por dia, semana ou mês, mais a partição default para timestamps fora das faixas) e a
+manutenção periódica cria as próximas partições e aplica a retenção: partições inteiras mais
+antigas que `TRANSACTION_RETENTION_DAYS` são removidas (`drop`) ou desanexadas e movidas para o
+schema `TRANSACTION_ARCHIVE_SCHEMA` (`archive`), sem DELETE linha a linha.
+
+Remover partição não dispara os triggers: o saldo de `balance` continua o mesmo e o resumo
+dos relatórios (`transaction_summary`) mantém os totais dos períodos removidos.
+"""
+import asyncio
+import logging
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from typing import List, NamedTuple, Optional
+
+from database.postgres import database
+
+TRANSACTION_PARTITIONING = os.environ.get("TRANSACTION_PARTITIONING", "false").lower() in ("1", "true", "yes")
+# Tamanho de cada partição: day, week ou month
+TRANSACTION_PARTITION_INTERVAL = os.environ.get("TRANSACTION_PARTITION_INTERVAL", "month")
+# Partições criadas à frente do período corrente
+TRANSACTION_PARTITIONS_AHEAD = int(os.environ.get("TRANSACTION_PARTITIONS_AHEAD", "3"))
+# 0 guarda tudo; senão, partições que terminam antes de now() - N dias saem pela política abaixo
+TRANSACTION_RETENTION_DAYS = int(os.environ.get("TRANSACTION_RETENTION_DAYS", "0"))
+TRANSACTION_RETENTION_MODE = os.environ.get("TRANSACTION_RETENTION_MODE", "drop")
+TRANSACTION_ARCHIVE_SCHEMA = os.environ.get("TRANSACTION_ARCHIVE_SCHEMA", "transaction_archive")
+# A primeira manutenção fica com o migrate.py; a aplicação repete a cada intervalo
+TRANSACTION_PARTITION_MAINTENANCE_INTERVAL = float(os.environ.get("TRANSACTION_PARTITION_MAINTENANCE_INTERVAL", "3600"))
+
+INTERVALS = ("day", "week", "month")
+RETENTION_MODES = ("drop", "archive")
+# Chave do advisory lock que deixa só uma réplica fazer a manutenção de cada vez
+PARTITION_LOCK_KEY = 7_202_409
+DEFAULT_PARTITION = "transaction_default"
+
+assert TRANSACTION_PARTITION_INTERVAL in INTERVALS, f"TRANSACTION_PARTITION_INTERVAL must be one of {INTERVALS}"
+assert TRANSACTION_RETENTION_MODE in RETENTION_MODES, f"TRANSACTION_RETENTION_MODE must be one of {RETENTION_MODES}"
+
+logger = logging.getLogger("uvicorn.error")
+
+IS_PARTITIONED = "SELECT relkind = 'p' FROM pg_class WHERE oid = 'transaction'::regclass"
+
+LIST_PARTITIONS = """
+SELECT c.relname AS name, pg_get_expr(c.relpartbound, c.oid) AS bound, c.reltuples::bigint AS rows
+FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'transaction'::regclass
+ORDER BY c.relname
+"""
+
+# Conversão da tabela comum: as colunas, defaults (inclusive o nextval do id) e NOT NULL vêm do
+# LIKE; a chave primária precisa incluir a chave de particionamento
+CREATE_PARTITIONED = """
+CREATE TABLE transaction (LIKE transaction_unpartitioned INCLUDING DEFAULTS, PRIMARY KEY (id, "timestamp"))
+PARTITION BY RANGE ("timestamp")
+"""
+FOREIGN_KEYS = """
+SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint
+WHERE conrelid = 'transaction_unpartitioned'::regclass AND contype = 'f'
+"""
+DATA_RANGE = 'SELECT min("timestamp"), max("timestamp") FROM transaction_unpartitioned'
+
+_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+class Partition(NamedTuple):
+    name: str
+    start: Optional[datetime]
+    end: Optional[datetime]
+    rows: int
+
+
+def period_start(moment: datetime, interval: str) -> datetime:
+    """Início (UTC, meia-noite) do período que contém `moment`."""
+    moment = moment.astimezone(timezone.utc)
+    day = datetime(moment.year, moment.month, moment.day, tzinfo=timezone.utc)
+    if interval == "day":
+        return day
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def next_period(start: datetime, interval: str) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=1)
+    if interval == "week":
+        return start + timedelta(weeks=1)
+    return start.replace(year=start.year + start.month // 12, month=start.month % 12 + 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"transaction_p{start:%Y%m%d}"
+
+
+def periods(first: datetime, last: datetime, interval: str) -> List[datetime]:
+    """Inícios dos períodos que cobrem de `first` até `last`, inclusive."""
+    start = period_start(first, interval)
+    starts = []
+    while start <= last:
+        starts.append(start)
+        start = next_period(start, interval)
+    return starts
+
+
+def _parse_bound(bound: str):
+    match = _BOUND.search(bound or "")
+    if match is None:  # partição default
+        return None, None
+    return tuple(datetime.fromisoformat(value).astimezone(timezone.utc) for value in match.groups())
+
+
+async def is_partitioned(connection) -> bool:
+    return bool(await connection.fetchval(IS_PARTITIONED))
+
+
+async def list_partitions(connection) -> List[Partition]:
+    partitions = []
+    for row in await connection.fetch(LIST_PARTITIONS):
+        start, end = _parse_bound(row["bound"])
+        partitions.append(Partition(row["name"], start, end, max(row["rows"], 0)))
+    return partitions
+
+
+async def create_partition(connection, start: datetime, interval: str) -> bool:
+    """Cria a partição do período que começa em `start`; devolve False se ela já existia."""
+    name = partition_name(start)
+    exists = await connection.fetchval("SELECT to_regclass($1) IS NOT NULL", name)
+    if exists:
+        return False
+    end = next_period(start, interval)
+    # DDL não aceita parâmetros: os limites saem de datetimes gerados aqui, nunca da requisição
+    await connection.execute(
+        f"CREATE TABLE {name} PARTITION OF transaction FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+    return True
+
+
+async def convert_to_partitioned(connection, interval: str = TRANSACTION_PARTITION_INTERVAL, ahead: int = TRANSACTION_PARTITIONS_AHEAD) -> None:
+    """Troca a `transaction` comum por uma particionada com os mesmos dados.
+
+    Roda dentro da transação do `create_schema`, antes dos índices e do ledger: os índices do
+    metadata são recriados na tabela nova (e propagados às partições) e os triggers do ledger e
+    do resumo são reinstalados, com o backfill recalculando os dois a partir das mesmas linhas.
+    """
+    await connection.execute("ALTER TABLE transaction RENAME TO transaction_unpartitioned")
+    await connection.execute(CREATE_PARTITIONED)
+    # A sequência do id pertence à tabela antiga e sumiria com ela
+    sequence = await connection.fetchval("SELECT pg_get_serial_sequence('transaction_unpartitioned', 'id')")
+    if sequence is not None:
+        await connection.execute(f"ALTER SEQUENCE {sequence} OWNED BY transaction.id")
+
+    now = datetime.now(timezone.utc)
+    first, last = await connection.fetchrow(DATA_RANGE)
+    first = min(first or now, now)
+    last = max(last or now, now)
+    for start in periods(first, _ahead(last, interval, ahead), interval):
+        await create_partition(connection, start, interval)
+    await connection.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF transaction DEFAULT")
+
+    foreign_keys = await connection.fetch(FOREIGN_KEYS)
+    await connection.execute("INSERT INTO transaction SELECT * FROM transaction_unpartitioned")
+    await connection.execute("DROP TABLE transaction_unpartitioned")
+    for name, definition in foreign_keys:
+        await connection.execute(f'ALTER TABLE transaction ADD CONSTRAINT "{name}" {definition}')
+    logger.info("transaction converted to a partitioned table (%s partitions)", interval)
+
+
+def _ahead(moment: datetime, interval: str, ahead: int) -> datetime:
+    start = period_start(moment, interval)
+    for _ in range(ahead):
+        start = next_period(start, interval)
+    return start
+
+
+async def maintain(
+    connection,
+    now: Optional[datetime] = None,
+    interval: str = TRANSACTION_PARTITION_INTERVAL,
+    ahead: int = TRANSACTION_PARTITIONS_AHEAD,
+    retention_days: int = TRANSACTION_RETENTION_DAYS,
+    retention_mode: str = TRANSACTION_RETENTION_MODE,
+    archive_schema: str = TRANSACTION_ARCHIVE_SCHEMA,
+) -> dict:
+    """Cria as partições à frente e aplica a retenção. Deve rodar numa transação.
+
+    Se outra réplica já estiver fazendo a manutenção, não faz nada.
+    """
+    result = {"locked": False, "created": [], "dropped": [], "archived": []}
+    if not await connection.fetchval("SELECT pg_try_advisory_xact_lock($1)", PARTITION_LOCK_KEY):
+        return result
+    result["locked"] = True
+    if not await is_partitioned(connection):
+        return result
+
+    now = now or datetime.now(timezone.utc)
+    for start in periods(now, _ahead(now, interval, ahead), interval):
+        try:
+            async with connection.transaction():
+                if await create_partition(connection, start, interval):
+                    result["created"].append(partition_name(start))
+        except Exception as exc:  # ex.: linhas desse período já caíram na partição default
+            logger.warning("could not create partition %s: %s", partition_name(start), exc)
+
+    if retention_days > 0:
+        cutoff = now - timedelta(days=retention_days)
+        for partition in await list_partitions(connection):
+            if partition.end is None or partition.end > cutoff:
+                continue
+            if retention_mode == "archive":
+                await connection.execute(f'CREATE SCHEMA IF NOT EXISTS "{archive_schema}"')
+                await connection.execute(f"ALTER TABLE transaction DETACH PARTITION {partition.name}")
+                await connection.execute(f'ALTER TABLE {partition.name} SET SCHEMA "{archive_schema}"')
+                result["archived"].append(partition.name)
+            else:
+                await connection.execute(f"DROP TABLE {partition.name}")
+                result["dropped"].append(partition.name)
+    return result
+
+
+class PartitionMaintainer:
+    """Repete a manutenção das partições em segundo plano, no primário."""
+
+    def __init__(self, database=database, enabled: bool = TRANSACTION_PARTITIONING, interval: float = TRANSACTION_PARTITION_MAINTENANCE_INTERVAL):
+        self.database = database
+        self.enabled = enabled
+        self.interval = interval
+        self.runs = 0
+        self.failures = 0
+        self.last_result = None
+        self._task = None
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run()
+            except Exception:
+                self.failures += 1
+                logger.exception("partition maintenance failed")
+
+    async def run(self) -> dict:
+        async with self.database.connection() as connection:
+            raw = connection.raw_connection
+            async with raw.transaction():
+                result = await maintain(raw)
+        self.runs += 1
+        self.last_result = result
+        if result["created"] or result["dropped"] or result["archived"]:
+            logger.info("partition maintenance: %s", result)
+        return result
+
+    async def stats(self) -> dict:
+        stats = {
+            "enabled": self.enabled,
+            "interval": TRANSACTION_PARTITION_INTERVAL,
+            "ahead": TRANSACTION_PARTITIONS_AHEAD,
+            "retention_days": TRANSACTION_RETENTION_DAYS,
+            "retention_mode": TRANSACTION_RETENTION_MODE,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_result": self.last_result,
+        }
+        async with self.database.connection() as connection:
+            raw = connection.raw_connection
+            if await is_partitioned(raw):
+                stats["partitions"] = [partition._asdict() for partition in await list_partitions(raw)]
+        return stats
+
+
+partition_maintainer = PartitionMaintainer()
@@ -0,0 +1,88 @@
+import asyncio
+import time
+
+import databases
+from databases.backends.postgres import PostgresBackend, PostgresConnection
+
+from database.profiling import current_request
+from database.replicas import read_from_replica
+
+
+class PooledPostgresBackend(PostgresBackend):
+    """Backend asyncpg do `databases` com timeout de aquisição e estatísticas do pool."""
+
+    def __init__(self, database_url, **options):
+        # `acquire_timeout` não é opção do asyncpg.create_pool, então sai antes de repassar
+        self.acquire_timeout = options.pop("acquire_timeout", None)
+        super().__init__(database_url, **options)
+        self.waiters = 0
+        self.acquire_timeouts = 0
+
+    def connection(self) -> "PooledPostgresConnection":
+        return PooledPostgresConnection(self, self._dialect)
+
+    def stats(self) -> dict:
+        if self._pool is None:
+            return {"connected": False}
+        size = self._pool.get_size()
+        idle = self._pool.get_idle_size()
+        return {
+            "connected": True,
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "size": size,
+            "in_use": size - idle,
+            "idle": idle,
+            "waiters": self.waiters,
+            "acquire_timeouts": self.acquire_timeouts,
+        }
+
+
+class PooledPostgresConnection(PostgresConnection):
+    async def acquire(self) -> None:
+        assert self._connection is None, "Connection is already acquired"
+        assert self._database._pool is not None, "DatabaseBackend is not running"
+        backend = self._database
+        backend.waiters += 1
+        # O tempo de banco vai da espera pelo pool até a devolução da conexão
+        self._acquire_started = time.perf_counter()
+        try:
+            self._connection = await backend._pool.acquire(timeout=backend.acquire_timeout)
+        except asyncio.TimeoutError:
+            backend.acquire_timeouts += 1
+            self._add_db_time()
+            raise
+        finally:
+            backend.waiters -= 1
+
+    async def release(self) -> None:
+        try:
+            await super().release()
+        finally:
+            self._add_db_time()
+
+    def _add_db_time(self) -> None:
+        request = current_request.get()
+        if request is not None:
+            request.db_time += time.perf_counter() - self._acquire_started
+
+
+class PooledDatabase(databases.Database):
+    SUPPORTED_BACKENDS = {
+        **databases.Database.SUPPORTED_BACKENDS,
+        "postgresql": "database.pool:PooledPostgresBackend",
+        "postgres": "database.pool:PooledPostgresBackend",
+    }
+    # ReplicaSet de leitura; só o primário tem
+    replicas = None
+
+    def connection(self) -> databases.core.Connection:
+        # Leituras liberadas pelo middleware vão para uma réplica saudável, inclusive as do ormar
+        if self.replicas is not None and read_from_replica.get():
+            replica = self.replicas.pick()
+            if replica is not None:
+                return replica.connection()
+        return super().connection()
+
+    def pool_stats(self) -> dict:
+        return self._backend.stats()
@@ -1,11 +1,15 @@
+import logging
 import os
 from pathlib import Path
 
-import databases
 from dotenv import load_dotenv
 from ormar import OrmarConfig
 from sqlalchemy.sql.schema import MetaData
 
+from database.pool import PooledDatabase
+from database.profiling import DB_PROFILING, profiler
+from database.replicas import DATABASE_REPLICA_URLS, DB_REPLICA_POOL_MAX_SIZE, ReplicaSet
+
 # Carregar o .env
 dotenv_path = Path(__file__).resolve().parent.parent.parent / ".env"
 load_dotenv(dotenv_path)
@@ -13,8 +17,39 @@ load_dotenv(dotenv_path)
 DATABASE_URL = os.environ.get("DATABASE_URL")
 assert DATABASE_URL is not None, "DATABASE_URL is not set"
 
+# As duas réplicas dividem o orçamento de conexões do Postgres: 2 x DB_POOL_MAX_SIZE
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "2"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+DB_STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "100"))
+DB_POOL_ACQUIRE_TIMEOUT = float(os.environ.get("DB_POOL_ACQUIRE_TIMEOUT", "5"))
+DB_ECHO = os.environ.get("DB_ECHO", "false").lower() in ("1", "true", "yes")
+
+if DB_ECHO:
+	# Loga cada comando SQL enviado (apenas para debug, custa caro sob carga)
+	logging.basicConfig()
+	logging.getLogger("databases").setLevel(logging.DEBUG)
+
 metadata = MetaData()
-database = databases.Database(DATABASE_URL)
+database = PooledDatabase(
+	DATABASE_URL,
+	min_size=DB_POOL_MIN_SIZE,
+	max_size=DB_POOL_MAX_SIZE,
+	statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+	acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT,
+	init=profiler.install if DB_PROFILING else None,
+)
+# Cada réplica tem o próprio pool; o primário escolhe entre elas em `connection()`
+database.replicas = ReplicaSet([
+	PooledDatabase(
+		url,
+		min_size=1,
+		max_size=DB_REPLICA_POOL_MAX_SIZE,
+		statement_cache_size=DB_STATEMENT_CACHE_SIZE,
+		acquire_timeout=DB_POOL_ACQUIRE_TIMEOUT,
+		init=profiler.install if DB_PROFILING else None,
+	)
+	for url in DATABASE_REPLICA_URLS
+])
 
 base_ormar_config = OrmarConfig(
 	database=database,
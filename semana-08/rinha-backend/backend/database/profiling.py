@@ -0,0 +1,120 @@
+import logging
+import os
+import re
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional
+
+# Agrega as queries por fingerprint (via query logger do asyncpg) em vez de logar todas
+DB_PROFILING = os.environ.get("DB_PROFILING", "true").lower() in ("1", "true", "yes")
+# Queries acima desse tempo vão para o log, com a rota que as disparou
+DB_SLOW_QUERY_MS = float(os.environ.get("DB_SLOW_QUERY_MS", "100"))
+# Teto de fingerprints distintos guardados; o excedente é somado numa entrada só
+MAX_FINGERPRINTS = 1000
+OTHER_QUERIES = "<other>"
+
+logger = logging.getLogger("database.slow_queries")
+
+# Query que o pool do asyncpg roda ao devolver cada conexão; não conta como query da requisição
+_POOL_RESET = re.compile(r"(?:SELECT pg_advisory_unlock_all\(\);|CLOSE ALL;|UNLISTEN \*;|RESET ALL;)")
+_SPACES = re.compile(r"\s+")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\$\d+|\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+_ROWS = re.compile(r"\((?:\?|\?, \.\.\.)\)(?:\s*,\s*\((?:\?|\?, \.\.\.)\))+")
+
+
+class RequestProfile:
+    """Tempo de banco e número de queries da requisição corrente."""
+
+    __slots__ = ("scope", "db_time", "queries")
+
+    def __init__(self, scope: dict = None):
+        self.scope = scope
+        self.db_time = 0.0
+        self.queries = 0
+
+    @property
+    def route(self) -> str:
+        if self.scope is None:
+            return "background"
+        # Depois do roteamento o Starlette grava a rota no scope; antes disso vale o path cru
+        route = self.scope.get("route")
+        return f"{self.scope['method']} {route.path if route is not None else self.scope['path']}"
+
+
+current_request: ContextVar[Optional[RequestProfile]] = ContextVar("current_request", default=None)
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query: str) -> str:
+    """Normaliza a query: literais e parâmetros viram `?` e listas de tamanho variável colapsam."""
+    query = _SPACES.sub(" ", query).strip()
+    query = _LITERALS.sub("?", query)
+    query = _LISTS.sub("?, ...", query)
+    return _ROWS.sub("(?, ...), ...", query)
+
+
+class QueryStats:
+    __slots__ = ("count", "errors", "total", "max")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class QueryProfiler:
+    """Contagem, tempo total e máximo por fingerprint, mais o log de queries lentas."""
+
+    def __init__(self, slow_query_ms: float = DB_SLOW_QUERY_MS):
+        self.slow_query = slow_query_ms / 1000
+        self.queries = {}
+
+    async def install(self, connection) -> None:
+        # Usado como `init` do pool: roda uma vez para cada conexão nova
+        connection.add_query_logger(self.record)
+
+    def record(self, logged) -> None:
+        key = fingerprint(logged.query)
+        stats = self.queries.get(key)
+        if stats is None:
+            if len(self.queries) >= MAX_FINGERPRINTS:
+                key = OTHER_QUERIES
+                stats = self.queries.get(key)
+            if stats is None:
+                stats = self.queries[key] = QueryStats()
+        elapsed = logged.elapsed
+        stats.count += 1
+        stats.total += elapsed
+        if elapsed > stats.max:
+            stats.max = elapsed
+        if logged.exception is not None:
+            stats.errors += 1
+
+        request = current_request.get()
+        if request is not None and not _POOL_RESET.match(logged.query):
+            request.queries += 1
+        if elapsed >= self.slow_query:
+            route = request.route if request is not None else "background"
+            logger.warning("slow query (%.1f ms) on %s: %s", elapsed * 1e3, route, key)
+
+    def top(self, limit: int, order_by: str = "total") -> list:
+        ranked = sorted(self.queries.items(), key=lambda item: getattr(item[1], order_by), reverse=True)
+        return [
+            {
+                "query": query,
+                "count": stats.count,
+                "errors": stats.errors,
+                "total_ms": stats.total * 1e3,
+                "mean_ms": stats.total / stats.count * 1e3,
+                "max_ms": stats.max * 1e3,
+            }
+            for query, stats in ranked[:limit]
+        ]
+
+    def reset(self) -> None:
+        self.queries = {}
+
+
+profiler = QueryProfiler()
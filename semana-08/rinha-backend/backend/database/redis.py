@@ -0,0 +1,23 @@
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Carregar o .env
+dotenv_path = Path(__file__).resolve().parent.parent.parent / ".env"
+load_dotenv(dotenv_path)
+
+# Redis é opcional: sem REDIS_URL a aplicação funciona sem cache compartilhado
+REDIS_URL = os.environ.get("REDIS_URL")
+
+if REDIS_URL:
+    import redis.asyncio as aioredis
+    from redis.exceptions import RedisError
+
+    redis_client = aioredis.from_url(REDIS_URL, decode_responses=True)
+else:
+    # Sem Redis o pacote nem é importado (é um dos imports mais caros da subida)
+    class RedisError(Exception):
+        pass
+
+    redis_client = None
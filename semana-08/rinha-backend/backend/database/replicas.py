@@ -0,0 +1,146 @@
+import asyncio
+import itertools
+import logging
+import os
+from contextvars import ContextVar
+
+# Réplicas de leitura, separadas por vírgula; vazio mantém tudo no primário
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+DB_REPLICA_POOL_MAX_SIZE = int(os.environ.get("DB_REPLICA_POOL_MAX_SIZE", os.environ.get("DB_POOL_MAX_SIZE", "10")))
+DB_REPLICA_HEALTH_INTERVAL = float(os.environ.get("DB_REPLICA_HEALTH_INTERVAL", "2"))
+DB_REPLICA_HEALTH_TIMEOUT = float(os.environ.get("DB_REPLICA_HEALTH_TIMEOUT", "1"))
+# Réplica atrasada mais que isso sai da rotação até alcançar o primário
+DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", "5"))
+# Depois de uma escrita o cliente lê do primário por essa janela (read-your-writes)
+DB_REPLICA_STICKY_SECONDS = float(os.environ.get("DB_REPLICA_STICKY_SECONDS", "5"))
+
+# Zero quando a réplica já aplicou todo o WAL recebido (ou quando é um primário); senão, a
+# idade da última transação aplicada
+REPLICATION_LAG = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+logger = logging.getLogger("uvicorn.error")
+
+# Ligado pelo middleware só nas leituras fora da janela de stickiness; startup, tarefas em
+# segundo plano e escritas ficam no primário
+read_from_replica: ContextVar[bool] = ContextVar("read_from_replica", default=False)
+
+
+class Replica:
+    __slots__ = ("database", "name", "healthy", "lag", "error", "routed")
+
+    def __init__(self, database):
+        self.database = database
+        # Só host/porta/banco: a URL pode trazer senha
+        url = database.url
+        self.name = f"{url.hostname or 'localhost'}:{url.port or 5432}/{url.database}"
+        self.healthy = False
+        self.lag = None
+        self.error = None
+        self.routed = 0
+
+
+class ReplicaSet:
+    """Réplicas de leitura em round-robin, com health check periódico e fallback para o primário."""
+
+    def __init__(
+        self,
+        databases: list,
+        health_interval: float = DB_REPLICA_HEALTH_INTERVAL,
+        health_timeout: float = DB_REPLICA_HEALTH_TIMEOUT,
+        max_lag: float = DB_REPLICA_MAX_LAG,
+    ):
+        self.replicas = [Replica(database) for database in databases]
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.max_lag = max_lag
+        self.fallbacks = 0
+        self._next = itertools.count()
+        self._task = None
+
+    def pick(self):
+        """Próxima réplica saudável, ou None para ficar no primário."""
+        replicas = self.replicas
+        for _ in range(len(replicas)):
+            replica = replicas[next(self._next) % len(replicas)]
+            if replica.healthy:
+                replica.routed += 1
+                return replica.database
+        self.fallbacks += 1
+        return None
+
+    async def start(self) -> None:
+        if not self.replicas:
+            return
+        # Primeira checagem antes de servir: réplica fora do ar na subida não derruba a aplicação
+        await self.check()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            replica.healthy = False
+            if replica.database.is_connected:
+                await replica.database.disconnect()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check()
+
+    async def check(self) -> None:
+        await asyncio.gather(*(self._check(replica) for replica in self.replicas))
+
+    async def _check(self, replica: Replica) -> None:
+        database = replica.database
+        try:
+            if not database.is_connected:
+                await asyncio.wait_for(database.connect(), self.health_timeout)
+            lag = float(await asyncio.wait_for(database.fetch_val(REPLICATION_LAG), self.health_timeout))
+        except Exception as exc:  # qualquer falha tira a réplica da rotação até a próxima checagem
+            error = str(exc) or type(exc).__name__
+            if replica.healthy or replica.error is None:
+                logger.warning("replica %s unhealthy: %s", replica.name, error)
+            replica.healthy = False
+            replica.error = error
+            return
+
+        replica.lag = lag
+        healthy = lag <= self.max_lag
+        if healthy != replica.healthy:
+            if healthy:
+                logger.info("replica %s healthy (lag %.3f s)", replica.name, lag)
+            else:
+                logger.warning("replica %s lagging %.3f s behind, reads go to the primary", replica.name, lag)
+        replica.healthy = healthy
+        replica.error = None if healthy else f"lag {lag:.3f} s > {self.max_lag} s"
+
+    def stats(self) -> dict:
+        return {
+            "enabled": bool(self.replicas),
+            "max_lag": self.max_lag,
+            "sticky_seconds": DB_REPLICA_STICKY_SECONDS,
+            # Leituras liberadas para réplica que caíram no primário por falta de réplica saudável
+            "fallbacks": self.fallbacks,
+            "replicas": [
+                {
+                    "name": replica.name,
+                    "healthy": replica.healthy,
+                    "lag": replica.lag,
+                    "error": replica.error,
+                    "routed": replica.routed,
+                    "pool": replica.database.pool_stats(),
+                }
+                for replica in self.replicas
+            ],
+        }
@@ -0,0 +1,79 @@
+"""Caminho rápido das rotas quentes: SQL fixo enviado direto ao asyncpg.
+
+Cada texto de consulta é preparado uma vez por conexão e reaproveitado pelo cache
+de prepared statements do asyncpg (`DB_STATEMENT_CACHE_SIZE`), sem passar pela
+montagem de consultas do ormar nem pelo compilador do SQLAlchemy.
+"""
+import os
+from typing import Optional
+
+from database.postgres import database
+
+DB_FAST_PATH = os.environ.get("DB_FAST_PATH", "false").lower() in ("1", "true", "yes")
+
+GET_USER = 'SELECT id, name, email FROM "user" WHERE id = $1'
+CREATE_USER = (
+    'INSERT INTO "user" (name, email, password) VALUES ($1, $2, $3) '
+    "ON CONFLICT (email) DO NOTHING RETURNING id, name, email"
+)
+UPDATE_USER = (
+    'UPDATE "user" SET name = $2, email = $3, password = $4 WHERE id = $1 '
+    "RETURNING id, name, email"
+)
+DELETE_USER = 'DELETE FROM "user" WHERE id = $1 RETURNING id'
+
+GET_TRANSACTION = "SELECT id, amount, timestamp, status FROM transaction WHERE id = $1"
+CREATE_TRANSACTION = (
+    'INSERT INTO transaction (amount, timestamp, status, "user") VALUES ($1, $2, $3, $4) '
+    "RETURNING id, amount, timestamp, status"
+)
+UPDATE_TRANSACTION = (
+    'UPDATE transaction SET amount = $2, timestamp = $3, status = $4, "user" = $5 WHERE id = $1 '
+    "RETURNING id, amount, timestamp, status"
+)
+DELETE_TRANSACTION = "DELETE FROM transaction WHERE id = $1 RETURNING id"
+
+
+async def _fetchrow(query: str, *args) -> Optional[dict]:
+    async with database.connection() as connection:
+        row = await connection.raw_connection.fetchrow(query, *args)
+    return dict(row) if row is not None else None
+
+
+async def _fetchval(query: str, *args):
+    async with database.connection() as connection:
+        return await connection.raw_connection.fetchval(query, *args)
+
+
+async def get_user(user_id: int) -> Optional[dict]:
+    return await _fetchrow(GET_USER, user_id)
+
+
+async def create_user(data: dict) -> Optional[dict]:
+    return await _fetchrow(CREATE_USER, data["name"], data["email"], data["password"])
+
+
+async def update_user(user_id: int, data: dict) -> Optional[dict]:
+    return await _fetchrow(UPDATE_USER, user_id, data["name"], data["email"], data["password"])
+
+
+async def delete_user(user_id: int) -> bool:
+    return await _fetchval(DELETE_USER, user_id) is not None
+
+
+async def get_transaction(transaction_id: int) -> Optional[dict]:
+    return await _fetchrow(GET_TRANSACTION, transaction_id)
+
+
+async def create_transaction(data: dict) -> dict:
+    return await _fetchrow(CREATE_TRANSACTION, data["amount"], data["timestamp"], data["status"], data["user"])
+
+
+async def update_transaction(transaction_id: int, data: dict) -> Optional[dict]:
+    return await _fetchrow(
+        UPDATE_TRANSACTION, transaction_id, data["amount"], data["timestamp"], data["status"], data["user"]
+    )
+
+
+async def delete_transaction(transaction_id: int) -> bool:
+    return await _fetchval(DELETE_TRANSACTION, transaction_id) is not None
@@ -0,0 +1,239 @@
+from sqlalchemy.dialects import postgresql
+
+from database import partitions
+from database.feed import FEED_CHANNEL, TRANSACTION_FEED
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+# Chave arbitrária do advisory lock que serializa o DDL entre as réplicas
+SCHEMA_LOCK_KEY = 7_202_408
+
+# Mantém `balance` em dia na mesma transação de cada INSERT/UPDATE/DELETE em `transaction`.
+# Transações com status "failed" não contam no saldo. O limite de crédito é garantido pela
+# constraint `balance_within_limit`, que aborta o comando que deixaria o saldo abaixo dele.
+LEDGER_FUNCTION = """
+CREATE OR REPLACE FUNCTION apply_transaction_to_balance() RETURNS trigger AS $$
+DECLARE
+    old_amount transaction.amount%TYPE := 0;
+    new_amount transaction.amount%TYPE := 0;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD."user" IS NOT NULL AND OLD.status IS DISTINCT FROM 'failed' THEN
+        old_amount := OLD.amount;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW."user" IS NOT NULL AND NEW.status IS DISTINCT FROM 'failed' THEN
+        new_amount := NEW.amount;
+    END IF;
+    -- Mesmo usuário: um único delta líquido, para a CHECK do limite ver só o saldo final (e nada
+    -- a fazer quando a contribuição não muda, como pending -> completed)
+    IF TG_OP = 'UPDATE' AND OLD."user" IS NOT DISTINCT FROM NEW."user" THEN
+        IF new_amount <> old_amount THEN
+            INSERT INTO balance (user_id, balance) VALUES (NEW."user", new_amount - old_amount)
+            ON CONFLICT (user_id) DO UPDATE SET balance = balance.balance + EXCLUDED.balance;
+        END IF;
+        RETURN NULL;
+    END IF;
+    IF old_amount <> 0 THEN
+        UPDATE balance SET balance = balance - old_amount WHERE user_id = OLD."user";
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW."user" IS NOT NULL AND NEW.status IS DISTINCT FROM 'failed' THEN
+        INSERT INTO balance (user_id, balance) VALUES (NEW."user", new_amount)
+        ON CONFLICT (user_id) DO UPDATE SET balance = balance.balance + EXCLUDED.balance;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+LEDGER_TRIGGER = """
+CREATE TRIGGER transaction_balance
+AFTER INSERT OR DELETE OR UPDATE OF amount, status, "user" ON transaction
+FOR EACH ROW EXECUTE FUNCTION apply_transaction_to_balance()
+"""
+
+# Na primeira instalação do trigger, o saldo é reconstruído a partir das transações existentes
+LEDGER_BACKFILL = """
+INSERT INTO balance (user_id, balance)
+SELECT "user", sum(amount) FROM transaction
+WHERE "user" IS NOT NULL AND status IS DISTINCT FROM 'failed'
+GROUP BY "user"
+ON CONFLICT (user_id) DO UPDATE SET balance = EXCLUDED.balance
+"""
+
+# Resumo por hora, usuário e status que alimenta os relatórios: cada escrita em `transaction`
+# ajusta só as linhas dos seus buckets, então o relatório lê O(buckets) em vez de O(linhas).
+# O trigger é por comando, com as tabelas de transição: o comando inteiro vira um delta por
+# (bucket, usuário, status), aplicado uma vez e na ordem da chave. Comandos concorrentes (como
+# os lotes da liquidação) travam as linhas do resumo sempre na mesma ordem, sem deadlock, e um
+# UPDATE que não muda a contribuição de nenhum bucket não toca no resumo
+SUMMARY_FUNCTION = """
+CREATE OR REPLACE FUNCTION apply_transaction_to_summary() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO transaction_summary (bucket, user_id, status, count, total)
+        SELECT date_trunc('hour', "timestamp", 'UTC'), "user", coalesce(status, ''), count(*), sum(amount)
+        FROM new_rows WHERE "user" IS NOT NULL
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (bucket, user_id, status) DO UPDATE
+        SET count = transaction_summary.count + EXCLUDED.count, total = transaction_summary.total + EXCLUDED.total;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO transaction_summary (bucket, user_id, status, count, total)
+        SELECT date_trunc('hour', "timestamp", 'UTC'), "user", coalesce(status, ''), -count(*), -sum(amount)
+        FROM old_rows WHERE "user" IS NOT NULL
+        GROUP BY 1, 2, 3
+        ORDER BY 1, 2, 3
+        ON CONFLICT (bucket, user_id, status) DO UPDATE
+        SET count = transaction_summary.count + EXCLUDED.count, total = transaction_summary.total + EXCLUDED.total;
+    ELSE
+        INSERT INTO transaction_summary (bucket, user_id, status, count, total)
+        SELECT bucket, user_id, status, sum(count), sum(total)
+        FROM (
+            SELECT date_trunc('hour', "timestamp", 'UTC'), "user", coalesce(status, ''), -1, -amount
+            FROM old_rows WHERE "user" IS NOT NULL
+            UNION ALL
+            SELECT date_trunc('hour', "timestamp", 'UTC'), "user", coalesce(status, ''), 1, amount
+            FROM new_rows WHERE "user" IS NOT NULL
+        ) AS change (bucket, user_id, status, count, total)
+        GROUP BY bucket, user_id, status
+        HAVING sum(count) <> 0 OR sum(total) <> 0
+        ORDER BY bucket, user_id, status
+        ON CONFLICT (bucket, user_id, status) DO UPDATE
+        SET count = transaction_summary.count + EXCLUDED.count, total = transaction_summary.total + EXCLUDED.total;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+# Tabelas de transição não aceitam trigger com mais de um evento (nem com lista de colunas)
+SUMMARY_TRIGGERS = {
+    "transaction_summary_insert": """
+CREATE TRIGGER transaction_summary_insert AFTER INSERT ON transaction
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_transaction_to_summary()
+""",
+    "transaction_summary_update": """
+CREATE TRIGGER transaction_summary_update AFTER UPDATE ON transaction
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_transaction_to_summary()
+""",
+    "transaction_summary_delete": """
+CREATE TRIGGER transaction_summary_delete AFTER DELETE ON transaction
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION apply_transaction_to_summary()
+""",
+}
+# Versão anterior, por linha: substituída pelos triggers acima sem refazer o resumo
+LEGACY_SUMMARY_TRIGGER = "transaction_summary"
+
+SUMMARY_BACKFILL = """
+INSERT INTO transaction_summary (bucket, user_id, status, count, total)
+SELECT date_trunc('hour', "timestamp", 'UTC'), "user", coalesce(status, ''), count(*), sum(amount)
+FROM transaction WHERE "user" IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT (bucket, user_id, status) DO UPDATE SET count = EXCLUDED.count, total = EXCLUDED.total
+"""
+
+FEED_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION notify_transaction_feed() RETURNS trigger AS $$
+DECLARE
+    r transaction%ROWTYPE;
+BEGIN
+    r := CASE WHEN TG_OP = 'DELETE' THEN OLD ELSE NEW END;
+    PERFORM pg_notify('{FEED_CHANNEL}', json_build_object(
+        'op', TG_OP, 'id', r.id, 'amount', r.amount, 'timestamp', r."timestamp", 'status', r.status, 'user', r."user"
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+FEED_TRIGGER = """
+CREATE TRIGGER transaction_feed
+AFTER INSERT OR UPDATE OR DELETE ON transaction
+FOR EACH ROW EXECUTE FUNCTION notify_transaction_feed()
+"""
+
+
+# Bancos criados antes da coluna tipada guardam `timestamp` como texto ISO 8601
+TIMESTAMP_COLUMN_TYPE = """
+SELECT data_type FROM information_schema.columns
+WHERE table_schema = current_schema() AND table_name = 'transaction' AND column_name = 'timestamp'
+"""
+TIMESTAMP_TO_TIMESTAMPTZ = """
+ALTER TABLE transaction ALTER COLUMN "timestamp" TYPE timestamptz USING "timestamp"::timestamptz
+"""
+
+
+def table_statements(metadata):
+    """Gera o DDL idempotente (IF NOT EXISTS) de todas as tabelas do metadata."""
+    dialect = postgresql.dialect()
+    for table in metadata.sorted_tables:
+        yield str(CreateTable(table, if_not_exists=True).compile(dialect=dialect))
+
+
+def index_statements(metadata):
+    """Gera o DDL idempotente (IF NOT EXISTS) de todos os índices do metadata."""
+    dialect = postgresql.dialect()
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            yield str(CreateIndex(index, if_not_exists=True).compile(dialect=dialect))
+
+
+async def migrate_transaction_timestamp(connection) -> None:
+    """Converte o `timestamp` antigo (varchar) em timestamptz, reescrevendo a tabela uma única vez."""
+    if await connection.fetchval(TIMESTAMP_COLUMN_TYPE) == "character varying":
+        await connection.execute(TIMESTAMP_TO_TIMESTAMPTZ)
+
+
+async def install_ledger(connection) -> None:
+    await connection.execute(LEDGER_FUNCTION)
+    installed = await connection.fetchval("SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'transaction_balance')")
+    if not installed:
+        await connection.execute(LEDGER_TRIGGER)
+        await connection.execute(LEDGER_BACKFILL)
+
+
+async def install_summary(connection) -> None:
+    installed = {
+        row["tgname"]
+        for row in await connection.fetch(
+            "SELECT tgname FROM pg_trigger WHERE tgname = ANY($1::text[])", [LEGACY_SUMMARY_TRIGGER, *SUMMARY_TRIGGERS]
+        )
+    }
+    if LEGACY_SUMMARY_TRIGGER in installed:
+        await connection.execute(f"DROP TRIGGER {LEGACY_SUMMARY_TRIGGER} ON transaction")
+    await connection.execute(SUMMARY_FUNCTION)
+    for name, statement in SUMMARY_TRIGGERS.items():
+        if name not in installed:
+            await connection.execute(statement)
+    if not installed:
+        await connection.execute(SUMMARY_BACKFILL)
+
+
+async def install_feed(connection, enabled: bool = TRANSACTION_FEED) -> None:
+    """Instala o trigger do feed com `TRANSACTION_FEED` ligado e o remove quando desligado."""
+    installed = await connection.fetchval("SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'transaction_feed')")
+    if enabled:
+        await connection.execute(FEED_FUNCTION)
+        if not installed:
+            await connection.execute(FEED_TRIGGER)
+    elif installed:
+        await connection.execute("DROP TRIGGER transaction_feed ON transaction")
+
+
+async def create_schema(database, metadata) -> None:
+    """Cria tabelas, índices e triggers que ainda não existem usando o pool da aplicação."""
+    async with database.connection() as connection:
+        async with connection.transaction():
+            raw = connection.raw_connection
+            await raw.execute("SELECT pg_advisory_xact_lock($1)", SCHEMA_LOCK_KEY)
+            for statement in table_statements(metadata):
+                await raw.execute(statement)
+            await migrate_transaction_timestamp(raw)
+            if partitions.TRANSACTION_PARTITIONING and not await partitions.is_partitioned(raw):
+                await partitions.convert_to_partitioned(raw)
+            for statement in index_statements(metadata):
+                await raw.execute(statement)
+            await install_ledger(raw)
+            await install_summary(raw)
+            await install_feed(raw)
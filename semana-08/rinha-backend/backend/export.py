@@ -0,0 +1,46 @@
+"""Exporta as transações para um arquivo (ou para a saída padrão) e sai.
+
+Usa o mesmo caminho de `GET /transactions/export`: CSV via `COPY ... TO STDOUT`, com gzip
+opcional, ou Parquet (com pyarrow instalado), gravado em pedaços com memória constante:
+
+    python export.py --since 2024-01-01T00:00:00Z --until 2024-02-01T00:00:00Z --gzip -o janeiro.csv.gz
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime
+
+from database.postgres import database
+from services.export import ExportFormat, export_transactions
+
+
+async def main(args):
+    started = time.perf_counter()
+    written = 0
+    output = open(args.output, "wb") if args.output != "-" else sys.stdout.buffer
+    await database.connect()
+    try:
+        chunks = export_transactions(
+            ExportFormat(args.format), args.gzip, user=args.user, status=args.status, since=args.since, until=args.until
+        )
+        async for chunk in chunks:
+            output.write(chunk)
+            written += len(chunk)
+    finally:
+        await database.disconnect()
+        if output is not sys.stdout.buffer:
+            output.close()
+    print(f"{written / 1e6:.1f} MB exported in {time.perf_counter() - started:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--format", choices=[fmt.value for fmt in ExportFormat], default=ExportFormat.csv.value)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--user", type=int)
+    parser.add_argument("--status")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="ISO 8601, inclusive")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="ISO 8601, exclusive")
+    parser.add_argument("-o", "--output", default="-", help="arquivo de saída (padrão: stdout)")
+    asyncio.run(main(parser.parse_args()))
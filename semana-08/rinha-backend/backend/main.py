@@ -1,16 +1,41 @@
-from fastapi import FastAPI
+import time
+
+# Início dos imports, para medir quanto a aplicação leva para ficar pronta
+IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import logging
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from routers import transaction, user
-from database.postgres import database, metadata, DATABASE_URL
-from sqlalchemy.ext.asyncio import create_async_engine
+from fastapi.responses import JSONResponse
+from routers import metrics, report, stats, transaction, user
+from database.postgres import database, metadata
+from services.batcher import BatcherBusy, batcher
+from services.feed import feed
+from services.passwords import HasherBusy, hasher
+from database.partitions import partition_maintainer
+from middleware.admission import ADMISSION_CONTROL, AdmissionMiddleware
+from middleware.metrics import MetricsMiddleware
+from middleware.ratelimit import RATE_LIMIT, RateLimitMiddleware
+from middleware.replicas import ReplicaRoutingMiddleware
+from services import startup as startup_stats
 import os
 import socket
 
+# DDL fica com o `python migrate.py`; ligar só em desenvolvimento, sem o serviço de migração
+RUN_MIGRATIONS = os.environ.get("RUN_MIGRATIONS", "false").lower() in ("1", "true", "yes")
+IMPORTS_SECONDS = time.perf_counter() - IMPORT_STARTED
+
+logger = logging.getLogger("uvicorn.error")
+
 instance_name = os.getenv("INSTANCE_NAME", "unknown")
 app = FastAPI()
 
 app.include_router(user.router)
 app.include_router(transaction.router)
+app.include_router(report.router)
+app.include_router(stats.router)
+app.include_router(metrics.router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,8 +44,30 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+if database.replicas.replicas:
+    app.add_middleware(ReplicaRoutingMiddleware)
+if ADMISSION_CONTROL:
+    app.add_middleware(AdmissionMiddleware)
+if RATE_LIMIT:
+    # Por fora da admissão: o cliente acima do limite não chega a ocupar vaga nem lugar na fila
+    app.add_middleware(RateLimitMiddleware)
+# Adicionado por último para ficar por fora de todos os outros middlewares (e contar os 503 da admissão e os 429 do rate limit)
+app.add_middleware(MetricsMiddleware)
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+@app.exception_handler(asyncio.TimeoutError)
+async def pool_timeout_handler(request: Request, exc: asyncio.TimeoutError):
+    # Pool esgotado por mais que DB_POOL_ACQUIRE_TIMEOUT: falha rápido em vez de enfileirar
+    return JSONResponse(status_code=503, content={"detail": "Database busy"})
+
+@app.exception_handler(HasherBusy)
+async def hasher_busy_handler(request: Request, exc: HasherBusy):
+    # Rajada de cadastros/logins maior que a fila de hash: falha rápido, como a admissão
+    return JSONResponse(status_code=503, content={"detail": "Server overloaded"}, headers={"Retry-After": "1"})
+
+@app.exception_handler(BatcherBusy)
+async def batcher_busy_handler(request: Request, exc: BatcherBusy):
+    # Fila do write-behind cheia (ou a instância desligando): falha rápido em vez de acumular memória
+    return JSONResponse(status_code=503, content={"detail": "Server overloaded"}, headers={"Retry-After": "1"})
 
 @app.get("/")
 async def root():
@@ -28,12 +75,29 @@ async def root():
 
 @app.on_event("startup")
 async def startup():
+    started = time.perf_counter()
     await database.connect()
-    async with engine.begin() as conn:
-        await conn.run_sync(metadata.create_all)
+    if RUN_MIGRATIONS:
+        from database.schema import create_schema
+
+        await create_schema(database, metadata)
+    await database.replicas.start()
+    await batcher.start()
+    await partition_maintainer.start()
+    startup_stats.timings.update(
+        imports_ms=IMPORTS_SECONDS * 1e3,
+        startup_ms=(time.perf_counter() - started) * 1e3,
+        process_ms=(startup_stats.process_age() or 0.0) * 1e3,
+    )
+    logger.info("ready: imports %(imports_ms).0f ms, startup %(startup_ms).0f ms, process age %(process_ms).0f ms", startup_stats.timings)
 
 @app.on_event("shutdown")
 async def shutdown():
+    await batcher.stop()
+    await partition_maintainer.stop()
+    hasher.shutdown()
+    await feed.stop()
+    await database.replicas.stop()
     await database.disconnect()
 
 @app.get("/ping")
@@ -0,0 +1,163 @@
+import asyncio
+import os
+from collections import deque
+
+from database.postgres import DB_POOL_MAX_SIZE
+
+# Limita quantas requisições de leitura e de escrita rodam ao mesmo tempo; o excedente espera
+# numa fila curta e, se não couber ou passar do prazo, recebe 503 na hora em vez de se acumular.
+# Desligado por padrão, como os outros modos: ligar muda a resposta sob carga (503 em vez de espera)
+ADMISSION_CONTROL = os.environ.get("ADMISSION_CONTROL", "false").lower() in ("1", "true", "yes")
+ADMISSION_READ_CONCURRENCY = int(os.environ.get("ADMISSION_READ_CONCURRENCY", str(DB_POOL_MAX_SIZE * 2)))
+ADMISSION_WRITE_CONCURRENCY = int(os.environ.get("ADMISSION_WRITE_CONCURRENCY", str(DB_POOL_MAX_SIZE)))
+ADMISSION_READ_QUEUE = int(os.environ.get("ADMISSION_READ_QUEUE", "100"))
+ADMISSION_WRITE_QUEUE = int(os.environ.get("ADMISSION_WRITE_QUEUE", "100"))
+ADMISSION_QUEUE_TIMEOUT_MS = float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_MS", "250"))
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", "1"))
+
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+# Rotas operacionais, que não tocam o banco, nunca são barradas; o feed SSE também não, porque
+# seguraria uma vaga de leitura pelo tempo todo da conexão
+EXEMPT_PREFIXES = ("/ping", "/metrics", "/stats", "/docs", "/openapi.json", "/transactions/stream")
+REJECTION_BODY = b'{"detail":"Server overloaded"}'
+
+
+class Limiter:
+    """Semáforo com fila FIFO limitada e prazo máximo de espera na fila."""
+
+    def __init__(self, name: str, concurrency: int, queue_size: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiters = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    async def acquire(self) -> bool:
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            self.admitted += 1
+            return True
+        if len(self.waiters) >= self.queue_size:
+            self.rejected_queue_full += 1
+            return False
+
+        self.queued += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        try:
+            # O release passa a vaga direto para o primeiro da fila (active não muda)
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._leave_queue(waiter)
+            self.rejected_timeout += 1
+            return False
+        except asyncio.CancelledError:
+            # Cliente desistiu: se a vaga já tinha sido entregue, devolve para o próximo
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                self._leave_queue(waiter)
+            raise
+        self.admitted += 1
+        return True
+
+    def _leave_queue(self, waiter) -> None:
+        try:
+            self.waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self) -> None:
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queue_length": len(self.waiters),
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        read_concurrency: int = ADMISSION_READ_CONCURRENCY,
+        write_concurrency: int = ADMISSION_WRITE_CONCURRENCY,
+        read_queue: int = ADMISSION_READ_QUEUE,
+        write_queue: int = ADMISSION_WRITE_QUEUE,
+        queue_timeout_ms: float = ADMISSION_QUEUE_TIMEOUT_MS,
+    ):
+        self.read = Limiter("read", read_concurrency, read_queue, queue_timeout_ms / 1000)
+        self.write = Limiter("write", write_concurrency, write_queue, queue_timeout_ms / 1000)
+
+    def limiter_for(self, method: str) -> Limiter:
+        return self.read if method in READ_METHODS else self.write
+
+    def stats(self) -> dict:
+        return {"enabled": ADMISSION_CONTROL, "read": self.read.stats(), "write": self.write.stats()}
+
+    def metrics(self, instance: str) -> list:
+        lines = [
+            "# HELP admission_requests_total Requests by admission outcome and route class.",
+            "# TYPE admission_requests_total counter",
+        ]
+        for limiter in (self.read, self.write):
+            labels = f'{instance},class="{limiter.name}"'
+            lines.append(f'admission_requests_total{{{labels},outcome="admitted"}} {limiter.admitted}')
+            lines.append(f'admission_requests_total{{{labels},outcome="queue_full"}} {limiter.rejected_queue_full}')
+            lines.append(f'admission_requests_total{{{labels},outcome="queue_timeout"}} {limiter.rejected_timeout}')
+        lines.append("# HELP admission_active Requests currently admitted, by route class.")
+        lines.append("# TYPE admission_active gauge")
+        for limiter in (self.read, self.write):
+            lines.append(f'admission_active{{{instance},class="{limiter.name}"}} {limiter.active}')
+        lines.append("# HELP admission_queue_length Requests waiting for admission, by route class.")
+        lines.append("# TYPE admission_queue_length gauge")
+        for limiter in (self.read, self.write):
+            lines.append(f'admission_queue_length{{{instance},class="{limiter.name}"}} {len(limiter.waiters)}')
+        return lines
+
+
+class AdmissionMiddleware:
+    """Middleware ASGI que aplica o AdmissionController às rotas da API."""
+
+    def __init__(self, app, controller: AdmissionController = None, retry_after: int = ADMISSION_RETRY_AFTER):
+        self.app = app
+        self.controller = controller or admission
+        self.rejection_headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(REJECTION_BODY)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.controller.limiter_for(scope["method"])
+        if not await limiter.acquire():
+            await send({"type": "http.response.start", "status": 503, "headers": self.rejection_headers})
+            await send({"type": "http.response.body", "body": REJECTION_BODY})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+admission = AdmissionController()
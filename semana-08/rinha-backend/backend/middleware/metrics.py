@@ -0,0 +1,149 @@
+import os
+import time
+from bisect import bisect_left
+
+from database.profiling import RequestProfile, current_request
+
+INSTANCE_NAME = os.getenv("INSTANCE_NAME", "unknown")
+# Cabeçalho Server-Timing com o tempo de banco (e nº de queries) e o tempo da aplicação
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+# Limites dos buckets em segundos (os mesmos do prometheus_client)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Requisições que não casaram com nenhuma rota ficam num rótulo só, para não explodir a cardinalidade
+UNMATCHED_ROUTE = "unmatched"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+
+
+class RouteMetrics:
+    __slots__ = ("statuses", "duration", "db", "handler")
+
+    def __init__(self):
+        self.statuses = {}
+        self.duration = Histogram()
+        self.db = Histogram()
+        self.handler = Histogram()
+
+
+class Registry:
+    """Métricas por rota guardadas em memória, sem lock: o event loop é single-thread."""
+
+    def __init__(self, instance: str = INSTANCE_NAME):
+        self.instance = instance
+        self.routes = {}
+        self.in_flight = 0
+        # Funções chamadas na hora do scrape que devolvem linhas extras (ex.: gauges do pool)
+        self.collectors = []
+
+    def observe(self, method: str, route: str, status: int, duration: float, db: float) -> None:
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[(method, route)] = RouteMetrics()
+        statuses = metrics.statuses
+        statuses[status] = statuses.get(status, 0) + 1
+        # Buckets atualizados aqui mesmo, sem chamadas de método: é o caminho quente de toda requisição
+        handler = duration - db if duration > db else 0.0
+        histogram = metrics.duration
+        histogram.counts[bisect_left(LATENCY_BUCKETS, duration)] += 1
+        histogram.sum += duration
+        histogram = metrics.db
+        histogram.counts[bisect_left(LATENCY_BUCKETS, db)] += 1
+        histogram.sum += db
+        histogram = metrics.handler
+        histogram.counts[bisect_left(LATENCY_BUCKETS, handler)] += 1
+        histogram.sum += handler
+
+    def render(self) -> str:
+        """Formato texto de exposição do Prometheus."""
+        instance = f'instance="{self.instance}"'
+        lines = [
+            "# HELP http_requests_total Requests handled, by route and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route), metrics in sorted(self.routes.items()):
+            for status, count in sorted(metrics.statuses.items()):
+                lines.append(f'http_requests_total{{{instance},method="{method}",route="{route}",status="{status}"}} {count}')
+        for name, attribute, description in (
+            ("http_request_duration_seconds", "duration", "Total request latency."),
+            ("http_request_db_seconds", "db", "Time spent holding or waiting for a database connection."),
+            ("http_request_handler_seconds", "handler", "Request latency minus database time."),
+        ):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), metrics in sorted(self.routes.items()):
+                labels = f'{instance},method="{method}",route="{route}"'
+                lines.extend(_histogram_lines(name, labels, getattr(metrics, attribute)))
+        lines.append("# HELP http_requests_in_flight Requests currently being handled.")
+        lines.append("# TYPE http_requests_in_flight gauge")
+        lines.append(f"http_requests_in_flight{{{instance}}} {self.in_flight}")
+        for collector in self.collectors:
+            lines.extend(collector(instance))
+        return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, labels: str, histogram: Histogram) -> list:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+    cumulative += histogram.counts[-1]
+    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {cumulative}')
+    lines.append(f"{name}_sum{{{labels}}} {histogram.sum}")
+    lines.append(f"{name}_count{{{labels}}} {cumulative}")
+    return lines
+
+
+class MetricsMiddleware:
+    """Middleware ASGI puro: conta, mede a latência e separa o tempo de banco de cada requisição."""
+
+    def __init__(self, app, registry: Registry = None, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.registry = registry or metrics
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        profile = RequestProfile(scope)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    message["headers"] = [*message.get("headers", ()), (b"server-timing", _server_timing(profile, start))]
+            await send(message)
+
+        registry = self.registry
+        token = current_request.set(profile)
+        registry.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            registry.in_flight -= 1
+            current_request.reset(token)
+            # O router do Starlette grava a rota que casou no próprio scope
+            route = scope.get("route")
+            registry.observe(scope["method"], route.path if route is not None else UNMATCHED_ROUTE, status, duration, profile.db_time)
+
+
+def _server_timing(profile: RequestProfile, start: float) -> bytes:
+    elapsed = time.perf_counter() - start
+    db = profile.db_time
+    app = elapsed - db if elapsed > db else 0.0
+    return f'db;dur={db * 1e3:.2f};desc="{profile.queries} queries", app;dur={app * 1e3:.2f}'.encode()
+
+
+metrics = Registry()
@@ -0,0 +1,235 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+from database.redis import RedisError, redis_client
+
+# Limite por cliente (API key ou IP) e por rota, com um token bucket por par no Redis,
+# compartilhado pelas instâncias; desligado por padrão (o gerador de carga sai de um IP só)
+RATE_LIMIT = os.environ.get("RATE_LIMIT", "false").lower() in ("1", "true", "yes")
+# "taxa/rajada" em requisições por segundo, para as rotas sem regra própria
+RATE_LIMIT_DEFAULT = os.environ.get("RATE_LIMIT_DEFAULT", "100/200")
+# Regras por rota, separadas por vírgula: "MÉTODO /prefixo=taxa/rajada" (método * vale para todos)
+RATE_LIMIT_RULES = os.environ.get("RATE_LIMIT_RULES", "POST /transactions/bulk=2/5,GET /transactions/export=0.2/1")
+# Header com a API key do cliente; sem ele a chave é o IP repassado pelo Nginx
+RATE_LIMIT_KEY_HEADER = os.environ.get("RATE_LIMIT_KEY_HEADER", "x-api-key").lower()
+# API keys conhecidas, separadas por vírgula: só elas ganham bucket próprio. Uma key qualquer
+# é ignorada (vale o IP), senão bastaria trocar o header a cada requisição para fugir do limite
+RATE_LIMIT_API_KEYS = frozenset(key.strip() for key in os.environ.get("RATE_LIMIT_API_KEYS", "").split(",") if key.strip())
+# Acima desse tempo o Redis é tratado como fora do ar e a checagem cai no bucket local; folgado
+# o bastante para um atraso normal do event loop sob carga não contar como queda do Redis
+RATE_LIMIT_REDIS_TIMEOUT_MS = float(os.environ.get("RATE_LIMIT_REDIS_TIMEOUT_MS", "50"))
+# Depois de uma falha, o Redis só é tentado de novo passado esse tempo
+RATE_LIMIT_REDIS_RETRY = float(os.environ.get("RATE_LIMIT_REDIS_RETRY", "5"))
+# Sem o Redis cada instância só vê a sua parte do tráfego (o Nginx alterna entre elas)
+RATE_LIMIT_INSTANCES = int(os.environ.get("RATE_LIMIT_INSTANCES", "2"))
+RATE_LIMIT_LOCAL_KEYS = int(os.environ.get("RATE_LIMIT_LOCAL_KEYS", "10000"))
+
+# As mesmas rotas operacionais da admissão; o feed SSE conta, porque cada abertura segura uma conexão
+EXEMPT_PREFIXES = ("/ping", "/metrics", "/stats", "/docs", "/openapi.json")
+REJECTION_BODY = b'{"detail":"Too many requests"}'
+
+# Token bucket atômico: lê, reabastece pelo tempo decorrido e consome numa única ida ao Redis.
+# O relógio é o do Redis, o mesmo para todas as instâncias.
+TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or burst
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate / 1000)
+local allowed = 0
+local retry_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+else
+    retry_ms = math.ceil((1 - tokens) * 1000 / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst * 1000 / rate) + 1000)
+return {allowed, retry_ms}
+"""
+
+
+class Rule(NamedTuple):
+    name: str
+    method: str
+    prefix: str
+    rate: float
+    burst: float
+
+
+def parse_limit(value: str) -> Tuple[float, float]:
+    rate, _, burst = value.partition("/")
+    rate, burst = float(rate), float(burst or rate)
+    # Taxa zero dividiria por zero no script; rajada abaixo de 1 nunca deixaria passar nada
+    if not rate > 0 or burst < 1:
+        raise ValueError(f"invalid rate limit {value!r}: rate must be > 0 and burst >= 1")
+    return rate, burst
+
+
+def parse_rules(value: str) -> List[Rule]:
+    """Lê `RATE_LIMIT_RULES`; o prefixo mais longo vence quando mais de uma regra casa."""
+    rules = []
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, limit = item.partition("=")
+        method, _, prefix = route.strip().partition(" ")
+        rate, burst = parse_limit(limit)
+        rules.append(Rule(f"{method.upper()} {prefix.strip()}", method.upper(), prefix.strip(), rate, burst))
+    return sorted(rules, key=lambda rule: len(rule.prefix), reverse=True)
+
+
+class LocalBuckets:
+    """Token buckets em memória (LRU), usados quando o Redis não responde."""
+
+    def __init__(self, size: int = RATE_LIMIT_LOCAL_KEYS):
+        self.size = size
+        self.buckets = OrderedDict()
+
+    def take(self, key: str, rate: float, burst: float, now: Optional[float] = None) -> Tuple[bool, float]:
+        """Consome um token; devolve se passou e, se não, em quantos segundos haverá um."""
+        now = time.monotonic() if now is None else now
+        tokens, updated = self.buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.size:
+            self.buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        client=redis_client,
+        default: str = RATE_LIMIT_DEFAULT,
+        rules: str = RATE_LIMIT_RULES,
+        redis_timeout_ms: float = RATE_LIMIT_REDIS_TIMEOUT_MS,
+        redis_retry: float = RATE_LIMIT_REDIS_RETRY,
+        instances: int = RATE_LIMIT_INSTANCES,
+        prefix: str = "rinha:rl",
+    ):
+        self.client = client
+        self.script = client.register_script(TOKEN_BUCKET) if client is not None else None
+        self.default = Rule("*", "*", "", *parse_limit(default))
+        self.rules = parse_rules(rules)
+        self.redis_timeout = redis_timeout_ms / 1000
+        self.redis_retry = redis_retry
+        self.instances = max(instances, 1)
+        self.prefix = prefix
+        self.local = LocalBuckets()
+        # Até quando a checagem fica no bucket local depois de uma falha do Redis
+        self.redis_down_until = 0.0
+        self.allowed = 0
+        self.limited = 0
+        self.fallbacks = 0
+        self.redis_errors = 0
+
+    def rule_for(self, method: str, path: str) -> Rule:
+        for rule in self.rules:
+            if (rule.method == "*" or rule.method == method) and path.startswith(rule.prefix):
+                return rule
+        return self.default
+
+    async def check(self, rule: Rule, client_key: str) -> Tuple[bool, float]:
+        """Consome um token do bucket (regra, cliente); devolve se passou e o Retry-After em segundos."""
+        key = f"{self.prefix}:{rule.name}:{client_key}"
+        if self.script is not None and time.monotonic() >= self.redis_down_until:
+            try:
+                allowed, retry_ms = await asyncio.wait_for(self.script(keys=[key], args=[rule.rate, rule.burst]), self.redis_timeout)
+            except (RedisError, OSError, asyncio.TimeoutError):
+                self.redis_errors += 1
+                self.redis_down_until = time.monotonic() + self.redis_retry
+            else:
+                return self._count(bool(allowed), int(retry_ms) / 1000)
+
+        self.fallbacks += 1
+        # Cada instância segura só a sua fatia do limite, para o total ficar perto do configurado
+        return self._count(*self.local.take(key, rule.rate / self.instances, max(rule.burst / self.instances, 1)))
+
+    def _count(self, allowed: bool, retry_after: float) -> Tuple[bool, float]:
+        if allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return allowed, retry_after
+
+    def stats(self) -> dict:
+        return {
+            "enabled": RATE_LIMIT,
+            "redis": self.script is not None,
+            "redis_available": self.script is not None and time.monotonic() >= self.redis_down_until,
+            "default": {"rate": self.default.rate, "burst": self.default.burst},
+            "rules": [{"route": rule.name, "rate": rule.rate, "burst": rule.burst} for rule in self.rules],
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "fallbacks": self.fallbacks,
+            "redis_errors": self.redis_errors,
+        }
+
+    def metrics(self, instance: str) -> list:
+        return [
+            "# HELP rate_limit_requests_total Requests checked by the rate limiter, by outcome.",
+            "# TYPE rate_limit_requests_total counter",
+            f'rate_limit_requests_total{{{instance},outcome="allowed"}} {self.allowed}',
+            f'rate_limit_requests_total{{{instance},outcome="limited"}} {self.limited}',
+            "# HELP rate_limit_fallbacks_total Checks answered by the local buckets instead of Redis.",
+            "# TYPE rate_limit_fallbacks_total counter",
+            f"rate_limit_fallbacks_total{{{instance}}} {self.fallbacks}",
+        ]
+
+
+def client_key(scope, key_header: bytes = RATE_LIMIT_KEY_HEADER.encode(), api_keys: frozenset = RATE_LIMIT_API_KEYS) -> str:
+    """API key conhecida do header configurado ou, sem ela, o IP do cliente (X-Real-IP do Nginx)."""
+    real_ip = None
+    for name, value in scope["headers"]:
+        if name == key_header:
+            api_key = value.decode("latin-1")
+            if api_key in api_keys:
+                return "key:" + api_key
+        elif name == b"x-real-ip":
+            real_ip = value.decode("latin-1")
+    if real_ip is None and scope.get("client"):
+        real_ip = scope["client"][0]
+    return f"ip:{real_ip or 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """Middleware ASGI que responde 429 quando o cliente esgota o bucket da rota."""
+
+    def __init__(self, app, limiter: RateLimiter = None, api_keys: frozenset = RATE_LIMIT_API_KEYS):
+        self.app = app
+        self.limiter = limiter or rate_limiter
+        self.api_keys = api_keys
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        limiter = self.limiter
+        allowed, retry_after = await limiter.check(limiter.rule_for(scope["method"], scope["path"]), client_key(scope, api_keys=self.api_keys))
+        if not allowed:
+            await send({
+                "type": "http.response.start",
+                "status": 429,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(REJECTION_BODY)).encode()),
+                    (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": REJECTION_BODY})
+            return
+        await self.app(scope, receive, send)
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,57 @@
+import time
+
+from database.replicas import DB_REPLICA_STICKY_SECONDS, read_from_replica
+from middleware.admission import READ_METHODS
+
+# Guarda até quando o cliente lê do primário; cookie e não estado em memória porque o nginx
+# alterna as requisições do mesmo cliente entre as duas instâncias
+STICKY_COOKIE = "db_primary_until"
+_STICKY_PREFIX = f"{STICKY_COOKIE}=".encode()
+
+
+class ReplicaRoutingMiddleware:
+    """Libera réplicas para as leituras e marca o cliente para ler do primário depois de escrever."""
+
+    def __init__(self, app, sticky_seconds: float = DB_REPLICA_STICKY_SECONDS):
+        self.app = app
+        self.sticky_seconds = sticky_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] in READ_METHODS:
+            token = read_from_replica.set(not self._sticky(scope))
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                read_from_replica.reset(token)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400 and self.sticky_seconds > 0:
+                message["headers"] = [*message.get("headers", ()), (b"set-cookie", self._cookie())]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
+
+    def _cookie(self) -> bytes:
+        until = time.time() + self.sticky_seconds
+        max_age = int(self.sticky_seconds + 0.999)
+        return f"{STICKY_COOKIE}={until:.3f}; Max-Age={max_age}; Path=/; HttpOnly; SameSite=Lax".encode()
+
+    @staticmethod
+    def _sticky(scope) -> bool:
+        for name, value in scope["headers"]:
+            if name != b"cookie" or _STICKY_PREFIX not in value:
+                continue
+            for part in value.split(b";"):
+                part = part.strip()
+                if part.startswith(_STICKY_PREFIX):
+                    try:
+                        # O prazo vai no valor: clientes que ignoram o Max-Age também expiram
+                        return float(part[len(_STICKY_PREFIX):]) > time.time()
+                    except ValueError:
+                        return False
+        return False
@@ -0,0 +1,33 @@
+"""Cria/atualiza o schema do banco (tabelas, índices, triggers) e sai.
+
+Com `TRANSACTION_PARTITIONING=true` também converte `transaction` em tabela particionada,
+cria as próximas partições e aplica a retenção (ver `database/partitions.py`).
+
+Roda uma vez por deploy, antes das réplicas subirem (serviço `migrate` do docker-compose),
+para que as instâncias FastAPI não disputem DDL no startup:
+
+    python migrate.py
+"""
+import asyncio
+import time
+
+from database.partitions import partition_maintainer
+from database.postgres import database, metadata
+from database.schema import create_schema
+import models.models  # noqa: F401  registra as tabelas no metadata
+
+
+async def main():
+    started = time.perf_counter()
+    await database.connect()
+    try:
+        await create_schema(database, metadata)
+        if partition_maintainer.enabled:
+            print(f"partitions: {await partition_maintainer.run()}")
+    finally:
+        await database.disconnect()
+    print(f"schema up to date in {(time.perf_counter() - started) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
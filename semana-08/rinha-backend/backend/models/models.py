@@ -1,6 +1,7 @@
 from typing import Optional
-from ormar import Integer, String, ForeignKey, Float, Model
+from ormar import CheckColumns, DateTime, IndexColumns, Integer, String, ForeignKey, Float, Model, UniqueColumns
 import datetime
+from sqlalchemy import Index
 from database.postgres import base_ormar_config
 
 
@@ -14,12 +15,61 @@ class User(Model):
 
 
 class Transaction(Model):
-    ormar_config = base_ormar_config.copy(tablename="transaction")
+    ormar_config = base_ormar_config.copy(
+        tablename="transaction",
+        constraints=[
+            IndexColumns("user", "timestamp", name="ix_transaction_user_timestamp"),
+            IndexColumns("status", "timestamp", name="ix_transaction_status_timestamp"),
+        ],
+    )
 
     id = Integer(primary_key=True, autoincrement=True)
     amount = Float(nullable=False)
-    timestamp = String(nullable=False, max_length=100)
+    timestamp = DateTime(nullable=False, timezone=True)
     status = String(max_length=20, default="pending")
 
     user: Optional[User] = ForeignKey(User)
 
+
+class Balance(Model):
+    """Saldo corrente de cada usuário, mantido pelo trigger `transaction_balance`."""
+
+    ormar_config = base_ormar_config.copy(
+        tablename="balance",
+        constraints=[CheckColumns("credit_limit IS NULL OR balance >= -credit_limit", name="balance_within_limit")],
+    )
+
+    id = Integer(primary_key=True, autoincrement=True)
+    balance = Float(nullable=False, default=0, server_default="0")
+    credit_limit = Float(nullable=True)
+
+    user: Optional[User] = ForeignKey(User, name="user_id", unique=True, ondelete="CASCADE", related_name="balances")
+
+
+class TransactionSummary(Model):
+    """Contagem e soma das transações por hora, usuário e status, mantidas pelos triggers `transaction_summary_*`."""
+
+    ormar_config = base_ormar_config.copy(
+        tablename="transaction_summary",
+        constraints=[
+            UniqueColumns("bucket", "user_id", "status", name="uq_transaction_summary_bucket_user_status"),
+            IndexColumns("user_id", "bucket", name="ix_transaction_summary_user_bucket"),
+        ],
+    )
+
+    id = Integer(primary_key=True, autoincrement=True)
+    bucket = DateTime(nullable=False, timezone=True)
+    user_id = Integer(nullable=False)
+    status = String(max_length=20, nullable=False)
+    count = Integer(nullable=False, default=0, server_default="0")
+    total = Float(nullable=False, default=0, server_default="0")
+
+
+# Extrato: últimas N transações do usuário (WHERE "user" = ? ORDER BY id DESC)
+Index("ix_transaction_user_id_desc", Transaction.ormar_config.table.c.user, Transaction.ormar_config.table.c.id.desc())
+# Fila de liquidação: só as linhas "pending", na ordem em que os workers as pegam
+Index(
+    "ix_transaction_pending",
+    Transaction.ormar_config.table.c.id,
+    postgresql_where=Transaction.ormar_config.table.c.status == "pending",
+)
@@ -0,0 +1,36 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from database.postgres import database
+from middleware.admission import admission
+from middleware.metrics import metrics
+from middleware.ratelimit import rate_limiter
+
+router = APIRouter(tags=["Metrics"])
+
+
+def pool_metrics(instance: str) -> list:
+    stats = database.pool_stats()
+    if not stats["connected"]:
+        return []
+    return [
+        "# HELP db_pool_connections Connections in the asyncpg pool, by state.",
+        "# TYPE db_pool_connections gauge",
+        f'db_pool_connections{{{instance},state="in_use"}} {stats["in_use"]}',
+        f'db_pool_connections{{{instance},state="idle"}} {stats["idle"]}',
+        "# HELP db_pool_waiters Requests waiting for a pool connection.",
+        "# TYPE db_pool_waiters gauge",
+        f"db_pool_waiters{{{instance}}} {stats['waiters']}",
+        "# HELP db_pool_acquire_timeouts_total Pool acquisitions that timed out.",
+        "# TYPE db_pool_acquire_timeouts_total counter",
+        f"db_pool_acquire_timeouts_total{{{instance}}} {stats['acquire_timeouts']}",
+    ]
+
+
+metrics.collectors.append(pool_metrics)
+metrics.collectors.append(admission.metrics)
+metrics.collectors.append(rate_limiter.metrics)
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,23 @@
+from datetime import datetime
+from fastapi import APIRouter, Query
+from typing import List, Optional
+from schemas.schemas import TransactionReportRow
+from services.serialization import respond
+from services import reports
+from services.reports import Bucket, GroupBy
+
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+
+@router.get("/transactions", response_model=List[TransactionReportRow])
+async def transaction_report(
+    group_by: List[GroupBy] = Query(default=[]),
+    bucket: Optional[Bucket] = None,
+    user: Optional[int] = None,
+    status: Optional[str] = Query(default=None, max_length=20),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Totais, contagens e médias agrupados por usuário, status e hora/dia, calculados no banco."""
+    rows = await reports.transaction_report(group_by, bucket, user, status, since, until)
+    return respond(rows)
@@ -0,0 +1,80 @@
+from enum import Enum
+from fastapi import APIRouter, Query
+from database.partitions import partition_maintainer
+from database.postgres import database
+from database.profiling import profiler
+from middleware.admission import admission
+from middleware.ratelimit import rate_limiter
+from services.batcher import batcher
+from services.cache import cache
+from services.feed import feed
+from services.passwords import hasher
+from services.startup import timings
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+
+class QueryOrder(str, Enum):
+    total = "total"
+    max = "max"
+    count = "count"
+
+
+@router.get("/cache")
+async def cache_stats():
+    return cache.stats()
+
+
+@router.get("/batcher")
+async def batcher_stats():
+    return batcher.stats()
+
+
+@router.get("/pool")
+async def pool_stats():
+    return database.pool_stats()
+
+
+@router.get("/replicas")
+async def replica_stats():
+    return database.replicas.stats()
+
+
+@router.get("/partitions")
+async def partition_stats():
+    return await partition_maintainer.stats()
+
+
+@router.get("/feed")
+async def feed_stats():
+    return feed.stats()
+
+
+@router.get("/passwords")
+async def password_stats():
+    return hasher.stats()
+
+
+@router.get("/admission")
+async def admission_stats():
+    return admission.stats()
+
+
+@router.get("/ratelimit")
+async def rate_limit_stats():
+    return rate_limiter.stats()
+
+
+@router.get("/startup")
+async def startup_stats():
+    return timings
+
+
+@router.get("/queries")
+async def query_stats(limit: int = Query(20, ge=1, le=1000), order_by: QueryOrder = QueryOrder.total):
+    return profiler.top(limit, order_by.value)
+
+
+@router.delete("/queries", status_code=204)
+async def reset_query_stats():
+    profiler.reset()
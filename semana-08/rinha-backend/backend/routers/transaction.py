@@ -1,56 +1,185 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
-from models.models import Transaction, User
-from schemas.schemas import TransactionSchema, TransactionCreate
+import json
+from datetime import datetime
+from asyncpg.exceptions import CheckViolationError, ForeignKeyViolationError
+from fastapi import APIRouter, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from models.models import Transaction
+from schemas.schemas import BulkItemResult, TransactionSchema, TransactionCreate
+from database.feed import TRANSACTION_FEED
+from services.batcher import batcher
+from services.export import MEDIA_TYPES, PARQUET_AVAILABLE, ExportFormat, export_transactions, filename
+from services.feed import feed, stream_events
+from services.serialization import respond
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, StreamFormat, fetch_page, stream_rows
+from services import transactions
+from services.transactions import CREDIT_LIMIT_EXCEEDED, TRANSACTION_COLUMNS, RowError, ingest_transactions
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
 @router.post("/", response_model=TransactionSchema, status_code=201)
 async def create_transaction(transaction: TransactionCreate):
-    # Verifica se o usuário existe
-    user = await User.objects.get_or_none(id=transaction.user)
-    if not user:
+    # Modo write-behind: a verificação do usuário e o INSERT são feitos em grupo pelo batcher
+    if batcher.enabled:
+        transaction_obj = await batcher.submit(transaction)
+        if isinstance(transaction_obj, RowError):
+            raise HTTPException(status_code=transaction_obj.status, detail=transaction_obj.detail)
+        return transaction_obj
+
+    # Cria a transação com referência ao usuário; a FK garante que ele existe
+    try:
+        transaction_obj = await transactions.create_transaction(transaction.dict())
+    except ForeignKeyViolationError:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Cria a transação com referência ao usuário
-    transaction_obj = await Transaction.objects.create(**transaction.dict())
+    except CheckViolationError:
+        raise HTTPException(status_code=422, detail=CREDIT_LIMIT_EXCEEDED)
     return transaction_obj
 
 
+@router.post("/bulk", response_model=List[BulkItemResult])
+async def create_transactions_bulk(request: Request):
+    """Recebe um array JSON ou um stream NDJSON de `TransactionCreate` e devolve um resultado por item."""
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        payloads = _ndjson_items(request)
+    else:
+        try:
+            body = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(body, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array")
+        payloads = _iterate(body)
+
+    return await ingest_transactions(payloads)
+
+
+async def _iterate(items):
+    for item in items:
+        yield item
+
+
+async def _ndjson_items(request: Request):
+    # Processa o corpo conforme chega, linha a linha, sem carregá-lo inteiro
+    buffer = b""
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield _parse_line(line)
+    if buffer.strip():
+        yield _parse_line(buffer)
+
+
+def _parse_line(line: bytes):
+    try:
+        return json.loads(line)
+    except ValueError:
+        # Linhas inválidas viram um item que falha na validação (422)
+        return None
+
+
 @router.get("/", response_model=List[TransactionSchema])
-async def list_transactions():
-    return await Transaction.objects.select_related("user").all()
+async def list_transactions(
+    response: Response,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = Query(default=None, ge=0),
+    stream: Optional[StreamFormat] = None,
+    user: Optional[int] = None,
+    status: Optional[str] = Query(default=None, max_length=20),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    table = Transaction.ormar_config.table
+    # Filtros cobertos pelos índices ("user", timestamp) e (status, timestamp); com a tabela
+    # particionada, since/until também descartam as partições fora do intervalo
+    filters = []
+    if user is not None:
+        filters.append(table.c.user == user)
+    if status is not None:
+        filters.append(table.c.status == status)
+    if since is not None:
+        filters.append(table.c.timestamp >= since)
+    if until is not None:
+        filters.append(table.c.timestamp < until)
+
+    # Modo streaming: percorre a tabela inteira a partir do cursor, em blocos
+    if stream:
+        return stream_rows(table, TRANSACTION_COLUMNS, after, stream, filters)
+    return respond(await fetch_page(table, TRANSACTION_COLUMNS, response, after, limit, filters), response)
+
+
+@router.get("/export")
+async def export_transactions_file(
+    format: ExportFormat = ExportFormat.csv,
+    gzip: bool = False,
+    user: Optional[int] = None,
+    status: Optional[str] = Query(default=None, max_length=20),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+):
+    """Exporta as transações filtradas em CSV (via `COPY ... TO STDOUT`) ou Parquet, em streaming."""
+    if format == ExportFormat.parquet and not PARQUET_AVAILABLE:
+        raise HTTPException(status_code=400, detail="Parquet export requires pyarrow")
+    chunks = export_transactions(format, gzip, user=user, status=status, since=since, until=until)
+    return StreamingResponse(
+        chunks,
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename(format, gzip)}"'},
+    )
+
+
+@router.get("/stream")
+async def stream_transactions(
+    user: Optional[int] = None,
+    status: Optional[str] = Query(default=None, max_length=20),
+    last_event_id: Optional[int] = Header(default=None, ge=0),
+    after: Optional[int] = Query(default=None, ge=0),
+):
+    """Server-sent events com as transações criadas, alteradas e removidas.
+
+    Retoma a partir do header `Last-Event-ID` (enviado pelo EventSource ao reconectar) ou de
+    `after`, reenviando as transações criadas depois desse id.
+    """
+    if not TRANSACTION_FEED:
+        raise HTTPException(status_code=404, detail="Transaction feed disabled")
+    resume = last_event_id if last_event_id is not None else after
+    return StreamingResponse(
+        stream_events(feed, user, status, resume),
+        media_type="text/event-stream",
+        # Sem buffer no Nginx: cada evento segue para o cliente na hora
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.get("/{transaction_id}", response_model=TransactionSchema)
 async def get_transaction(transaction_id: int):
-    transaction = await Transaction.objects.select_related("user").get_or_none(id=transaction_id)
+    transaction = await transactions.get_transaction(transaction_id)
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    return transaction
+    return respond(transaction)
 
 
 @router.put("/{transaction_id}", response_model=TransactionSchema)
 async def update_transaction(transaction_id: int, transaction_data: TransactionCreate):
-    transaction = await Transaction.objects.get_or_none(id=transaction_id)
-    if not transaction:
-        raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    # Verifica se o usuário referenciado ainda existe
-    user = await User.objects.get_or_none(id=transaction_data.user)
-    if not user:
+    try:
+        updated = await transactions.update_transaction(transaction_id, transaction_data.dict())
+    except ForeignKeyViolationError:
         raise HTTPException(status_code=404, detail="User not found")
-
-    await transaction.update(**transaction_data.dict())
-    updated = await Transaction.objects.get(id=transaction_id)
+    except CheckViolationError:
+        raise HTTPException(status_code=422, detail=CREDIT_LIMIT_EXCEEDED)
+    if not updated:
+        raise HTTPException(status_code=404, detail="Transaction not found")
     return updated
 
 
 @router.delete("/{transaction_id}", status_code=204)
 async def delete_transaction(transaction_id: int):
-    transaction = await Transaction.objects.get_or_none(id=transaction_id)
-    if not transaction:
+    try:
+        deleted = await transactions.delete_transaction(transaction_id)
+    except CheckViolationError:
+        # Remover um crédito também pode deixar o saldo abaixo do limite
+        raise HTTPException(status_code=422, detail=CREDIT_LIMIT_EXCEEDED)
+    if not deleted:
         raise HTTPException(status_code=404, detail="Transaction not found")
-    
-    await transaction.delete()
     return
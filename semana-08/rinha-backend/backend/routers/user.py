@@ -1,48 +1,93 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from asyncpg.exceptions import CheckViolationError, ForeignKeyViolationError, UniqueViolationError
+from fastapi import APIRouter, HTTPException, Query, Response
+from typing import List, Optional
 from models.models import User
-from schemas.schemas import UserSchema, UserCreate
+from schemas.schemas import BalanceSchema, Credentials, CreditLimitUpdate, StatementSchema, UserCreate, UserPublicSchema
+from services.serialization import respond
+from services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, StreamFormat, fetch_page, stream_rows
+from services import ledger, users
+from services.users import USER_COLUMNS
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
-@router.post("/", response_model=UserSchema, status_code=201)
+@router.post("/", response_model=UserPublicSchema, status_code=201)
 async def create_user(user: UserCreate):
-    existing_user = await User.objects.get_or_none(email=user.email)
-    if existing_user:
+    user_obj = await users.create_user(user.dict())
+    if not user_obj:
         raise HTTPException(status_code=400, detail="Email already exists")
-    
-    user_obj = await User.objects.create(**user.dict())
     return user_obj
 
-@router.get("/", response_model=List[UserSchema])
-async def list_users():
-    return await User.objects.all()
+@router.post("/verify", response_model=UserPublicSchema)
+async def verify_credentials(credentials: Credentials):
+    user = await users.verify_credentials(credentials.email, credentials.password)
+    if not user:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    return user
 
+@router.get("/", response_model=List[UserPublicSchema])
+async def list_users(
+    response: Response,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    after: Optional[int] = Query(default=None, ge=0),
+    stream: Optional[StreamFormat] = None,
+):
+    table = User.ormar_config.table
+    # Modo streaming: percorre a tabela inteira a partir do cursor, em blocos
+    if stream:
+        return stream_rows(table, USER_COLUMNS, after, stream)
+    return respond(await fetch_page(table, USER_COLUMNS, response, after, limit), response)
 
-@router.get("/{user_id}", response_model=UserSchema)
+
+@router.get("/{user_id}", response_model=UserPublicSchema)
 async def get_user(user_id: int):
-    user = await User.objects.get_or_none(id=user_id)
+    user = await users.get_user(user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return user
+    return respond(user)
 
 
-@router.put("/{user_id}", response_model=UserSchema)
+@router.put("/{user_id}", response_model=UserPublicSchema)
 async def update_user(user_id: int, user_data: UserCreate):
-    user = await User.objects.get_or_none(id=user_id)
-    if not user:
+    try:
+        updated_user = await users.update_user(user_id, user_data.dict())
+    except UniqueViolationError:
+        raise HTTPException(status_code=400, detail="Email already exists")
+    if not updated_user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    await user.update(**user_data.dict())
-    updated_user = await User.objects.get(id=user_id)
     return updated_user
 
 
 @router.delete("/{user_id}", status_code=204)
 async def delete_user(user_id: int):
-    user = await User.objects.get_or_none(id=user_id)
-    if not user:
+    if not await users.delete_user(user_id):
         raise HTTPException(status_code=404, detail="User not found")
-    
-    await user.delete()
     return
+
+
+@router.get("/{user_id}/balance", response_model=BalanceSchema)
+async def get_balance(user_id: int):
+    balance = await ledger.get_balance(user_id)
+    if not balance:
+        raise HTTPException(status_code=404, detail="User not found")
+    return respond(balance)
+
+
+@router.put("/{user_id}/balance", response_model=BalanceSchema)
+async def set_credit_limit(user_id: int, data: CreditLimitUpdate):
+    try:
+        return await ledger.set_credit_limit(user_id, data.credit_limit)
+    except ForeignKeyViolationError:
+        raise HTTPException(status_code=404, detail="User not found")
+    except CheckViolationError:
+        raise HTTPException(status_code=422, detail="Current balance is below the credit limit")
+
+
+@router.get("/{user_id}/statement", response_model=StatementSchema)
+async def get_statement(
+    user_id: int,
+    limit: int = Query(default=ledger.DEFAULT_STATEMENT_SIZE, ge=1, le=ledger.MAX_STATEMENT_SIZE),
+):
+    statement = await ledger.get_statement(user_id, limit)
+    if not statement:
+        raise HTTPException(status_code=404, detail="User not found")
+    return respond(statement)
@@ -1,10 +1,22 @@
-from pydantic import BaseModel, Field
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field, field_validator
 
-class UserSchema(BaseModel):
+# O bcrypt só usa os primeiros 72 bytes da senha (e o bcrypt 5 recusa as maiores)
+PASSWORD_MAX_BYTES = 72
+
+
+def _check_password_length(password: str) -> str:
+    if len(password.encode()) > PASSWORD_MAX_BYTES:
+        raise ValueError(f"password must be at most {PASSWORD_MAX_BYTES} bytes")
+    return password
+
+
+# Resposta das rotas de usuário: o hash da senha nunca sai da API
+class UserPublicSchema(BaseModel):
     id: int = Field(default=None, gt=0)
     name: str = Field(max_length=100)
     email: str = Field(max_length=100)
-    password: str
 
     class Config:
         orm_mode = True
@@ -15,11 +27,26 @@ class UserCreate(BaseModel):
     email: str = Field(max_length=100)
     password: str
 
+    @field_validator("password")
+    @classmethod
+    def password_fits_bcrypt(cls, password: str) -> str:
+        return _check_password_length(password)
+
+
+class Credentials(BaseModel):
+    email: str = Field(max_length=100)
+    password: str
+
+    @field_validator("password")
+    @classmethod
+    def password_fits_bcrypt(cls, password: str) -> str:
+        return _check_password_length(password)
+
 
 class TransactionSchema(BaseModel):
     id: int = Field(default=None, gt=0)
     amount: float
-    timestamp: str
+    timestamp: datetime
     status: str
 
     class Config:
@@ -28,6 +55,37 @@ class TransactionSchema(BaseModel):
 
 class TransactionCreate(BaseModel):
     amount: float
-    timestamp: str
+    timestamp: datetime
     status: str = "pending"
     user: int  
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: int
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+
+class BalanceSchema(BaseModel):
+    user: int
+    balance: float
+    credit_limit: Optional[float] = None
+
+
+class CreditLimitUpdate(BaseModel):
+    credit_limit: Optional[float] = Field(default=None, ge=0)
+
+
+class StatementSchema(BaseModel):
+    balance: BalanceSchema
+    transactions: List[TransactionSchema]
+
+
+class TransactionReportRow(BaseModel):
+    bucket: Optional[datetime] = None
+    user: Optional[int] = None
+    status: Optional[str] = None
+    count: int
+    total: float
+    average: Optional[float] = None
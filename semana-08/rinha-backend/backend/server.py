@@ -0,0 +1,80 @@
+"""Entrypoint de produção: gunicorn gerenciando workers uvicorn.
+
+    python server.py
+
+O número de workers sai da cota de CPU do container (`WEB_CONCURRENCY` força outro valor),
+o loop e o parser HTTP são uvloop/httptools quando instalados e o access log fica desligado.
+Com `MAX_REQUESTS` > 0 cada worker é reciclado depois desse número (+ jitter) de requisições,
+terminando as que estão em andamento antes de sair.
+"""
+import importlib.util
+import os
+
+from gunicorn.app.base import BaseApplication
+from uvicorn.workers import UvicornWorker
+
+from services.cpu import available_cpus, default_workers
+
+LOOP = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+HTTP = "httptools" if importlib.util.find_spec("httptools") else "h11"
+ACCESS_LOG = os.environ.get("ACCESS_LOG", "false").lower() in ("1", "true", "yes")
+
+
+class Worker(UvicornWorker):
+    CONFIG_KWARGS = {"loop": LOOP, "http": HTTP, "access_log": ACCESS_LOG, "server_header": False}
+
+
+class Server(BaseApplication):
+    def __init__(self, app_uri: str, options: dict):
+        self.app_uri = app_uri
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from gunicorn.util import import_app
+
+        return import_app(self.app_uri)
+
+
+def server_options() -> dict:
+    cpus = available_cpus()
+    return {
+        "bind": f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8000')}",
+        "workers": int(os.environ.get("WEB_CONCURRENCY", default_workers(cpus))),
+        "worker_class": Worker,
+        # Keep-alive maior que o do Nginx para a conexão não ser fechada do lado do app no meio do reuso
+        "keepalive": int(os.environ.get("KEEP_ALIVE", "75")),
+        "backlog": int(os.environ.get("BACKLOG", "2048")),
+        "max_requests": int(os.environ.get("MAX_REQUESTS", "0")),
+        "max_requests_jitter": int(os.environ.get("MAX_REQUESTS_JITTER", "0")),
+        "graceful_timeout": int(os.environ.get("GRACEFUL_TIMEOUT", "30")),
+        "timeout": int(os.environ.get("WORKER_TIMEOUT", "60")),
+        "accesslog": "-" if ACCESS_LOG else None,
+        # Heartbeat dos workers em memória: /tmp pode ser um overlay lento dentro do container
+        "worker_tmp_dir": "/dev/shm" if os.path.isdir("/dev/shm") else None,
+        # App importado uma vez no master: worker reciclado sobe por fork, sem repetir os imports
+        "preload_app": True,
+        "when_ready": report,
+    }
+
+
+def report(arbiter) -> None:
+    """Hook `when_ready` do gunicorn: loga a configuração efetiva e avisa sobre escolhas ruins."""
+    cfg = arbiter.cfg
+    cpus = available_cpus()
+    arbiter.log.info(
+        "cpus=%.2f workers=%d loop=%s http=%s keepalive=%ss backlog=%d max_requests=%d(+%d) access_log=%s",
+        cpus, cfg.workers, LOOP, HTTP, cfg.keepalive, cfg.backlog, cfg.max_requests, cfg.max_requests_jitter, ACCESS_LOG,
+    )
+    if LOOP != "uvloop" or HTTP != "httptools":
+        arbiter.log.warning("uvloop/httptools not installed, falling back to %s/%s", LOOP, HTTP)
+    if cfg.workers > default_workers(cpus):
+        arbiter.log.warning("%d workers for %.2f CPUs: workers will compete for the CPU quota", cfg.workers, cpus)
+
+
+if __name__ == "__main__":
+    Server(os.environ.get("APP_MODULE", "main:app"), server_options()).run()
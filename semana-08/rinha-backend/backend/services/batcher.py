@@ -0,0 +1,145 @@
+import asyncio
+import os
+from typing import List, Optional, Tuple, Union
+
+from schemas.schemas import TransactionCreate
+from services.transactions import RowError, insert_transactions
+
+TRANSACTION_BATCHING = os.environ.get("TRANSACTION_BATCHING", "false").lower() in ("1", "true", "yes")
+TRANSACTION_BATCH_SIZE = int(os.environ.get("TRANSACTION_BATCH_SIZE", "100"))
+TRANSACTION_BATCH_INTERVAL_MS = int(os.environ.get("TRANSACTION_BATCH_INTERVAL_MS", "5"))
+# Transações esperando flush além desse número recebem 503 na hora em vez de acumular memória
+TRANSACTION_BATCH_QUEUE = int(os.environ.get("TRANSACTION_BATCH_QUEUE", "1000"))
+# Tempo máximo para gravar o que estava na fila ao desligar; o que sobrar falha com 503
+BATCHER_STOP_TIMEOUT = 10
+
+
+class BatcherBusy(Exception):
+    """A fila do batcher está cheia, ou ele está desligando."""
+
+
+class TransactionBatcher:
+    """Fila write-behind que agrupa os `POST /transactions/` em INSERTs multi-linha.
+
+    Cada requisição espera o resultado da sua própria transação por um future; o
+    flusher grava o grupo a cada `max_size` itens ou `max_delay_ms`, o que vier antes.
+    """
+
+    def __init__(self, enabled: bool, max_size: int, max_delay_ms: int, queue_size: int = TRANSACTION_BATCH_QUEUE):
+        self.enabled = enabled
+        self.max_size = max_size
+        self.max_delay = max_delay_ms / 1000
+        self.queue_size = queue_size
+        # Um lugar a mais para o marcador de fim que `stop()` coloca depois dos itens
+        self.queue: "asyncio.Queue[Optional[Tuple[TransactionCreate, asyncio.Future]]]" = asyncio.Queue(queue_size + 1)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.rejected = 0
+        self.flushes = 0
+        self.flushed_items = 0
+        self.failed_flushes = 0
+        self.last_flush_size = 0
+        self.max_flush_size = 0
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Para de aceitar transações, grava o que está na fila e falha o que não deu tempo."""
+        self._stopping = True
+        if self._task is None:
+            return
+        # O flusher grava tudo que está antes do marcador e encerra
+        self.queue.put_nowait(None)
+        try:
+            await asyncio.wait_for(self._task, BATCHER_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        self._task = None
+
+        # Sobras de um flush interrompido: a requisição recebe 503 em vez de ficar pendurada
+        while not self.queue.empty():
+            item = self.queue.get_nowait()
+            if item is not None and not item[1].done():
+                item[1].set_exception(BatcherBusy("batcher stopped"))
+
+    async def submit(self, transaction: TransactionCreate) -> Union[dict, RowError]:
+        """Enfileira a transação e espera o flush; devolve a transação criada ou o `RowError`.
+
+        Com a fila cheia (ou o batcher desligando) sobe `BatcherBusy` na hora.
+        """
+        if self._stopping or self.queue.qsize() >= self.queue_size:
+            self.rejected += 1
+            raise BatcherBusy()
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((transaction, future))
+        return await future
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_size:
+                if not self.queue.empty():
+                    item = self.queue.get_nowait()
+                else:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    # Marcador de `stop()`: grava este último grupo e encerra
+                    await self._flush(batch)
+                    return
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[TransactionCreate, asyncio.Future]]) -> None:
+        try:
+            created = await insert_transactions([transaction for transaction, _ in batch])
+        except BaseException as exc:
+            self.failed_flushes += 1
+            # Cancelado pelo prazo de `stop()`: as requisições do grupo recebem 503
+            error = exc if isinstance(exc, Exception) else BatcherBusy("batcher stopped")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            if not isinstance(exc, Exception):
+                raise
+            return
+
+        self.flushes += 1
+        self.flushed_items += len(batch)
+        self.last_flush_size = len(batch)
+        self.max_flush_size = max(self.max_flush_size, len(batch))
+        for (_, future), row in zip(batch, created):
+            # A requisição pode ter sido cancelada (cliente desconectou) enquanto esperava
+            if not future.done():
+                future.set_result(row)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "max_size": self.max_size,
+            "max_delay_ms": self.max_delay * 1000,
+            "queue_depth": self.queue.qsize(),
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "flushed_items": self.flushed_items,
+            "last_flush_size": self.last_flush_size,
+            "max_flush_size": self.max_flush_size,
+            "avg_flush_size": self.flushed_items / self.flushes if self.flushes else 0.0,
+        }
+
+
+batcher = TransactionBatcher(TRANSACTION_BATCHING, TRANSACTION_BATCH_SIZE, TRANSACTION_BATCH_INTERVAL_MS)
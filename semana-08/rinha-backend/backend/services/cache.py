@@ -0,0 +1,210 @@
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from database.redis import RedisError, redis_client
+from database.replicas import read_from_replica
+from services.serialization import dumps
+
+CACHE_TTL = int(os.environ.get("CACHE_TTL", "30"))
+# Leituras concorrentes da mesma chave compartilham uma única busca em andamento
+SINGLE_FLIGHT = os.environ.get("SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+# LRU local, por processo, para as chaves mais quentes (0 desliga); só as escritas locais o
+# invalidam, então o TTL curto limita quanto tempo uma escrita da outra réplica fica invisível
+LOCAL_CACHE_SIZE = int(os.environ.get("LOCAL_CACHE_SIZE", "0"))
+LOCAL_CACHE_TTL_MS = float(os.environ.get("LOCAL_CACHE_TTL_MS", "1000"))
+# Quanto tempo a versão de uma chave sobrevive a uma invalidação: precisa cobrir a busca mais
+# lenta que ainda possa estar em andamento, senão ela volta a gravar o valor antigo
+CACHE_VERSION_TTL = int(os.environ.get("CACHE_VERSION_TTL", "60"))
+
+# Grava o valor só se a versão da chave (KEYS[2]) ainda é a lida antes da busca no banco:
+# uma invalidação no meio do caminho, desta ou da outra instância, descarta o valor antigo
+SET_IF_VERSION = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+# Apaga cada chave e avança a sua versão; KEYS alterna valor e versão
+INVALIDATE = """
+for i = 1, #KEYS, 2 do
+    redis.call('DEL', KEYS[i])
+    redis.call('INCR', KEYS[i + 1])
+    redis.call('EXPIRE', KEYS[i + 1], ARGV[1])
+end
+return 1
+"""
+
+
+class LocalCache:
+    """LRU em memória com TTL, sem I/O."""
+
+    def __init__(self, size: int = LOCAL_CACHE_SIZE, ttl_ms: float = LOCAL_CACHE_TTL_MS):
+        self.size = size
+        self.ttl = ttl_ms / 1000
+        self.entries = OrderedDict()
+
+    def get(self, key: str) -> Optional[dict]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: dict) -> None:
+        if not self.size:
+            return
+        self.entries[key] = (value, time.monotonic() + self.ttl)
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.entries.pop(key, None)
+
+
+class Cache:
+    """Cache read-through no Redis, compartilhado pelas instâncias FastAPI.
+
+    Falhas do Redis nunca derrubam a requisição: a leitura cai direto no banco. Na frente do
+    Redis ficam, por processo, o single-flight e o LRU local opcional.
+    """
+
+    def __init__(
+        self,
+        client,
+        ttl: int = CACHE_TTL,
+        prefix: str = "rinha",
+        local: LocalCache = None,
+        single_flight: bool = SINGLE_FLIGHT,
+    ):
+        self.client = client
+        self.set_if_version = client.register_script(SET_IF_VERSION) if client is not None else None
+        self.invalidate_script = client.register_script(INVALIDATE) if client is not None else None
+        self.ttl = ttl
+        self.prefix = prefix
+        self.local = local or LocalCache()
+        self.single_flight = single_flight
+        self.inflight = {}
+        # Muda a cada invalidação: busca que começou antes dela não preenche o LRU local
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.local_hits = 0
+        self.coalesced = 0
+        # Valores descartados porque a chave foi invalidada durante a busca
+        self.stale_writes = 0
+
+    def key(self, *parts: Any) -> str:
+        return ":".join([self.prefix, *map(str, parts)])
+
+    @staticmethod
+    def version_key(key: str) -> str:
+        return key + ":v"
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        value = self.local.get(key)
+        if value is not None:
+            self.local_hits += 1
+            return value
+        if not self.single_flight:
+            return await self._load(key, loader, self.generation)
+
+        task = self.inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._load(key, loader, self.generation))
+            self.inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        # shield: se a requisição que disparou a busca for cancelada, as outras seguem esperando
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Future) -> None:
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        if not task.cancelled():
+            task.exception()  # marca a exceção como lida mesmo sem ninguém esperando
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Optional[dict]]], generation: int) -> Optional[dict]:
+        if self.client is not None or self.local.size:
+            # O que vai para o cache sai do primário: uma réplica atrasada deixaria o valor
+            # antigo guardado pelo TTL inteiro, bem além do atraso máximo tolerado
+            read_from_replica.set(False)
+        value = await self._load_shared(key, loader)
+        if value is not None and generation == self.generation:
+            self.local.set(key, value)
+        return value
+
+    async def _load_shared(self, key: str, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+        if self.client is None:
+            return await loader()
+
+        try:
+            cached, version = await self.client.mget(key, self.version_key(key))
+        except RedisError:
+            self.errors += 1
+            return await loader()
+
+        if cached is not None:
+            self.hits += 1
+            return json.loads(cached)
+
+        self.misses += 1
+        value = await loader()
+        # Não guardamos ausências: um id criado logo depois não pode ficar "não encontrado"
+        if value is not None:
+            try:
+                stored = await self.set_if_version(keys=[key, self.version_key(key)], args=[version or "", dumps(value), self.ttl])
+            except RedisError:
+                self.errors += 1
+            else:
+                if not stored:
+                    self.stale_writes += 1
+        return value
+
+    async def invalidate(self, *keys: str) -> None:
+        self.generation += 1
+        self.local.delete(*keys)
+        for key in keys:
+            # Leituras novas não podem pegar carona numa busca que começou antes da escrita
+            self.inflight.pop(key, None)
+        if self.client is None or not keys:
+            return
+        try:
+            await self.invalidate_script(keys=[name for key in keys for name in (key, self.version_key(key))], args=[CACHE_VERSION_TTL])
+        except RedisError:
+            self.errors += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.client is not None,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "single_flight": self.single_flight,
+            "local_size": self.local.size,
+            "local_ttl_ms": self.local.ttl * 1000,
+            "local_hits": self.local_hits,
+            "coalesced": self.coalesced,
+            "stale_writes": self.stale_writes,
+            # Buscas que não chegaram ao Redis/banco graças ao LRU local e ao single-flight
+            "queries_saved": self.local_hits + self.coalesced,
+        }
+
+
+cache = Cache(redis_client)
@@ -0,0 +1,34 @@
+import math
+import os
+from pathlib import Path
+
+CGROUP_V2_CPU_MAX = Path("/sys/fs/cgroup/cpu.max")
+CGROUP_V1_QUOTA = Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us")
+CGROUP_V1_PERIOD = Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+
+
+def _cgroup_quota():
+    """Cota de CPU do container (ex.: 0.45 com `cpus: "0.45"`), ou None se não houver limite."""
+    try:
+        quota, period = CGROUP_V2_CPU_MAX.read_text().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(CGROUP_V1_QUOTA.read_text())
+        period = int(CGROUP_V1_PERIOD.read_text())
+        return None if quota <= 0 else quota / period
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> float:
+    """CPUs que o processo pode usar: o menor entre a cota do cgroup e os núcleos visíveis."""
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    quota = _cgroup_quota()
+    return cores if quota is None else min(quota, cores)
+
+
+def default_workers(cpus: float) -> int:
+    """Um processo por CPU inteira da cota, arredondando (0.45 CPU -> 1 worker, não 2 disputando a cota)."""
+    return max(1, math.floor(cpus + 0.5))
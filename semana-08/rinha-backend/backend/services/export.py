@@ -0,0 +1,151 @@
+import asyncio
+import importlib.util
+import zlib
+from datetime import datetime
+from enum import Enum
+from typing import AsyncIterator, List, Optional, Tuple
+
+from database.postgres import database
+
+# pyarrow é opcional (só o formato parquet depende dele) e pesado: importado só no primeiro uso
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+EXPORT_COLUMNS = ("id", "amount", "timestamp", "status", "user")
+# Pedaços do COPY em trânsito entre o banco e o cliente; cheio, o COPY para de ler o socket
+EXPORT_QUEUE_CHUNKS = 16
+# Linhas por row group do Parquet (e por busca no cursor)
+PARQUET_ROW_GROUP = 50_000
+
+
+class ExportFormat(str, Enum):
+    csv = "csv"
+    parquet = "parquet"
+
+
+MEDIA_TYPES = {ExportFormat.csv: "text/csv", ExportFormat.parquet: "application/vnd.apache.parquet"}
+
+
+def filename(fmt: ExportFormat, compress: bool) -> str:
+    return f"transactions.{fmt.value}" + (".gz" if compress else "")
+
+
+def export_query(
+    user: Optional[int] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Tuple[str, list]:
+    """SELECT das transações filtradas, em ordem de id, com os parâmetros posicionais do asyncpg."""
+    filters, args = [], []
+    for condition, value in (('"user" = ${}', user), ("status = ${}", status), ('"timestamp" >= ${}', since), ('"timestamp" < ${}', until)):
+        if value is not None:
+            args.append(value)
+            filters.append(condition.format(len(args)))
+    columns = ", ".join(f'"{name}"' for name in EXPORT_COLUMNS)
+    query = f"SELECT {columns} FROM transaction"
+    if filters:
+        query += " WHERE " + " AND ".join(filters)
+    return query + " ORDER BY id", args
+
+
+async def export_transactions(fmt: ExportFormat, compress: bool = False, **filters) -> AsyncIterator[bytes]:
+    """Gera o export em pedaços, com memória constante, qualquer que seja o número de linhas."""
+    query, args = export_query(**filters)
+    chunks = _copy_csv(query, args) if fmt == ExportFormat.csv else _parquet(query, args)
+    if not compress:
+        async for chunk in chunks:
+            yield chunk
+        return
+    # wbits=31: formato gzip, comprimido de forma incremental
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+async def _copy_csv(query: str, args: list) -> AsyncIterator[bytes]:
+    """`COPY (...) TO STDOUT` direto do Postgres: as linhas não passam por Python, só os bytes."""
+    queue: asyncio.Queue = asyncio.Queue(EXPORT_QUEUE_CHUNKS)
+
+    async def copy():
+        try:
+            async with database.connection() as connection:
+                await connection.raw_connection.copy_from_query(query, *args, output=queue.put, format="csv", header=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            # Entregue pela fila, depois dos pedaços que já tinham chegado
+            await queue.put(exc)
+            return
+        await queue.put(None)
+
+    task = asyncio.ensure_future(copy())
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            if isinstance(chunk, Exception):
+                raise chunk
+            # O asyncpg entrega bytearray; o StreamingResponse só aceita bytes/str
+            yield bytes(chunk)
+    finally:
+        # Cliente desconectou no meio: cancela o COPY e devolve a conexão
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+class _Sink:
+    """Arquivo só de escrita que acumula os bytes do ParquetWriter até o próximo `drain`."""
+
+    closed = False
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts.clear()
+        return data
+
+
+async def _parquet(query: str, args: list) -> AsyncIterator[bytes]:
+    """Parquet não sai do COPY: as linhas vêm de um cursor e viram um row group por vez."""
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = pyarrow.schema([
+        ("id", pyarrow.int32()),
+        ("amount", pyarrow.float64()),
+        ("timestamp", pyarrow.timestamp("us", tz="UTC")),
+        ("status", pyarrow.string()),
+        ("user", pyarrow.int32()),
+    ])
+    sink = _Sink()
+    writer = pyarrow.parquet.ParquetWriter(pyarrow.PythonFile(sink, mode="w"), schema)
+    async with database.connection() as connection:
+        raw = connection.raw_connection
+        async with raw.transaction(readonly=True):
+            cursor = await raw.cursor(query, *args)
+            while True:
+                rows = await cursor.fetch(PARQUET_ROW_GROUP)
+                if not rows:
+                    break
+                columns = {name: [row[index] for row in rows] for index, name in enumerate(EXPORT_COLUMNS)}
+                writer.write_table(pyarrow.Table.from_pydict(columns, schema=schema))
+                yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -0,0 +1,225 @@
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import AsyncIterator, Optional
+
+import asyncpg
+
+from database.postgres import database
+from database.replicas import read_from_replica
+from database.feed import FEED_CHANNEL
+from services.serialization import dumps
+
+# Eventos guardados por assinante; quem fica para trás além disso é desconectado
+FEED_SUBSCRIBER_QUEUE = int(os.environ.get("FEED_SUBSCRIBER_QUEUE", "1000"))
+# Comentário SSE enviado nas pausas, para o Nginx e os clientes não fecharem a conexão ociosa
+FEED_HEARTBEAT = float(os.environ.get("FEED_HEARTBEAT", "15"))
+FEED_RECONNECT_DELAY = float(os.environ.get("FEED_RECONNECT_DELAY", "1"))
+# Linhas por consulta ao reenviar, a partir do Last-Event-ID, o que o cliente perdeu
+FEED_REPLAY_PAGE = 500
+# Ids da reposição lembrados para não repetir, ao vivo, o que já foi reenviado
+FEED_DEDUPE_WINDOW = int(os.environ.get("FEED_DEDUPE_WINDOW", "10000"))
+# Espera máxima pelo LISTEN antes da reposição; sem ele o stream encerra e o cliente reconecta
+FEED_LISTEN_TIMEOUT = 5
+
+logger = logging.getLogger("uvicorn.error")
+
+REPLAY = """
+SELECT id, amount, "timestamp", status, "user" FROM transaction
+WHERE id > $1 AND ($2::int IS NULL OR "user" = $2) AND ($3::text IS NULL OR status = $3)
+ORDER BY id LIMIT $4
+"""
+
+
+class Subscriber:
+    __slots__ = ("user", "status", "queue", "dropped")
+
+    def __init__(self, user: Optional[int], status: Optional[str], queue_size: int):
+        self.user = user
+        self.status = status
+        self.queue = asyncio.Queue(queue_size)
+        self.dropped = False
+
+    def matches(self, event: dict) -> bool:
+        return (self.user is None or event["user"] == self.user) and (self.status is None or event["status"] == self.status)
+
+
+class TransactionFeed:
+    """Uma conexão LISTEN por processo, repassando cada NOTIFY para todos os assinantes.
+
+    A conexão é dedicada (fora do pool, que faz `UNLISTEN *` ao devolver as conexões) e só é
+    aberta quando aparece o primeiro assinante. Cada assinante tem uma fila limitada: se o
+    cliente não consome no ritmo dos eventos, ele é desconectado em vez de acumular memória,
+    e retoma pelo Last-Event-ID.
+    """
+
+    def __init__(self, queue_size: int = FEED_SUBSCRIBER_QUEUE):
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self._connection: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        # Setado com o LISTEN ativo: a partir daí nenhum commit deixa de chegar aos assinantes
+        self.listening = asyncio.Event()
+        self.events = 0
+        self.dropped = 0
+        self.reconnects = 0
+
+    def subscribe(self, user: Optional[int] = None, status: Optional[str] = None) -> Subscriber:
+        subscriber = Subscriber(user, status, self.queue_size)
+        self.subscribers.add(subscriber)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self.subscribers.discard(subscriber)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+                # Fica aqui até a conexão cair
+                while not self._connection.is_closed():
+                    await asyncio.sleep(FEED_RECONNECT_DELAY)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("transaction feed listener failed: %s", exc)
+            await self._close()
+            self.reconnects += 1
+            # Eventos perdidos enquanto a conexão estava fora: os assinantes retomam pelo id
+            self._drop_all()
+            await asyncio.sleep(FEED_RECONNECT_DELAY)
+
+    async def _listen(self) -> None:
+        url = database.url.replace(driver="")
+        self._connection = await asyncpg.connect(str(url))
+        await self._connection.add_listener(FEED_CHANNEL, self._notify)
+        self.listening.set()
+
+    async def _close(self) -> None:
+        self.listening.clear()
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+        self._connection = None
+
+    def _notify(self, connection, pid, channel, payload: str) -> None:
+        self.events += 1
+        event = json.loads(payload)
+        for subscriber in list(self.subscribers):
+            if not subscriber.matches(event):
+                continue
+            try:
+                subscriber.queue.put_nowait((event, payload))
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber) -> None:
+        self.dropped += 1
+        subscriber.dropped = True
+        self.subscribers.discard(subscriber)
+        # Acorda o stream para ele encerrar a resposta
+        try:
+            subscriber.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            subscriber.queue.get_nowait()
+            subscriber.queue.put_nowait(None)
+
+    def _drop_all(self) -> None:
+        for subscriber in list(self.subscribers):
+            self._drop(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "listening": self._connection is not None and not self._connection.is_closed(),
+            "subscribers": len(self.subscribers),
+            "queue_size": self.queue_size,
+            "events": self.events,
+            "dropped": self.dropped,
+            "reconnects": self.reconnects,
+        }
+
+
+async def stream_events(
+    feed: TransactionFeed,
+    user: Optional[int],
+    status: Optional[str],
+    last_event_id: Optional[int],
+    heartbeat: float = FEED_HEARTBEAT,
+) -> AsyncIterator[str]:
+    """Gera o stream SSE: primeiro o que foi criado depois de `last_event_id`, depois os eventos ao vivo.
+
+    A reposição só começa com o LISTEN ativo, então o que for commitado durante ela chega pela
+    fila; os ids já reenviados são pulados ao vivo. O `id:` do SSE é o maior id de transação já
+    enviado e só vai nos eventos de criação que o aumentam: o Last-Event-ID do cliente nunca anda
+    para trás, nem com a atualização de uma transação antiga nem com um INSERT commitado fora de ordem.
+    """
+    # Assina antes de reenviar o histórico: o que chegar no meio fica na fila
+    subscriber = feed.subscribe(user, status)
+    try:
+        try:
+            await asyncio.wait_for(feed.listening.wait(), FEED_LISTEN_TIMEOUT)
+        except asyncio.TimeoutError:
+            return
+        yield f"retry: {int(FEED_RECONNECT_DELAY * 1000)}\n\n"
+        cursor = last_event_id
+        replayed = OrderedDict()
+        if last_event_id is not None:
+            # Reposição sempre no primário: uma réplica atrasada ainda não teria as linhas
+            # commitadas entre o LISTEN e a leitura, e elas não chegariam por nenhum dos dois lados
+            read_from_replica.set(False)
+            after = last_event_id
+            while True:
+                async with database.connection() as connection:
+                    rows = await connection.raw_connection.fetch(REPLAY, after, user, status, FEED_REPLAY_PAGE)
+                for row in rows:
+                    event = {"op": "INSERT", **dict(row)}
+                    yield _format(event, dumps(event), cursor)
+                    cursor = after = row["id"]
+                    replayed[row["id"]] = None
+                    if len(replayed) > FEED_DEDUPE_WINDOW:
+                        replayed.popitem(last=False)
+                if len(rows) < FEED_REPLAY_PAGE:
+                    break
+
+        while True:
+            try:
+                item = await asyncio.wait_for(subscriber.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if item is None:  # assinante lento demais: encerra e o cliente reconecta
+                return
+            event, payload = item
+            if event["op"] == "INSERT":
+                # Já enviado pela reposição
+                if event["id"] in replayed:
+                    continue
+                yield _format(event, payload, cursor)
+                cursor = event["id"] if cursor is None else max(cursor, event["id"])
+            else:
+                yield _format(event, payload, cursor)
+    finally:
+        feed.unsubscribe(subscriber)
+
+
+def _format(event: dict, data: str, cursor: Optional[int]) -> str:
+    lines = f"event: {event['op'].lower()}\ndata: {data}\n\n"
+    if event["op"] == "INSERT" and (cursor is None or event["id"] > cursor):
+        return f"id: {event['id']}\n{lines}"
+    return lines
+
+
+feed = TransactionFeed()
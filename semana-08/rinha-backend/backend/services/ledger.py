@@ -0,0 +1,54 @@
+from typing import Optional
+
+from database.postgres import database
+
+# Leitura O(1): uma linha de `balance` pela chave única user_id
+GET_BALANCE = """
+SELECT u.id AS user, coalesce(b.balance, 0) AS balance, b.credit_limit
+FROM "user" u LEFT JOIN balance b ON b.user_id = u.id
+WHERE u.id = $1
+"""
+
+# Usa o índice ("user", id DESC): lê só as N últimas entradas do usuário
+LAST_TRANSACTIONS = """
+SELECT id, amount, timestamp, status FROM transaction
+WHERE "user" = $1 ORDER BY id DESC LIMIT $2
+"""
+
+SET_CREDIT_LIMIT = """
+INSERT INTO balance (user_id, balance, credit_limit) VALUES ($1, 0, $2)
+ON CONFLICT (user_id) DO UPDATE SET credit_limit = EXCLUDED.credit_limit
+RETURNING user_id AS user, balance, credit_limit
+"""
+
+DEFAULT_STATEMENT_SIZE = 10
+MAX_STATEMENT_SIZE = 100
+
+
+async def get_balance(user_id: int) -> Optional[dict]:
+    async with database.connection() as connection:
+        row = await connection.raw_connection.fetchrow(GET_BALANCE, user_id)
+    return dict(row) if row is not None else None
+
+
+async def get_statement(user_id: int, limit: int) -> Optional[dict]:
+    """Saldo e últimas `limit` transações lidos no mesmo snapshot."""
+    async with database.connection() as connection:
+        raw = connection.raw_connection
+        async with raw.transaction(isolation="repeatable_read", readonly=True):
+            balance = await raw.fetchrow(GET_BALANCE, user_id)
+            if balance is None:
+                return None
+            rows = await raw.fetch(LAST_TRANSACTIONS, user_id, limit)
+    return {"balance": dict(balance), "transactions": [dict(row) for row in rows]}
+
+
+async def set_credit_limit(user_id: int, credit_limit: Optional[float]) -> dict:
+    """Define o limite de crédito; `None` remove o limite.
+
+    Um limite menor que o saldo negativo atual sobe como `CheckViolationError` e um
+    usuário inexistente como `ForeignKeyViolationError`.
+    """
+    async with database.connection() as connection:
+        row = await connection.raw_connection.fetchrow(SET_CREDIT_LIMIT, user_id, credit_limit)
+    return dict(row)
@@ -0,0 +1,87 @@
+from enum import Enum
+from typing import Optional, Sequence
+
+from fastapi import Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Table, select
+
+from database.postgres import database
+from services.serialization import dumps
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+# Quantidade de linhas agrupadas em cada pedaço enviado ao cliente no modo streaming
+STREAM_CHUNK_SIZE = 500
+
+
+class StreamFormat(str, Enum):
+    ndjson = "ndjson"
+    json = "json"
+
+
+def keyset_query(
+    table: Table,
+    columns: Sequence[str],
+    after: Optional[int] = None,
+    limit: Optional[int] = None,
+    filters: Sequence = (),
+):
+    """Monta um SELECT ordenado por id a partir do cursor `after` (keyset pagination)."""
+    query = select(*(table.c[name] for name in columns)).where(*filters).order_by(table.c.id)
+    if after is not None:
+        query = query.where(table.c.id > after)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+
+async def fetch_page(
+    table: Table,
+    columns: Sequence[str],
+    response: Response,
+    after: Optional[int],
+    limit: int,
+    filters: Sequence = (),
+):
+    """Busca uma página de linhas e informa o próximo cursor no header `X-Next-Cursor`."""
+    rows = await database.fetch_all(keyset_query(table, columns, after, limit, filters))
+    items = [dict(row._mapping) for row in rows]
+    if len(items) == limit:
+        response.headers["X-Next-Cursor"] = str(items[-1]["id"])
+    return items
+
+
+def stream_rows(
+    table: Table,
+    columns: Sequence[str],
+    after: Optional[int],
+    fmt: StreamFormat,
+    filters: Sequence = (),
+) -> StreamingResponse:
+    """Envia as linhas conforme chegam do cursor do banco, sem materializar a tabela em memória."""
+    query = keyset_query(table, columns, after, filters=filters)
+
+    async def chunks():
+        buffer = []
+        first = True
+        if fmt == StreamFormat.json:
+            yield "["
+        async for row in database.iterate(query):
+            buffer.append(dumps(dict(row._mapping)))
+            if len(buffer) >= STREAM_CHUNK_SIZE:
+                yield _join(buffer, fmt, first)
+                buffer = []
+                first = False
+        if buffer:
+            yield _join(buffer, fmt, first)
+        if fmt == StreamFormat.json:
+            yield "]"
+
+    media_type = "application/x-ndjson" if fmt == StreamFormat.ndjson else "application/json"
+    return StreamingResponse(chunks(), media_type=media_type)
+
+
+def _join(buffer, fmt: StreamFormat, first: bool) -> str:
+    if fmt == StreamFormat.ndjson:
+        return "\n".join(buffer) + "\n"
+    return ("" if first else ",") + ",".join(buffer)
@@ -0,0 +1,118 @@
+import asyncio
+import hmac
+import os
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import bcrypt
+
+from services.cpu import available_cpus, default_workers
+
+# Custo do bcrypt (2^N iterações); cada +1 dobra o tempo de hash
+PASSWORD_HASH_ROUNDS = int(os.environ.get("PASSWORD_HASH_ROUNDS", "12"))
+# Threads de hash: o bcrypt solta o GIL durante o cálculo, então threads bastam e não custam a
+# memória de um processo por worker no container de 125MB. 0 faz o hash no próprio event loop
+PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", str(default_workers(available_cpus()))))
+# Hashes esperando thread além desse número recebem 503 na hora em vez de se acumular
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", "32"))
+
+# Só durante a migração de uma base antiga: aceita as senhas ainda gravadas em texto puro
+PASSWORD_PLAINTEXT_FALLBACK = os.environ.get("PASSWORD_PLAINTEXT_FALLBACK", "false").lower() in ("1", "true", "yes")
+
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+
+class HasherBusy(Exception):
+    """A fila de hashes está cheia."""
+
+
+class PasswordHasher:
+    """Hash e verificação de senhas com bcrypt fora do event loop, num pool de threads limitado."""
+
+    def __init__(
+        self,
+        rounds: int = PASSWORD_HASH_ROUNDS,
+        workers: int = PASSWORD_HASH_WORKERS,
+        queue_size: int = PASSWORD_HASH_QUEUE,
+        plaintext_fallback: bool = PASSWORD_PLAINTEXT_FALLBACK,
+    ):
+        self.rounds = rounds
+        self.plaintext_fallback = plaintext_fallback
+        self.workers = workers
+        self.queue_size = queue_size
+        # Criado no primeiro uso: com o preload_app do gunicorn, threads criadas no master não
+        # sobreviveriam ao fork dos workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Hash de uma senha aleatória, gerado no primeiro `reject`
+        self._dummy_hash: Optional[str] = None
+        self.pending = 0
+        self.hashed = 0
+        self.verified = 0
+        self.rejected = 0
+
+    async def _run(self, function, *args):
+        if self.workers <= 0:
+            return function(*args)
+        if self.pending >= self.workers + self.queue_size:
+            self.rejected += 1
+            raise HasherBusy()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(_hash, password, self.rounds)
+        self.hashed += 1
+        return hashed
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        self.verified += 1
+        if not hashed.startswith(BCRYPT_PREFIXES):
+            # Usuários gravados antes do hash têm a senha em texto puro: só valem com o fallback ligado
+            return self.plaintext_fallback and hmac.compare_digest(password.encode(), hashed.encode())
+        return await self._run(_verify, password, hashed)
+
+    async def reject(self, password: str) -> bool:
+        """Gasta o tempo de um `verify` e devolve False: login de email que não existe.
+
+        Sem isso o email desconhecido responderia na hora e o cadastrado só depois do bcrypt,
+        e a diferença de tempo diria quais emails têm conta.
+        """
+        self.verified += 1
+        if self._dummy_hash is None:
+            self._dummy_hash = await self._run(_hash, secrets.token_hex(16), self.rounds)
+        await self._run(_verify, password, self._dummy_hash)
+        return False
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "rounds": self.rounds,
+            "plaintext_fallback": self.plaintext_fallback,
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "pending": self.pending,
+            "hashed": self.hashed,
+            "verified": self.verified,
+            "rejected": self.rejected,
+        }
+
+
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds)).decode()
+
+
+def _verify(password: str, hashed: str) -> bool:
+    return bcrypt.checkpw(password.encode(), hashed.encode())
+
+
+hasher = PasswordHasher()
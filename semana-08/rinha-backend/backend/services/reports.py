@@ -0,0 +1,70 @@
+from datetime import datetime
+from enum import Enum
+from typing import List, Optional, Sequence
+
+from database.postgres import database
+
+
+class GroupBy(str, Enum):
+    user = "user"
+    status = "status"
+
+
+class Bucket(str, Enum):
+    hour = "hour"
+    day = "day"
+
+
+# Colunas de agrupamento fixas: nada vindo da requisição entra no texto da consulta
+GROUP_COLUMNS = {GroupBy.user: 'user_id AS "user"', GroupBy.status: "status"}
+BUCKET_COLUMNS = {Bucket.hour: "bucket", Bucket.day: "date_trunc('day', bucket, 'UTC')"}
+
+
+def report_query(group_by: Sequence[GroupBy], bucket: Optional[Bucket], filters: Sequence[str]) -> str:
+    """Monta o SELECT agregado sobre `transaction_summary`, agrupado pelas colunas pedidas."""
+    columns = []
+    if bucket is not None:
+        columns.append(f"{BUCKET_COLUMNS[bucket]} AS bucket")
+    columns.extend(GROUP_COLUMNS[group] for group in dict.fromkeys(group_by))
+    keys = ", ".join(str(position) for position in range(1, len(columns) + 1))
+    select = ", ".join([
+        *columns,
+        "coalesce(sum(count), 0) AS count",
+        "coalesce(sum(total), 0) AS total",
+        "sum(total) / sum(count) AS average",
+    ])
+    # Buckets zerados (todas as transações removidas ou movidas) ficam de fora
+    where = " AND ".join(["count > 0", *filters])
+    query = f"SELECT {select} FROM transaction_summary WHERE {where}"
+    if keys:
+        query += f" GROUP BY {keys} ORDER BY {keys}"
+    return query
+
+
+async def transaction_report(
+    group_by: Sequence[GroupBy] = (),
+    bucket: Optional[Bucket] = None,
+    user: Optional[int] = None,
+    status: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> List[dict]:
+    """Contagem, soma e média das transações lidas do resumo por hora, sem tocar em `transaction`.
+
+    `since`/`until` valem na granularidade do resumo (uma hora): entra o bucket cuja hora
+    começa dentro do intervalo.
+    """
+    filters, args = [], []
+    for condition, value in (
+        ("user_id = ${}", user),
+        ("status = ${}", status),
+        ("bucket >= ${}", since),
+        ("bucket < ${}", until),
+    ):
+        if value is not None:
+            args.append(value)
+            filters.append(condition.format(len(args)))
+    query = report_query(group_by, bucket, filters)
+    async with database.connection() as connection:
+        rows = await connection.raw_connection.fetch(query, *args)
+    return [dict(row) for row in rows]
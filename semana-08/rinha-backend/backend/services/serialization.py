@@ -0,0 +1,52 @@
+import datetime
+import json
+import os
+from typing import Optional
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional, o json da stdlib serve de fallback
+    orjson = None
+
+# Devolve as linhas do banco direto como JSON, sem revalidar contra o response_model
+FAST_RESPONSES = os.environ.get("FAST_RESPONSES", "false").lower() in ("1", "true", "yes")
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_bytes(value) -> bytes:
+    """Serializa para JSON com orjson quando disponível; aceita os datetimes vindos do banco."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default).encode()
+
+
+def dumps(value) -> str:
+    return dumps_bytes(value).decode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps_bytes(content)
+
+
+def respond(content, response: Optional[Response] = None):
+    """No modo `FAST_RESPONSES`, embrulha o conteúdo numa resposta pronta.
+
+    O FastAPI não passa um `Response` pelo response_model, então as linhas (que já saem do
+    banco no formato do schema) são serializadas uma única vez. Fora desse modo o conteúdo
+    volta intacto e segue o caminho normal de validação.
+    """
+    if not FAST_RESPONSES:
+        return content
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return FastJSONResponse(content, headers=headers)
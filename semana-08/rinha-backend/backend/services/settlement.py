@@ -0,0 +1,279 @@
+import asyncio
+import logging
+import math
+import os
+import random
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Sequence, Tuple
+
+from asyncpg.exceptions import DataError, IntegrityConstraintViolationError, RaiseError, TransactionRollbackError
+
+from database.postgres import database
+from services.cache import cache
+from services.transactions import transaction_key
+
+# Loops de liquidação por processo; cada um segura uma conexão do pool enquanto liquida um lote
+SETTLEMENT_CONCURRENCY = int(os.environ.get("SETTLEMENT_CONCURRENCY", "2"))
+SETTLEMENT_BATCH_SIZE = int(os.environ.get("SETTLEMENT_BATCH_SIZE", "500"))
+# Espera de um loop que não encontrou nada pendente antes de tentar de novo
+SETTLEMENT_IDLE_MS = float(os.environ.get("SETTLEMENT_IDLE_MS", "200"))
+SETTLEMENT_BACKLOG_INTERVAL = float(os.environ.get("SETTLEMENT_BACKLOG_INTERVAL", "10"))
+# Novas tentativas de um lote desfeito por deadlock ou falha de serialização
+SETTLEMENT_RETRIES = int(os.environ.get("SETTLEMENT_RETRIES", "3"))
+
+logger = logging.getLogger("settlement")
+
+# Usa o índice parcial ix_transaction_pending; SKIP LOCKED deixa cada worker com linhas
+# diferentes, sem esperar pelos lotes que os outros estão liquidando
+CLAIM = """
+SELECT id, amount, "timestamp", "user" FROM transaction
+WHERE status = 'pending'
+ORDER BY id
+LIMIT $1
+FOR UPDATE SKIP LOCKED
+"""
+CLAIM_FOR_USERS = """
+SELECT id, amount, "timestamp", "user" FROM transaction
+WHERE status = 'pending' AND "user" = ANY($2::int[])
+ORDER BY id
+LIMIT $1
+FOR UPDATE SKIP LOCKED
+"""
+
+# Antes do UPDATE, o lote trava as linhas de saldo e do resumo que os triggers vão tocar, sempre
+# na mesma ordem (saldo por usuário, depois resumo pela chave), que é também a dos triggers de
+# uma escrita comum: lotes e requisições concorrentes esperam uns pelos outros, sem deadlock.
+# Lotes do mesmo usuário e da mesma hora se revezam no resumo; os demais seguem em paralelo
+LOCK_BALANCES = """
+SELECT user_id FROM balance WHERE user_id = ANY($1::int[]) ORDER BY user_id FOR UPDATE
+"""
+LOCK_SUMMARY = """
+SELECT id FROM transaction_summary
+WHERE (bucket, user_id) IN (
+    SELECT date_trunc('hour', s."timestamp", 'UTC'), s.user_id FROM unnest($1::timestamptz[], $2::int[]) AS s("timestamp", user_id)
+)
+ORDER BY bucket, user_id, status
+FOR UPDATE
+"""
+
+# Um UPDATE para o lote inteiro; o timestamp entra no join para a tabela particionada achar a
+# partição de cada linha pela chave primária (id, timestamp)
+SETTLE = """
+UPDATE transaction t SET status = s.status
+FROM unnest($1::int[], $2::timestamptz[], $3::text[]) AS s(id, "timestamp", status)
+WHERE t.id = s.id AND t."timestamp" = s."timestamp"
+"""
+
+# Linha que o banco recusa liquidar sai da fila com este status em vez de travar os lotes
+# seguintes; não é "failed", então o saldo não muda e o estacionamento nunca esbarra no limite
+HELD = "held"
+
+# Recusas de verdade: constraint, valor inválido ou RAISE de um trigger. A linha não passaria
+# em nenhuma tentativa; deadlock e falha de serialização (classe 40) só pedem outra tentativa
+REFUSALS = (IntegrityConstraintViolationError, DataError, RaiseError)
+
+BACKLOG = "SELECT count(*) FROM transaction WHERE status = 'pending'"
+
+
+def settle(row) -> str:
+    """Regra de liquidação: transações de valor zero ou não finito falham, o resto é concluído.
+
+    Marcar como "failed" tira a transação do saldo (ver o trigger do ledger); como só falham
+    valores nulos, o saldo e o limite de crédito não mudam.
+    """
+    amount = row["amount"]
+    return "failed" if amount == 0 or not math.isfinite(amount) else "completed"
+
+
+class SettlementWorker:
+    """Move as transações de "pending" para "completed"/"failed" em lotes, com vários loops concorrentes.
+
+    Cada loop pega um lote com `FOR UPDATE SKIP LOCKED`, aplica `settle` e grava o lote todo
+    num único UPDATE, na mesma transação do claim. Vários processos podem rodar lado a lado.
+    Com `users`, só as transações desses usuários são liquidadas.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = SETTLEMENT_CONCURRENCY,
+        batch_size: int = SETTLEMENT_BATCH_SIZE,
+        idle_ms: float = SETTLEMENT_IDLE_MS,
+        backlog_interval: float = SETTLEMENT_BACKLOG_INTERVAL,
+        retries: int = SETTLEMENT_RETRIES,
+        users: Optional[Sequence[int]] = None,
+    ):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.idle = idle_ms / 1000
+        self.backlog_interval = backlog_interval
+        self.retries = retries
+        self.users = list(users) if users is not None else None
+        self._tasks: List[asyncio.Task] = []
+        self.batches = 0
+        self.completed = 0
+        self.failed = 0
+        self.held = 0
+        self.errors = 0
+        self.retried = 0
+        self.busy_seconds = 0.0
+        self.last_batch_size = 0
+        # Idade (pelo timestamp da transação) da linha mais antiga do último lote liquidado
+        self.lag = 0.0
+        self.backlog = None
+
+    async def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+            self._tasks.append(asyncio.create_task(self._watch_backlog()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        # Um lote interrompido é desfeito com a transação e volta a ficar disponível
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                settled = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.errors += 1
+                logger.exception("settlement batch failed")
+                settled = 0
+            if settled < self.batch_size:
+                await asyncio.sleep(self.idle)
+
+    async def run_once(self) -> int:
+        """Liquida um lote; devolve quantas transações foram liquidadas.
+
+        Deadlock ou falha de serialização desfazem o lote inteiro, que é pego de novo do zero
+        (até `retries` vezes); nenhuma linha fica `HELD` por isso.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._settle_batch()
+            except TransactionRollbackError as exc:
+                if attempt == self.retries:
+                    raise
+                self.retried += 1
+                logger.warning("settlement batch rolled back (%s), retrying", exc)
+                await asyncio.sleep(random.uniform(0, self.idle))
+
+    async def _settle_batch(self) -> int:
+        started = time.perf_counter()
+        async with database.connection() as connection:
+            raw = connection.raw_connection
+            async with raw.transaction():
+                if self.users is None:
+                    rows = await raw.fetch(CLAIM, self.batch_size)
+                else:
+                    rows = await raw.fetch(CLAIM_FOR_USERS, self.batch_size, self.users)
+                if not rows:
+                    return 0
+                ids, timestamps, statuses = _columns(rows)
+                owned = [row for row in rows if row["user"] is not None]
+                await raw.execute(LOCK_BALANCES, sorted({row["user"] for row in owned}))
+                await raw.execute(LOCK_SUMMARY, [row["timestamp"] for row in owned], [row["user"] for row in owned])
+                try:
+                    async with raw.transaction():  # savepoint: o claim continua valendo se o lote falhar
+                        await raw.execute(SETTLE, ids, timestamps, statuses)
+                except REFUSALS as exc:
+                    logger.warning("settlement batch rejected (%s), settling row by row", exc)
+                    statuses = await self._settle_rows(raw, ids, timestamps, statuses)
+        # O status mudou: a versão guardada no cache deixa de valer
+        await cache.invalidate(*(transaction_key(transaction_id) for transaction_id in ids))
+        self.batches += 1
+        self.last_batch_size = len(rows)
+        failed = statuses.count("failed")
+        held = statuses.count(HELD)
+        self.failed += failed
+        self.held += held
+        self.completed += len(rows) - failed - held
+        self.busy_seconds += time.perf_counter() - started
+        self.lag = max((datetime.now(timezone.utc) - min(timestamps)).total_seconds(), 0.0)
+        return len(rows)
+
+    async def _settle_rows(self, raw, ids: list, timestamps: list, statuses: list) -> list:
+        """Liquida linha a linha, cada uma num savepoint; as recusadas ficam com status `HELD`.
+
+        Sem isso o lote inteiro seria desfeito e, como o claim segue a ordem de id, as mesmas
+        linhas voltariam no próximo lote para sempre, travando tudo que vem atrás delas. Só as
+        `REFUSALS` estacionam a linha; qualquer outro erro desfaz o lote inteiro.
+        """
+        settled = []
+        for transaction_id, timestamp, status in zip(ids, timestamps, statuses):
+            try:
+                async with raw.transaction():
+                    await raw.execute(SETTLE, [transaction_id], [timestamp], [status])
+            except REFUSALS as exc:
+                logger.error("transaction %s could not be settled as %s, holding it: %s", transaction_id, status, exc)
+                async with raw.transaction():
+                    await raw.execute(SETTLE, [transaction_id], [timestamp], [HELD])
+                status = HELD
+            settled.append(status)
+        return settled
+
+    async def _watch_backlog(self) -> None:
+        while True:
+            try:
+                self.backlog = await database.fetch_val(BACKLOG)
+            except Exception:
+                logger.exception("could not read the settlement backlog")
+            await asyncio.sleep(self.backlog_interval)
+
+    def stats(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "batch_size": self.batch_size,
+            "batches": self.batches,
+            "completed": self.completed,
+            "failed": self.failed,
+            "held": self.held,
+            "errors": self.errors,
+            "retried": self.retried,
+            "last_batch_size": self.last_batch_size,
+            "lag_seconds": self.lag,
+            "backlog": self.backlog,
+        }
+
+    def metrics(self, instance: str) -> list:
+        lines = [
+            "# HELP settlement_transactions_total Transactions settled, by resulting status.",
+            "# TYPE settlement_transactions_total counter",
+            f'settlement_transactions_total{{{instance},status="completed"}} {self.completed}',
+            f'settlement_transactions_total{{{instance},status="failed"}} {self.failed}',
+            f'settlement_transactions_total{{{instance},status="held"}} {self.held}',
+            "# HELP settlement_batches_total Batches claimed and settled.",
+            "# TYPE settlement_batches_total counter",
+            f"settlement_batches_total{{{instance}}} {self.batches}",
+            "# HELP settlement_errors_total Batches that failed and were rolled back.",
+            "# TYPE settlement_errors_total counter",
+            f"settlement_errors_total{{{instance}}} {self.errors}",
+            "# HELP settlement_retries_total Batches rolled back by a deadlock or serialization failure and retried.",
+            "# TYPE settlement_retries_total counter",
+            f"settlement_retries_total{{{instance}}} {self.retried}",
+            "# HELP settlement_busy_seconds_total Time spent claiming and settling batches.",
+            "# TYPE settlement_busy_seconds_total counter",
+            f"settlement_busy_seconds_total{{{instance}}} {self.busy_seconds}",
+            "# HELP settlement_lag_seconds Age of the oldest transaction in the last settled batch.",
+            "# TYPE settlement_lag_seconds gauge",
+            f"settlement_lag_seconds{{{instance}}} {self.lag}",
+        ]
+        if self.backlog is not None:
+            lines += [
+                "# HELP settlement_backlog Pending transactions waiting for settlement.",
+                "# TYPE settlement_backlog gauge",
+                f"settlement_backlog{{{instance}}} {self.backlog}",
+            ]
+        return lines
+
+
+def _columns(rows) -> Tuple[list, list, list]:
+    return [row["id"] for row in rows], [row["timestamp"] for row in rows], [settle(row) for row in rows]
+
+
+settlement = SettlementWorker()
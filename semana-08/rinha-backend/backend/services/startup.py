@@ -0,0 +1,18 @@
+import os
+from pathlib import Path
+from typing import Optional
+
+# Preenchido no startup da aplicação e exposto em /stats/startup
+timings = {}
+
+
+def process_age() -> Optional[float]:
+    """Segundos desde que o processo começou (num worker do gunicorn, desde o fork), via /proc."""
+    try:
+        stat = Path("/proc/self/stat").read_text()
+        # Campo 22 do stat (starttime, em ticks desde o boot); o nome do processo pode ter espaços
+        started = int(stat.rsplit(")", 1)[1].split()[19]) / os.sysconf("SC_CLK_TCK")
+        uptime = float(Path("/proc/uptime").read_text().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime - started
@@ -0,0 +1,163 @@
+from typing import AsyncIterator, List, NamedTuple, Optional, Union
+
+from asyncpg.exceptions import CheckViolationError, ForeignKeyViolationError
+from pydantic import ValidationError
+from sqlalchemy import delete, insert, select, update
+
+from database import repository
+from database.postgres import database
+from models.models import Transaction, User
+from schemas.schemas import TransactionCreate
+from services.cache import cache
+
+TRANSACTION_COLUMNS = ("id", "amount", "timestamp", "status")
+# Limite de linhas por INSERT multi-linha (o Postgres aceita até 32767 parâmetros por consulta)
+BULK_CHUNK_SIZE = 1000
+
+USER_NOT_FOUND = "User not found"
+CREDIT_LIMIT_EXCEEDED = "Credit limit exceeded"
+
+
+class RowError(NamedTuple):
+    """Falha de um item do lote, já com o status HTTP correspondente."""
+
+    status: int
+    detail: str
+
+
+def transaction_key(transaction_id: int) -> str:
+    return cache.key("transaction", transaction_id)
+
+
+def _returning():
+    table = Transaction.ormar_config.table
+    return [table.c[name] for name in TRANSACTION_COLUMNS]
+
+
+async def _fetch_one(query) -> Optional[dict]:
+    row = await database.fetch_one(query)
+    return dict(row._mapping) if row is not None else None
+
+
+async def get_transaction(transaction_id: int) -> Optional[dict]:
+    """Busca a transação pelo id passando pelo cache (read-through)."""
+
+    async def load():
+        if repository.DB_FAST_PATH:
+            return await repository.get_transaction(transaction_id)
+        transaction = await Transaction.objects.select_related("user").get_or_none(id=transaction_id)
+        return transaction.dict(include=set(TRANSACTION_COLUMNS)) if transaction else None
+
+    return await cache.get_or_load(transaction_key(transaction_id), load)
+
+
+async def invalidate_transaction(transaction_id: int) -> None:
+    await cache.invalidate(transaction_key(transaction_id))
+
+
+async def create_transaction(data: dict) -> dict:
+    """Cria a transação num único INSERT; um usuário inexistente sobe como `ForeignKeyViolationError`."""
+    if repository.DB_FAST_PATH:
+        return await repository.create_transaction(data)
+    table = Transaction.ormar_config.table
+    return await _fetch_one(insert(table).values(**data).returning(*_returning()))
+
+
+async def update_transaction(transaction_id: int, data: dict) -> Optional[dict]:
+    """Atualiza a transação num único `UPDATE ... RETURNING`; devolve `None` se ela não existe.
+
+    Um usuário inexistente sobe como `ForeignKeyViolationError`.
+    """
+    if repository.DB_FAST_PATH:
+        updated = await repository.update_transaction(transaction_id, data)
+    else:
+        table = Transaction.ormar_config.table
+        query = update(table).where(table.c.id == transaction_id).values(**data).returning(*_returning())
+        updated = await _fetch_one(query)
+    await invalidate_transaction(transaction_id)
+    return updated
+
+
+async def delete_transaction(transaction_id: int) -> bool:
+    if repository.DB_FAST_PATH:
+        deleted = await repository.delete_transaction(transaction_id)
+    else:
+        table = Transaction.ormar_config.table
+        query = delete(table).where(table.c.id == transaction_id).returning(table.c.id)
+        deleted = await database.fetch_one(query) is not None
+    await invalidate_transaction(transaction_id)
+    return deleted
+
+
+async def insert_transactions(items: List[TransactionCreate]) -> List[Union[dict, RowError]]:
+    """Insere um lote de transações em duas idas ao banco.
+
+    Os usuários referenciados são verificados com um único `IN` e as linhas válidas
+    entram num único INSERT multi-linha. Devolve, na ordem de entrada, a transação
+    criada ou o `RowError` do item.
+    """
+    if not items:
+        return []
+
+    user_table = User.ormar_config.table
+    table = Transaction.ormar_config.table
+
+    user_ids = {item.user for item in items}
+    rows = await database.fetch_all(select(user_table.c.id).where(user_table.c.id.in_(user_ids)))
+    existing = {row[0] for row in rows}
+
+    valid = [item.dict() for item in items if item.user in existing]
+    created = []
+    if valid:
+        query = insert(table).values(valid).returning(*_returning())
+        try:
+            created = sorted((dict(row._mapping) for row in await database.fetch_all(query)), key=lambda row: row["id"])
+        except (CheckViolationError, ForeignKeyViolationError):
+            # Um item estourou o limite de crédito (ou o usuário sumiu): o INSERT inteiro foi
+            # desfeito, então refaz o grupo linha a linha para isolar quem falhou
+            created = [await _insert_one(data) for data in valid]
+
+    # Os ids seriais saem na mesma ordem do VALUES, então basta reencaixar nas posições válidas
+    created_iter = iter(created)
+    return [next(created_iter) if item.user in existing else RowError(404, USER_NOT_FOUND) for item in items]
+
+
+async def _insert_one(data: dict) -> Union[dict, RowError]:
+    table = Transaction.ormar_config.table
+    try:
+        return await _fetch_one(insert(table).values(**data).returning(*_returning()))
+    except ForeignKeyViolationError:
+        return RowError(404, USER_NOT_FOUND)
+    except CheckViolationError:
+        return RowError(422, CREDIT_LIMIT_EXCEEDED)
+
+
+async def ingest_transactions(payloads: AsyncIterator[object]) -> List[dict]:
+    """Valida e insere transações em blocos de `BULK_CHUNK_SIZE`, com um resultado por item."""
+    results = []
+    pending = []
+
+    async def flush():
+        created = await insert_transactions([item for _, item in pending])
+        for (index, _), row in zip(pending, created):
+            if isinstance(row, RowError):
+                results.append({"index": index, "status": row.status, "detail": row.detail})
+            else:
+                results.append({"index": index, "status": 201, "id": row["id"]})
+        pending.clear()
+
+    index = 0
+    async for payload in payloads:
+        try:
+            pending.append((index, TransactionCreate.parse_obj(payload)))
+        except ValidationError as exc:
+            results.append({"index": index, "status": 422, "detail": str(exc)})
+        index += 1
+        if len(pending) >= BULK_CHUNK_SIZE:
+            await flush()
+
+    if pending:
+        await flush()
+
+    results.sort(key=lambda result: result["index"])
+    return results
@@ -0,0 +1,95 @@
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+from database import repository
+from database.postgres import database
+from models.models import User
+from services.cache import cache
+from services.passwords import hasher
+
+# Colunas devolvidas (e guardadas no cache): o hash da senha só é lido pelo login
+USER_COLUMNS = ("id", "name", "email")
+
+
+def user_key(user_id: int) -> str:
+    return cache.key("user", user_id)
+
+
+def _returning():
+    table = User.ormar_config.table
+    return [table.c[name] for name in USER_COLUMNS]
+
+
+async def _fetch_one(query) -> Optional[dict]:
+    row = await database.fetch_one(query)
+    return dict(row._mapping) if row is not None else None
+
+
+async def get_user(user_id: int) -> Optional[dict]:
+    """Busca o usuário pelo id passando pelo cache (read-through)."""
+
+    async def load():
+        if repository.DB_FAST_PATH:
+            return await repository.get_user(user_id)
+        user = await User.objects.get_or_none(id=user_id)
+        return user.dict(include=set(USER_COLUMNS)) if user else None
+
+    return await cache.get_or_load(user_key(user_id), load)
+
+
+async def invalidate_user(user_id: int) -> None:
+    await cache.invalidate(user_key(user_id))
+
+
+async def create_user(data: dict) -> Optional[dict]:
+    """Cria o usuário num único INSERT; devolve `None` se o email já existe.
+
+    O `ON CONFLICT` resolve a unicidade no banco, sem a corrida do "consulta e depois
+    insere" entre as réplicas. A senha é gravada como hash bcrypt, calculado fora do event loop.
+    """
+    data = {**data, "password": await hasher.hash(data["password"])}
+    if repository.DB_FAST_PATH:
+        return await repository.create_user(data)
+    table = User.ormar_config.table
+    query = insert(table).values(**data).on_conflict_do_nothing(index_elements=[table.c.email]).returning(*_returning())
+    return await _fetch_one(query)
+
+
+async def update_user(user_id: int, data: dict) -> Optional[dict]:
+    """Atualiza o usuário num único `UPDATE ... RETURNING`; devolve `None` se ele não existe.
+
+    Um email repetido sobe como `UniqueViolationError`.
+    """
+    data = {**data, "password": await hasher.hash(data["password"])}
+    if repository.DB_FAST_PATH:
+        updated = await repository.update_user(user_id, data)
+    else:
+        table = User.ormar_config.table
+        updated = await _fetch_one(update(table).where(table.c.id == user_id).values(**data).returning(*_returning()))
+    await invalidate_user(user_id)
+    return updated
+
+
+async def delete_user(user_id: int) -> bool:
+    if repository.DB_FAST_PATH:
+        deleted = await repository.delete_user(user_id)
+    else:
+        table = User.ormar_config.table
+        deleted = await database.fetch_one(delete(table).where(table.c.id == user_id).returning(table.c.id)) is not None
+    await invalidate_user(user_id)
+    return deleted
+
+
+async def verify_credentials(email: str, password: str) -> Optional[dict]:
+    """Devolve o usuário se a senha confere com o hash gravado; senão, `None`."""
+    table = User.ormar_config.table
+    user = await _fetch_one(select(*_returning(), table.c.password).where(table.c.email == email))
+    if user is None:
+        # Mesmo custo do bcrypt de um email cadastrado, para o tempo não entregar quais existem
+        await hasher.reject(password)
+        return None
+    if not await hasher.verify(password, user.pop("password")):
+        return None
+    return user
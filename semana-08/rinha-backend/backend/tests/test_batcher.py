@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from schemas.schemas import TransactionCreate
+from services import batcher as batcher_module
+from services.batcher import BatcherBusy, TransactionBatcher
+
+
+def transaction(user: int = 1) -> TransactionCreate:
+    return TransactionCreate(amount=10, timestamp="2024-01-01T00:00:00+00:00", status="pending", user=user)
+
+
+def test_full_queue_rejects_immediately(monkeypatch):
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_insert(items):
+            await release.wait()
+            return [{"id": index} for index, _ in enumerate(items)]
+
+        monkeypatch.setattr(batcher_module, "insert_transactions", slow_insert)
+        batcher = TransactionBatcher(True, max_size=1, max_delay_ms=1, queue_size=2)
+        await batcher.start()
+        # Um grupo preso no flush e dois na fila: o próximo não cabe
+        waiting = [asyncio.ensure_future(batcher.submit(transaction()))]
+        await asyncio.sleep(0.01)
+        waiting += [asyncio.ensure_future(batcher.submit(transaction())) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(BatcherBusy):
+            await batcher.submit(transaction())
+        assert batcher.rejected == 1
+        release.set()
+        assert len(await asyncio.gather(*waiting)) == 3
+        await batcher.stop()
+
+    asyncio.run(scenario())
+
+
+def test_stop_flushes_queued_transactions(monkeypatch):
+    async def scenario():
+        flushed = []
+
+        async def insert(items):
+            flushed.append(len(items))
+            return [{"id": index} for index, _ in enumerate(items)]
+
+        monkeypatch.setattr(batcher_module, "insert_transactions", insert)
+        # Intervalo longo: nada seria gravado antes do stop
+        batcher = TransactionBatcher(True, max_size=100, max_delay_ms=60_000)
+        await batcher.start()
+        waiting = [asyncio.ensure_future(batcher.submit(transaction())) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        await batcher.stop()
+        assert len(await asyncio.gather(*waiting)) == 5
+        assert sum(flushed) == 5
+        with pytest.raises(BatcherBusy):
+            await batcher.submit(transaction())
+
+    asyncio.run(scenario())
+
+
+def test_stop_fails_transactions_that_could_not_be_flushed(monkeypatch):
+    async def scenario():
+        async def hung_insert(items):
+            await asyncio.Event().wait()
+
+        monkeypatch.setattr(batcher_module, "insert_transactions", hung_insert)
+        monkeypatch.setattr(batcher_module, "BATCHER_STOP_TIMEOUT", 0.05)
+        batcher = TransactionBatcher(True, max_size=1, max_delay_ms=1)
+        await batcher.start()
+        waiting = [asyncio.ensure_future(batcher.submit(transaction())) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        await batcher.stop()
+        results = await asyncio.gather(*waiting, return_exceptions=True)
+        assert all(isinstance(result, BatcherBusy) for result in results)
+
+    asyncio.run(scenario())
@@ -0,0 +1,225 @@
+import asyncio
+
+import fakeredis
+
+from database import repository
+from database.redis import RedisError
+from services import transactions, users
+from services.cache import Cache, LocalCache
+
+
+class FailingRedis:
+    """Redis que falha em todo comando, como um servidor fora do ar."""
+
+    async def mget(self, *keys):
+        raise RedisError("connection refused")
+
+    def register_script(self, source: str):
+        async def script(keys, args):
+            raise RedisError("connection refused")
+
+        return script
+
+
+class Loader:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def make_cache(**kwargs) -> Cache:
+    return Cache(fakeredis.FakeAsyncRedis(decode_responses=True), local=LocalCache(size=0), **kwargs)
+
+
+def test_miss_then_hit():
+    async def scenario():
+        cache = make_cache()
+        load = Loader({"id": 1, "name": "ana"})
+        assert await cache.get_or_load("rinha:user:1", load) == {"id": 1, "name": "ana"}
+        assert await cache.get_or_load("rinha:user:1", load) == {"id": 1, "name": "ana"}
+        assert load.calls == 1
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_absent_values_are_not_cached():
+    async def scenario():
+        cache = make_cache()
+        load = Loader(None)
+        assert await cache.get_or_load("rinha:user:1", load) is None
+        assert await cache.get_or_load("rinha:user:1", load) is None
+        assert load.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_entries_expire_after_ttl():
+    async def scenario():
+        cache = make_cache(ttl=1)
+        load = Loader({"id": 1})
+        await cache.get_or_load("rinha:user:1", load)
+        assert await cache.client.ttl("rinha:user:1") == 1
+        await asyncio.sleep(1.1)
+        await cache.get_or_load("rinha:user:1", load)
+        assert load.calls == 2
+        assert cache.misses == 2
+
+    asyncio.run(scenario())
+
+
+def test_user_update_and_delete_invalidate(monkeypatch):
+    async def scenario():
+        cache = make_cache()
+        monkeypatch.setattr(users, "cache", cache)
+        stored = {"id": 1, "name": "ana", "email": "ana@x.com", "password": "hash"}
+
+        async def get_user(user_id):
+            return dict(stored)
+
+        async def update_user(user_id, data):
+            stored.update(data)
+            return dict(stored)
+
+        async def delete_user(user_id):
+            return True
+
+        async def hash_password(password):
+            return "hash:" + password
+
+        monkeypatch.setattr(repository, "DB_FAST_PATH", True)
+        monkeypatch.setattr(repository, "get_user", get_user)
+        monkeypatch.setattr(repository, "update_user", update_user)
+        monkeypatch.setattr(repository, "delete_user", delete_user)
+        monkeypatch.setattr(users.hasher, "hash", hash_password)
+
+        await users.get_user(1)
+        assert await cache.client.exists("rinha:user:1")
+        await users.update_user(1, {"name": "bia", "email": "ana@x.com", "password": "s"})
+        assert not await cache.client.exists("rinha:user:1")
+        assert (await users.get_user(1))["name"] == "bia"
+
+        await users.delete_user(1)
+        assert not await cache.client.exists("rinha:user:1")
+
+    asyncio.run(scenario())
+
+
+def test_transaction_update_and_delete_invalidate(monkeypatch):
+    async def scenario():
+        cache = make_cache()
+        monkeypatch.setattr(transactions, "cache", cache)
+        stored = {"id": 7, "amount": 10.0, "timestamp": "2024-01-01T00:00:00+00:00", "status": "pending"}
+
+        async def get_transaction(transaction_id):
+            return dict(stored)
+
+        async def update_transaction(transaction_id, data):
+            stored.update(data)
+            return dict(stored)
+
+        async def delete_transaction(transaction_id):
+            return True
+
+        monkeypatch.setattr(repository, "DB_FAST_PATH", True)
+        monkeypatch.setattr(repository, "get_transaction", get_transaction)
+        monkeypatch.setattr(repository, "update_transaction", update_transaction)
+        monkeypatch.setattr(repository, "delete_transaction", delete_transaction)
+
+        await transactions.get_transaction(7)
+        await transactions.update_transaction(7, {"status": "completed"})
+        assert not await cache.client.exists("rinha:transaction:7")
+        assert (await transactions.get_transaction(7))["status"] == "completed"
+
+        await transactions.delete_transaction(7)
+        assert not await cache.client.exists("rinha:transaction:7")
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_loads_share_one_query():
+    async def scenario():
+        cache = make_cache(single_flight=True)
+        release = asyncio.Event()
+        calls = 0
+
+        async def slow_load():
+            nonlocal calls
+            calls += 1
+            await release.wait()
+            return {"id": 1}
+
+        readers = [asyncio.ensure_future(cache.get_or_load("rinha:user:1", slow_load)) for _ in range(10)]
+        await asyncio.sleep(0.01)
+        release.set()
+        assert await asyncio.gather(*readers) == [{"id": 1}] * 10
+        assert calls == 1
+        assert cache.coalesced == 9
+        assert not cache.inflight
+
+    asyncio.run(scenario())
+
+
+def test_invalidation_detaches_inflight_load():
+    async def scenario():
+        cache = make_cache(single_flight=True)
+        release = asyncio.Event()
+        load = Loader({"id": 1, "name": "old"})
+
+        async def slow_load():
+            await release.wait()
+            return await load()
+
+        first = asyncio.ensure_future(cache.get_or_load("rinha:user:1", slow_load))
+        await asyncio.sleep(0)
+        await cache.invalidate("rinha:user:1")
+        # Leitura depois da escrita não pega carona na busca antiga
+        load.value = {"id": 1, "name": "new"}
+        second = asyncio.ensure_future(cache.get_or_load("rinha:user:1", slow_load))
+        release.set()
+        await first
+        assert (await second)["name"] == "new"
+        assert cache.coalesced == 0
+
+    asyncio.run(scenario())
+
+
+def test_invalidation_during_load_keeps_the_old_value_out():
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        cache = Cache(client, local=LocalCache(size=0), single_flight=False)
+        # A outra instância compartilha o Redis e invalida no meio da busca
+        other = Cache(client, local=LocalCache(size=0))
+        load = Loader({"id": 1, "name": "new"})
+
+        async def racing_load():
+            await other.invalidate("rinha:user:1")
+            return {"id": 1, "name": "old"}
+
+        assert (await cache.get_or_load("rinha:user:1", racing_load))["name"] == "old"
+        assert not await client.exists("rinha:user:1")
+        assert cache.stale_writes == 1
+        assert 0 < await client.ttl("rinha:user:1:v") <= 60
+        # A próxima leitura busca de novo e volta a preencher o cache
+        assert (await cache.get_or_load("rinha:user:1", load))["name"] == "new"
+        assert await client.exists("rinha:user:1")
+
+    asyncio.run(scenario())
+
+
+def test_redis_errors_fall_back_to_the_database():
+    async def scenario():
+        cache = Cache(FailingRedis(), local=LocalCache(size=0))
+        load = Loader({"id": 1})
+        assert await cache.get_or_load("rinha:user:1", load) == {"id": 1}
+        assert await cache.get_or_load("rinha:user:1", load) == {"id": 1}
+        await cache.invalidate("rinha:user:1")
+        assert load.calls == 2
+        assert cache.errors == 3
+        assert (cache.hits, cache.misses) == (0, 0)
+
+    asyncio.run(scenario())
@@ -0,0 +1,41 @@
+import gzip
+import uuid
+
+import httpx
+
+from database.postgres import database
+
+CREATE_USER = """
+INSERT INTO "user" (name, email, password) VALUES ('export', $1, 'x') RETURNING id
+"""
+CREATE_TRANSACTIONS = """
+INSERT INTO transaction (amount, timestamp, status, "user")
+SELECT g, now(), 'completed', $2 FROM generate_series(1, $1) g
+"""
+
+
+def test_csv_export_plain_and_gzip(with_database):
+    from main import app
+
+    async def scenario():
+        async with database.connection() as connection:
+            raw = connection.raw_connection
+            user_id = await raw.fetchval(CREATE_USER, f"export-{uuid.uuid4().hex}@test.local")
+            try:
+                await raw.execute(CREATE_TRANSACTIONS, 3, user_id)
+                async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                    plain = await client.get("/transactions/export", params={"user": user_id})
+                    compressed = await client.get("/transactions/export", params={"user": user_id, "gzip": "true"})
+            finally:
+                await raw.execute('DELETE FROM transaction WHERE "user" = $1', user_id)
+                await raw.execute('DELETE FROM "user" WHERE id = $1', user_id)
+
+        assert plain.status_code == 200, plain.text
+        assert plain.headers["content-type"].startswith("text/csv")
+        lines = plain.text.splitlines()
+        assert lines[0] == "id,amount,timestamp,status,user"
+        assert [line.split(",")[1] for line in lines[1:]] == ["1", "2", "3"]
+        assert compressed.status_code == 200
+        assert gzip.decompress(compressed.content) == plain.content
+
+    with_database(scenario)
@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from database.replicas import read_from_replica
+from services import feed as feed_module
+from services.feed import TransactionFeed, stream_events
+
+
+class StubDatabase:
+    """Só o necessário para a reposição do histórico: `connection().raw_connection.fetch`."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        # Valor de `read_from_replica` em cada consulta: a reposição tem que ir ao primário
+        self.from_replica = []
+
+    def connection(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    def raw_connection(self):
+        return self
+
+    async def fetch(self, query, after, user, status, limit):
+        self.from_replica.append(read_from_replica.get())
+        return [row for row in self.rows if row["id"] > after][:limit]
+
+
+def make_feed(monkeypatch) -> TransactionFeed:
+    async def idle():
+        await asyncio.Event().wait()
+
+    feed = TransactionFeed(queue_size=100)
+    # Sem Postgres: o LISTEN é simulado setando `listening` e chamando `_notify`
+    monkeypatch.setattr(feed, "_run", idle)
+    return feed
+
+
+def notify(feed: TransactionFeed, op: str, transaction_id: int) -> None:
+    event = {"op": op, "id": transaction_id, "amount": 1.0, "timestamp": None, "status": "pending", "user": 1}
+    feed._notify(None, 0, "transaction_feed", json.dumps(event))
+
+
+def row(transaction_id: int) -> dict:
+    return {"id": transaction_id, "amount": 1.0, "timestamp": None, "status": "pending", "user": 1}
+
+
+def test_replay_waits_for_listen(monkeypatch):
+    async def scenario():
+        feed = make_feed(monkeypatch)
+        database = StubDatabase([row(6)])
+        monkeypatch.setattr(feed_module, "database", database)
+        # Como numa GET liberada para a réplica pelo middleware
+        read_from_replica.set(True)
+        stream = stream_events(feed, None, None, 5, heartbeat=10)
+        first = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0.05)
+        assert not first.done()
+        feed.listening.set()
+        assert (await first).startswith("retry:")
+        assert "id: 6\n" in await stream.__anext__()
+        await stream.aclose()
+        assert database.from_replica and not any(database.from_replica)
+        assert not feed.subscribers
+
+    asyncio.run(scenario())
+
+
+def test_live_events_dedupe_against_the_replay(monkeypatch):
+    async def scenario():
+        feed = make_feed(monkeypatch)
+        feed.listening.set()
+        # 7 ainda não estava commitado quando a reposição leu o banco
+        monkeypatch.setattr(feed_module, "database", StubDatabase([row(6), row(8)]))
+        stream = stream_events(feed, None, None, 5, heartbeat=10)
+        await stream.__anext__()  # retry; já assinado
+        for op, transaction_id in (("INSERT", 8), ("INSERT", 7), ("UPDATE", 6), ("INSERT", 9)):
+            notify(feed, op, transaction_id)
+        messages = [await stream.__anext__() for _ in range(5)]
+        await stream.aclose()
+
+        ids = [json.loads(message.split("data: ")[1])["id"] for message in messages]
+        assert ids == [6, 8, 7, 6, 9]
+        # O Last-Event-ID só avança: o 7, atrasado, e a atualização vão sem `id:`
+        assert [message.startswith("id: ") for message in messages] == [True, True, False, False, True]
+
+    asyncio.run(scenario())
@@ -0,0 +1,96 @@
+import uuid
+
+import pytest
+from asyncpg.exceptions import CheckViolationError
+
+from database.postgres import database
+from services import ledger
+
+CREATE_USER = """
+INSERT INTO "user" (name, email, password) VALUES ('ledger', $1, 'x') RETURNING id
+"""
+CREATE_TRANSACTION = """
+INSERT INTO transaction (amount, timestamp, status, "user") VALUES ($1, now(), $2, $3) RETURNING id
+"""
+
+
+async def create_user(raw, credit_limit=None) -> int:
+    user_id = await raw.fetchval(CREATE_USER, f"ledger-{uuid.uuid4().hex}@test.local")
+    if credit_limit is not None:
+        await ledger.set_credit_limit(user_id, credit_limit)
+    return user_id
+
+
+async def balance(user_id: int) -> float:
+    return (await ledger.get_balance(user_id))["balance"]
+
+
+async def cleanup(raw, user_id: int) -> None:
+    # Débitos antes dos créditos: apagar um crédito primeiro pode furar o limite no meio do caminho
+    await raw.execute('DELETE FROM transaction WHERE "user" = $1 AND amount < 0', user_id)
+    await raw.execute('DELETE FROM transaction WHERE "user" = $1', user_id)
+    await raw.execute('DELETE FROM "user" WHERE id = $1', user_id)
+
+
+def test_amount_edit_checks_only_the_final_balance(with_database):
+    async def scenario():
+        async with database.connection() as connection:
+            raw = connection.raw_connection
+            user_id = await create_user(raw, credit_limit=50)
+            try:
+                credit = await raw.fetchval(CREATE_TRANSACTION, 100, "completed", user_id)
+                await raw.fetchval(CREATE_TRANSACTION, -100, "completed", user_id)
+                # Saldo final -10, dentro do limite: o passo intermediário (-100) não pode contar
+                await raw.execute("UPDATE transaction SET amount = 90 WHERE id = $1", credit)
+                assert await balance(user_id) == -10
+                with pytest.raises(CheckViolationError):
+                    await raw.execute("UPDATE transaction SET amount = 40 WHERE id = $1", credit)
+                assert await balance(user_id) == -10
+            finally:
+                await cleanup(raw, user_id)
+
+    with_database(scenario)
+
+
+def test_status_changes_only_count_when_failed(with_database):
+    async def scenario():
+        async with database.connection() as connection:
+            raw = connection.raw_connection
+            user_id = await create_user(raw, credit_limit=0)
+            try:
+                credit = await raw.fetchval(CREATE_TRANSACTION, 100, "pending", user_id)
+                debit = await raw.fetchval(CREATE_TRANSACTION, -100, "pending", user_id)
+                # Saldo zerado e sem folga no limite: pending -> completed não pode passar pela CHECK
+                await raw.execute("UPDATE transaction SET status = 'completed' WHERE \"user\" = $1", user_id)
+                assert await balance(user_id) == 0
+                with pytest.raises(CheckViolationError):
+                    await raw.execute("UPDATE transaction SET status = 'failed' WHERE id = $1", credit)
+                await raw.execute("UPDATE transaction SET status = 'failed' WHERE id = $1", debit)
+                assert await balance(user_id) == 100
+                await raw.execute("UPDATE transaction SET status = 'failed' WHERE id = $1", credit)
+                assert await balance(user_id) == 0
+                await raw.execute("UPDATE transaction SET status = 'completed' WHERE id = $1", credit)
+                assert await balance(user_id) == 100
+            finally:
+                await cleanup(raw, user_id)
+
+    with_database(scenario)
+
+
+def test_moving_a_transaction_between_users(with_database):
+    async def scenario():
+        async with database.connection() as connection:
+            raw = connection.raw_connection
+            first = await create_user(raw)
+            second = await create_user(raw)
+            try:
+                transaction_id = await raw.fetchval(CREATE_TRANSACTION, 30, "completed", first)
+                await raw.execute('UPDATE transaction SET "user" = $1, amount = 20 WHERE id = $2', second, transaction_id)
+                assert (await balance(first), await balance(second)) == (0, 20)
+                await raw.execute("DELETE FROM transaction WHERE id = $1", transaction_id)
+                assert await balance(second) == 0
+            finally:
+                await cleanup(raw, first)
+                await cleanup(raw, second)
+
+    with_database(scenario)
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from schemas.schemas import Credentials, UserCreate, UserPublicSchema
+from services import users
+from services.passwords import PasswordHasher
+
+
+def test_password_longer_than_bcrypt_limit_is_rejected():
+    UserCreate(name="ana", email="ana@x.com", password="a" * 72)
+    with pytest.raises(ValidationError):
+        UserCreate(name="ana", email="ana@x.com", password="a" * 73)
+    # O limite é em bytes: 37 caracteres de 2 bytes já passam de 72
+    with pytest.raises(ValidationError):
+        UserCreate(name="ana", email="ana@x.com", password="é" * 37)
+    with pytest.raises(ValidationError):
+        Credentials(email="ana@x.com", password="a" * 73)
+
+
+def test_hash_and_verify():
+    async def scenario():
+        hasher = PasswordHasher(rounds=4, workers=0)
+        hashed = await hasher.hash("s3cret")
+        assert hashed.startswith("$2b$04$")
+        assert await hasher.verify("s3cret", hashed)
+        assert not await hasher.verify("wrong", hashed)
+
+    asyncio.run(scenario())
+
+
+def test_plaintext_passwords_need_the_migration_flag():
+    async def scenario():
+        assert not await PasswordHasher(rounds=4, workers=0).verify("legacy", "legacy")
+        assert await PasswordHasher(rounds=4, workers=0, plaintext_fallback=True).verify("legacy", "legacy")
+
+    asyncio.run(scenario())
+
+
+def test_unknown_email_still_pays_for_bcrypt(monkeypatch):
+    async def scenario():
+        hasher = PasswordHasher(rounds=4, workers=0)
+        checked = []
+
+        async def no_user(query):
+            return None
+
+        def spy_verify(password, hashed):
+            checked.append(hashed)
+            return False
+
+        monkeypatch.setattr(users, "hasher", hasher)
+        monkeypatch.setattr(users, "_fetch_one", no_user)
+        monkeypatch.setattr("services.passwords._verify", spy_verify)
+        assert await users.verify_credentials("nobody@x.com", "s3cret") is None
+        assert await users.verify_credentials("nobody@x.com", "other") is None
+        # Um bcrypt de verdade por tentativa, sempre contra o mesmo hash descartável
+        assert len(checked) == 2 and checked[0] == checked[1]
+        assert checked[0].startswith("$2b$04$")
+
+    asyncio.run(scenario())
+
+
+def test_login_never_returns_the_hash(monkeypatch):
+    async def scenario():
+        hasher = PasswordHasher(rounds=4, workers=0)
+        row = {"id": 1, "name": "ana", "email": "ana@x.com", "password": await hasher.hash("s3cret")}
+
+        async def fetch_user(query):
+            return dict(row)
+
+        monkeypatch.setattr(users, "hasher", hasher)
+        monkeypatch.setattr(users, "_fetch_one", fetch_user)
+        user = await users.verify_credentials("ana@x.com", "s3cret")
+        assert user == {"id": 1, "name": "ana", "email": "ana@x.com"}
+        assert UserPublicSchema(**row).model_dump() == user
+
+    asyncio.run(scenario())
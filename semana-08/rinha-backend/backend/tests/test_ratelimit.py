@@ -0,0 +1,164 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from database.redis import RedisError
+from middleware.ratelimit import LocalBuckets, RateLimiter, RateLimitMiddleware, parse_limit, parse_rules
+
+RULES = "POST /transactions/bulk=1/3"
+API_KEYS = frozenset({"partner"})
+
+
+class FailingRedis:
+    def register_script(self, source: str):
+        async def script(keys, args):
+            raise RedisError("connection refused")
+
+        return script
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def request(path: str = "/users/1", method: str = "GET", ip: str = "10.0.0.1", api_key: str = None) -> dict:
+    headers = [(b"x-real-ip", ip.encode())]
+    if api_key is not None:
+        headers.append((b"x-api-key", api_key.encode()))
+    return {"type": "http", "method": method, "path": path, "headers": headers, "client": ("172.18.0.2", 40000)}
+
+
+async def call(asgi_app, scope: dict) -> dict:
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await asgi_app(scope, receive, send)
+    return messages[0]
+
+
+async def count_allowed(asgi_apps: list, scopes, count: int) -> int:
+    allowed = 0
+    for index in range(count):
+        scope = scopes(index) if callable(scopes) else scopes
+        # Alterna entre as instâncias, como o round-robin do Nginx
+        allowed += (await call(asgi_apps[index % len(asgi_apps)], scope))["status"] == 200
+    return allowed
+
+
+def instances(client, limit: str = "0.01/10", count: int = 2) -> list:
+    # Taxa baixa: nada é reabastecido durante o teste
+    return [RateLimitMiddleware(app, RateLimiter(client, limit, RULES), api_keys=API_KEYS) for _ in range(count)]
+
+
+def test_burst_is_shared_by_all_instances():
+    async def scenario():
+        apps = instances(fakeredis.FakeAsyncRedis(decode_responses=True))
+        assert await count_allowed(apps, request(), 30) == 10
+        assert all(limited.limiter.fallbacks == 0 for limited in apps)
+
+    asyncio.run(scenario())
+
+
+def test_each_ip_has_its_own_bucket():
+    async def scenario():
+        apps = instances(fakeredis.FakeAsyncRedis(decode_responses=True))
+        assert await count_allowed(apps, request(ip="10.0.0.1"), 30) == 10
+        assert await count_allowed(apps, request(ip="10.0.0.2"), 30) == 10
+
+    asyncio.run(scenario())
+
+
+def test_unknown_api_keys_do_not_bypass_the_ip_limit():
+    async def scenario():
+        apps = instances(fakeredis.FakeAsyncRedis(decode_responses=True))
+        assert await count_allowed(apps, lambda index: request(api_key=str(index)), 30) == 10
+
+    asyncio.run(scenario())
+
+
+def test_known_api_key_is_limited_across_ips():
+    async def scenario():
+        apps = instances(fakeredis.FakeAsyncRedis(decode_responses=True))
+        assert await count_allowed(apps, lambda index: request(ip=f"10.0.1.{index}", api_key="partner"), 30) == 10
+        # O IP de quem usou a key segue com o bucket inteiro
+        assert await count_allowed(apps, request(ip="10.0.1.1"), 30) == 10
+
+    asyncio.run(scenario())
+
+
+def test_route_rule_and_exempt_routes():
+    async def scenario():
+        apps = instances(fakeredis.FakeAsyncRedis(decode_responses=True))
+        assert await count_allowed(apps, request("/transactions/bulk", "POST"), 30) == 3
+        assert await count_allowed(apps, request("/ping"), 30) == 30
+
+    asyncio.run(scenario())
+
+
+def test_rejection_carries_retry_after():
+    async def scenario():
+        limited = RateLimitMiddleware(app, RateLimiter(fakeredis.FakeAsyncRedis(decode_responses=True), "0.5/1", ""))
+        assert (await call(limited, request()))["status"] == 200
+        rejected = await call(limited, request())
+        assert rejected["status"] == 429
+        # 1 token a 0,5/s: 2 s até o próximo
+        assert dict(rejected["headers"])[b"retry-after"] == b"2"
+
+    asyncio.run(scenario())
+
+
+def test_bucket_refills_over_time():
+    async def scenario():
+        client = fakeredis.FakeAsyncRedis(decode_responses=True)
+        limiter = RateLimiter(client, "20/1", "")
+        assert (await limiter.check(limiter.default, "ip:1"))[0]
+        assert not (await limiter.check(limiter.default, "ip:1"))[0]
+        await asyncio.sleep(0.1)
+        assert (await limiter.check(limiter.default, "ip:1"))[0]
+        # A chave expira sozinha depois que o bucket enche de novo
+        assert 0 < await client.pttl("rinha:rl:*:ip:1") <= 1050
+
+    asyncio.run(scenario())
+
+
+def test_redis_down_falls_back_to_the_instance_share():
+    async def scenario():
+        limiter = RateLimiter(FailingRedis(), "0.01/10", RULES, instances=2)
+        limited = RateLimitMiddleware(app, limiter)
+        assert await count_allowed([limited], request(), 30) == 5
+        # Depois da falha o Redis não é tentado de novo a cada requisição
+        assert limiter.redis_errors == 1
+        assert limiter.fallbacks == 30
+
+    asyncio.run(scenario())
+
+
+def test_local_bucket_retry_after():
+    buckets = LocalBuckets()
+    assert buckets.take("k", 2, 1, now=0) == (True, 0.0)
+    assert buckets.take("k", 2, 1, now=0) == (False, 0.5)
+    assert buckets.take("k", 2, 1, now=0.5) == (True, 0.0)
+
+
+@pytest.mark.parametrize("value", ["0/10", "0", "-1/5", "5/0.5", "nan/10"])
+def test_invalid_limits_are_rejected(value):
+    with pytest.raises(ValueError):
+        parse_limit(value)
+    with pytest.raises(ValueError):
+        parse_rules(f"GET /users={value}")
+
+
+def test_longest_prefix_wins():
+    limiter = RateLimiter(None, "100/200", "* /transactions=10/10,POST /transactions/bulk=1/1")
+    assert [rule.prefix for rule in limiter.rules] == ["/transactions/bulk", "/transactions"]
+    assert limiter.rule_for("POST", "/transactions/bulk").rate == 1
+    assert limiter.rule_for("GET", "/transactions/bulk").rate == 10
+    assert limiter.rule_for("GET", "/users/1") is limiter.default
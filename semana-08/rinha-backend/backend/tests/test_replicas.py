@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+from databases import DatabaseURL
+
+from database.pool import PooledDatabase
+from database.replicas import ReplicaSet
+from middleware.replicas import STICKY_COOKIE, ReplicaRoutingMiddleware
+
+
+class StubReplica:
+    """Réplica sem banco: o health check devolve `lag` ou levanta `error`."""
+
+    def __init__(self, name: str = "replica1", lag: float = 0.0):
+        self.url = DatabaseURL(f"postgresql://{name}:5432/rinha")
+        self.lag = lag
+        self.error = None
+        self.is_connected = False
+        self.marker = object()
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def disconnect(self):
+        self.is_connected = False
+
+    async def fetch_val(self, query):
+        if self.error is not None:
+            raise self.error
+        return self.lag
+
+    def connection(self):
+        return self.marker
+
+    def pool_stats(self):
+        return {"connected": self.is_connected}
+
+
+def make_primary(*replicas, max_lag: float = 5) -> PooledDatabase:
+    primary = PooledDatabase("postgresql://primary:5432/rinha")
+    primary.replicas = ReplicaSet(list(replicas), max_lag=max_lag)
+    return primary
+
+
+def routing_app(primary: PooledDatabase, sticky_seconds: float = 5):
+    routed = []
+
+    async def app(scope, receive, send):
+        routed.append(primary.connection())
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{}"})
+
+    return ReplicaRoutingMiddleware(app, sticky_seconds=sticky_seconds), routed
+
+
+async def call(app, method: str, cookie: bytes = None) -> list:
+    headers = [(b"cookie", cookie)] if cookie else []
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app({"type": "http", "method": method, "path": "/users/1", "headers": headers}, receive, send)
+    return dict(messages[0]["headers"])
+
+
+def test_reads_go_to_the_replica_and_writes_to_the_primary():
+    async def scenario():
+        replica = StubReplica()
+        primary = make_primary(replica)
+        await primary.replicas.check()
+        app, routed = routing_app(primary)
+        await call(app, "GET")
+        await call(app, "POST")
+        await call(app, "DELETE")
+        assert routed[0] is replica.marker
+        assert all(connection is not replica.marker for connection in routed[1:])
+        assert primary.replicas.replicas[0].routed == 1
+
+    asyncio.run(scenario())
+
+
+def test_reads_round_robin_between_healthy_replicas():
+    async def scenario():
+        replicas = [StubReplica("replica1"), StubReplica("replica2")]
+        primary = make_primary(*replicas)
+        await primary.replicas.check()
+        app, routed = routing_app(primary)
+        for _ in range(4):
+            await call(app, "GET")
+        assert routed == [replicas[0].marker, replicas[1].marker] * 2
+
+    asyncio.run(scenario())
+
+
+def test_client_reads_its_writes_from_the_primary():
+    async def scenario():
+        replica = StubReplica()
+        primary = make_primary(replica)
+        await primary.replicas.check()
+        app, routed = routing_app(primary, sticky_seconds=5)
+
+        headers = await call(app, "POST")
+        cookie = headers[b"set-cookie"].split(b";")[0]
+        assert cookie.startswith(STICKY_COOKIE.encode() + b"=")
+        await call(app, "GET", cookie)
+        assert routed[-1] is not replica.marker
+
+        # Passada a janela, o mesmo cliente volta para a réplica
+        expired = f"{STICKY_COOKIE}={time.time() - 1:.3f}".encode()
+        await call(app, "GET", b"theme=dark; " + expired)
+        assert routed[-1] is replica.marker
+
+    asyncio.run(scenario())
+
+
+def test_no_sticky_cookie_when_disabled():
+    async def scenario():
+        app, _ = routing_app(make_primary(StubReplica()), sticky_seconds=0)
+        assert b"set-cookie" not in await call(app, "POST")
+
+    asyncio.run(scenario())
+
+
+def test_failed_health_check_falls_back_to_the_primary():
+    async def scenario():
+        replica = StubReplica()
+        primary = make_primary(replica)
+        await primary.replicas.check()
+        app, routed = routing_app(primary)
+
+        replica.error = OSError("connection refused")
+        await primary.replicas.check()
+        await call(app, "GET")
+        assert routed[-1] is not replica.marker
+        assert primary.replicas.fallbacks == 1
+        assert primary.replicas.stats()["replicas"][0]["error"] == "connection refused"
+
+        # Voltou: entra de novo na rotação na próxima checagem
+        replica.error = None
+        await primary.replicas.check()
+        await call(app, "GET")
+        assert routed[-1] is replica.marker
+
+    asyncio.run(scenario())
+
+
+def test_lagging_replica_leaves_the_rotation():
+    async def scenario():
+        replica = StubReplica(lag=30)
+        primary = make_primary(replica, max_lag=5)
+        await primary.replicas.check()
+        app, routed = routing_app(primary)
+        await call(app, "GET")
+        assert routed[-1] is not replica.marker
+        assert not primary.replicas.replicas[0].healthy
+
+    asyncio.run(scenario())
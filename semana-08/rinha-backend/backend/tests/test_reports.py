@@ -0,0 +1,52 @@
+import uuid
+
+from database.postgres import database
+from services.reports import GroupBy, transaction_report
+
+CREATE_USER = """
+INSERT INTO "user" (name, email, password) VALUES ('reports', $1, 'x') RETURNING id
+"""
+# Todas na mesma hora, para caírem no mesmo bucket do resumo
+CREATE_PENDING = """
+INSERT INTO transaction (amount, timestamp, status, "user")
+SELECT 10, date_trunc('hour', now()), 'pending', $1 FROM generate_series(1, $2)
+"""
+SUMMARY = """
+SELECT status, count, total FROM transaction_summary WHERE user_id = $1 AND count <> 0 ORDER BY status
+"""
+
+
+async def summary(raw, user_id: int) -> list:
+    return [tuple(row) for row in await raw.fetch(SUMMARY, user_id)]
+
+
+def test_summary_follows_each_statement(with_database):
+    async def scenario():
+        async with database.connection() as connection:
+            raw = connection.raw_connection
+            user_id = await raw.fetchval(CREATE_USER, f"reports-{uuid.uuid4().hex}@test.local")
+            try:
+                await raw.execute(CREATE_PENDING, user_id, 5)
+                assert await summary(raw, user_id) == [("pending", 5, 50)]
+
+                await raw.execute(
+                    "UPDATE transaction SET status = 'completed' WHERE id IN "
+                    "(SELECT id FROM transaction WHERE \"user\" = $1 ORDER BY id LIMIT 3)",
+                    user_id,
+                )
+                assert await summary(raw, user_id) == [("completed", 3, 30), ("pending", 2, 20)]
+                # UPDATE que não muda nenhum bucket não altera o resumo
+                await raw.execute('UPDATE transaction SET amount = amount WHERE "user" = $1', user_id)
+                assert await summary(raw, user_id) == [("completed", 3, 30), ("pending", 2, 20)]
+
+                rows = await transaction_report(group_by=[GroupBy.status], user=user_id)
+                assert [(row["status"], row["count"]) for row in rows] == [("completed", 3), ("pending", 2)]
+
+                await raw.execute("DELETE FROM transaction WHERE \"user\" = $1 AND status = 'pending'", user_id)
+                assert await summary(raw, user_id) == [("completed", 3, 30)]
+            finally:
+                await raw.execute('DELETE FROM transaction WHERE "user" = $1', user_id)
+                await raw.execute('DELETE FROM transaction_summary WHERE user_id = $1', user_id)
+                await raw.execute('DELETE FROM "user" WHERE id = $1', user_id)
+
+    with_database(scenario)
@@ -0,0 +1,116 @@
+import asyncio
+import contextvars
+import uuid
+
+from database.postgres import database
+from services import ledger
+from services.settlement import HELD, SettlementWorker
+
+CREATE_USER = """
+INSERT INTO "user" (name, email, password) VALUES ('settlement', $1, 'x') RETURNING id
+"""
+CREATE_PENDING = """
+INSERT INTO transaction (amount, timestamp, status, "user") VALUES ($1, now(), 'pending', $2) RETURNING id
+"""
+# Tudo na mesma hora: os lotes disputam as mesmas linhas de saldo e do resumo
+CREATE_MANY_PENDING = """
+INSERT INTO transaction (amount, timestamp, status, "user")
+SELECT 1, date_trunc('hour', now()), 'pending', $1 FROM generate_series(1, $2)
+"""
+# Recusa liquidar um valor específico, como faria uma regra do banco que a aplicação não conhece
+POISON_FUNCTION = """
+CREATE OR REPLACE FUNCTION test_reject_settlement() RETURNS trigger AS $$
+BEGIN
+    IF NEW.amount = -777.77 AND NEW.status <> 'held' THEN
+        RAISE EXCEPTION 'settlement rejected';
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql
+"""
+POISON_TRIGGER = """
+CREATE TRIGGER test_reject_settlement BEFORE UPDATE OF status ON transaction
+FOR EACH ROW WHEN (OLD.status = 'pending') EXECUTE FUNCTION test_reject_settlement()
+"""
+
+
+async def statuses(raw, user_id: int) -> list:
+    rows = await raw.fetch('SELECT status FROM transaction WHERE "user" = $1 ORDER BY id', user_id)
+    return [row["status"] for row in rows]
+
+
+def worker_for(user_id: int, **kwargs) -> SettlementWorker:
+    # Só as linhas do teste: o banco pode ter outras pendentes
+    return SettlementWorker(users=[user_id], **kwargs)
+
+
+async def with_user(scenario, credit_limit=None):
+    async with database.connection() as connection:
+        raw = connection.raw_connection
+        user_id = await raw.fetchval(CREATE_USER, f"settlement-{uuid.uuid4().hex}@test.local")
+        try:
+            if credit_limit is not None:
+                await ledger.set_credit_limit(user_id, credit_limit)
+            await scenario(raw, user_id)
+        finally:
+            # Débitos antes dos créditos, para o saldo não furar o limite no meio da limpeza
+            await raw.execute('DELETE FROM transaction WHERE "user" = $1 AND amount < 0', user_id)
+            await raw.execute('DELETE FROM transaction WHERE "user" = $1', user_id)
+            await raw.execute("DELETE FROM transaction_summary WHERE user_id = $1", user_id)
+            await raw.execute('DELETE FROM "user" WHERE id = $1', user_id)
+
+
+def test_settling_at_the_credit_limit(with_database):
+    async def scenario(raw, user_id):
+        await raw.fetchval(CREATE_PENDING, 100, user_id)
+        await raw.fetchval(CREATE_PENDING, -150, user_id)
+        await raw.fetchval(CREATE_PENDING, 0, user_id)
+        worker = worker_for(user_id, batch_size=10)
+        assert await worker.run_once() == 3
+        assert await statuses(raw, user_id) == ["completed", "completed", "failed"]
+        assert (await ledger.get_balance(user_id))["balance"] == -50
+
+    with_database(lambda: with_user(scenario, credit_limit=50))
+
+
+def test_rejected_rows_are_held_and_the_rest_settles(with_database):
+    async def scenario(raw, user_id):
+        await raw.execute(POISON_FUNCTION)
+        await raw.execute(POISON_TRIGGER)
+        try:
+            await raw.fetchval(CREATE_PENDING, 10, user_id)
+            await raw.fetchval(CREATE_PENDING, -777.77, user_id)
+            await raw.fetchval(CREATE_PENDING, 20, user_id)
+            worker = worker_for(user_id, batch_size=10)
+            assert await worker.run_once() == 3
+            assert await statuses(raw, user_id) == ["completed", HELD, "completed"]
+            assert (worker.completed, worker.held, worker.errors) == (2, 1, 0)
+            # A linha estacionada não volta na fila
+            assert await worker.run_once() == 0
+        finally:
+            await raw.execute("DROP TRIGGER IF EXISTS test_reject_settlement ON transaction")
+            await raw.execute("DROP FUNCTION IF EXISTS test_reject_settlement()")
+
+    with_database(lambda: with_user(scenario))
+
+
+def test_concurrent_workers_settle_the_same_hour_without_holding(with_database):
+    async def scenario(raw, user_id):
+        await raw.execute(CREATE_MANY_PENDING, user_id, 500)
+        workers = [worker_for(user_id, batch_size=7) for _ in range(4)]
+
+        async def drain(worker):
+            while await worker.run_once():
+                pass
+
+        # Contexto vazio: cada loop pega a própria conexão do pool, como no worker.py, em vez de
+        # herdar a conexão aberta por `with_user`
+        loops = [asyncio.create_task(drain(worker), context=contextvars.Context()) for worker in workers]
+        await asyncio.wait_for(asyncio.gather(*loops), 60)
+        assert await statuses(raw, user_id) == ["completed"] * 500
+        assert sum(worker.completed for worker in workers) == 500
+        assert sum(worker.held + worker.errors for worker in workers) == 0
+        summary = await raw.fetch("SELECT status, count FROM transaction_summary WHERE user_id = $1 AND count <> 0", user_id)
+        assert [tuple(row) for row in summary] == [("completed", 500)]
+
+    with_database(lambda: with_user(scenario))
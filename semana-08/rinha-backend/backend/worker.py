@@ -0,0 +1,61 @@
+"""Worker de liquidação: move as transações "pending" para "completed"/"failed" e fica rodando.
+
+Roda fora das instâncias da API (serviço `worker` do docker-compose); vários processos podem
+rodar lado a lado, cada um com `SETTLEMENT_CONCURRENCY` loops pegando lotes de
+`SETTLEMENT_BATCH_SIZE` com `FOR UPDATE SKIP LOCKED`. Vazão e atraso ficam em
+`http://<worker>:$SETTLEMENT_METRICS_PORT/metrics`, no formato do Prometheus.
+
+    python worker.py
+"""
+import asyncio
+import logging
+import os
+import signal
+
+from database.postgres import database
+from services.settlement import settlement
+
+INSTANCE_NAME = os.getenv("INSTANCE_NAME", "worker")
+SETTLEMENT_METRICS_PORT = int(os.environ.get("SETTLEMENT_METRICS_PORT", "9100"))
+
+logger = logging.getLogger("settlement")
+
+
+async def serve_metrics(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    # Qualquer requisição recebe as métricas: o único cliente é o scrape do Prometheus
+    await reader.readuntil(b"\r\n\r\n")
+    body = ("\n".join(settlement.metrics(f'instance="{INSTANCE_NAME}"')) + "\n").encode()
+    writer.write(
+        b"HTTP/1.1 200 OK\r\ncontent-type: text/plain; version=0.0.4\r\n"
+        + f"content-length: {len(body)}\r\nconnection: close\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    writer.close()
+
+
+async def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await database.connect()
+    server = await asyncio.start_server(serve_metrics, "0.0.0.0", SETTLEMENT_METRICS_PORT)
+    await settlement.start()
+    logger.info(
+        "settling with %d loops, batches of %d, metrics on :%d",
+        settlement.concurrency, settlement.batch_size, SETTLEMENT_METRICS_PORT,
+    )
+    try:
+        await stop.wait()
+    finally:
+        await settlement.stop()
+        server.close()
+        await database.disconnect()
+    logger.info("stopped: %s", settlement.stats())
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
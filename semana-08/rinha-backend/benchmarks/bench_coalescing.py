@@ -0,0 +1,65 @@
+"""Rajadas de GET /users/{id} concorrentes nos mesmos ids: buscas no banco e tempo por modo.
+
+Roda o app ASGI dentro do processo, sem Redis, contra o Postgres de `DATABASE_URL` (já
+migrado). Cada rodada dispara `--concurrency` requisições ao mesmo tempo, espalhadas por
+`--hot-ids` usuários, e compara: sem coalescing, single-flight, e single-flight + LRU local.
+
+    cd backend && python ../benchmarks/bench_coalescing.py --rounds 50 --concurrency 100
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import httpx  # noqa: E402
+
+
+async def main(rounds: int, concurrency: int, hot_ids: int):
+    from main import app
+    from services.cache import LocalCache, cache
+
+    cache.client = None
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            ids = []
+            run_id = int(time.time())
+            for i in range(hot_ids):
+                response = await client.post("/users/", json={"name": "hot", "email": f"hot-{run_id}-{i}@bench.local", "password": "x"})
+                ids.append(response.json()["id"])
+
+            modes = [
+                ("sem coalescing", False, LocalCache(0)),
+                ("single-flight", True, LocalCache(0)),
+                ("single-flight + LRU 1s", True, LocalCache(1000, 1000)),
+            ]
+            for name, single_flight, local in modes:
+                cache.single_flight = single_flight
+                cache.local = local
+                saved_before = cache.stats()["queries_saved"]
+                started = time.perf_counter()
+                for _ in range(rounds):
+                    responses = await asyncio.gather(
+                        *(client.get(f"/users/{random.choice(ids)}") for _ in range(concurrency))
+                    )
+                    assert all(response.status_code == 200 for response in responses)
+                elapsed = time.perf_counter() - started
+                requests = rounds * concurrency
+                queries = requests - (cache.stats()["queries_saved"] - saved_before)
+                print(f"  {name:<24} {queries:6d} buscas para {requests} requisições  {requests / elapsed:7.0f} req/s")
+    finally:
+        await app.router.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--hot-ids", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.concurrency, args.hot_ids))
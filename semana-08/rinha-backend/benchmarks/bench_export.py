@@ -0,0 +1,123 @@
+"""Export de uma tabela grande: `GET /transactions/export` (COPY) x percorrer `GET /transactions/`.
+
+Sobe o app com uvicorn num processo separado, contra o Postgres de `DATABASE_URL` (já
+migrado), insere `--rows` transações de um usuário novo e baixa todas elas de quatro jeitos:
+o export CSV, o CSV com gzip, o modo `stream=ndjson` e páginas de `list_transactions`
+seguindo o `X-Next-Cursor`. Reporta tempo, bytes recebidos e quanto o pico de memória (VmHWM)
+do servidor subiu em cada modo; os modos de memória constante rodam primeiro, porque o pico
+só cresce. As transações criadas são apagadas no final.
+
+    cd backend && python ../benchmarks/bench_export.py --rows 5000000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+import httpx  # noqa: E402
+
+from database.postgres import database  # noqa: E402
+
+SEED_USER = """
+INSERT INTO "user" (name, email, password) VALUES ('export', 'export-' || $1 || '@bench.local', 'x')
+RETURNING id
+"""
+SEED_TRANSACTIONS = """
+INSERT INTO transaction (amount, timestamp, status, "user")
+SELECT 1 + g % 100, now() - g * interval '1 second', 'completed', $2 FROM generate_series(1, $1) g
+"""
+
+
+def peak_rss_mb(pid: int) -> float:
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmHWM:"):
+            return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 30) -> None:
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        try:
+            if (await client.get("/ping")).status_code == 200:
+                return
+        except httpx.TransportError:
+            await asyncio.sleep(0.05)
+    raise TimeoutError(f"app not ready after {timeout}s")
+
+
+async def download(client: httpx.AsyncClient, url: str, params: dict) -> int:
+    received = 0
+    async with client.stream("GET", url, params=params) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_raw():
+            received += len(chunk)
+    return received
+
+
+async def paginate(client: httpx.AsyncClient, params: dict) -> int:
+    received = 0
+    cursor = None
+    while True:
+        page = {**params, "limit": 1000, **({"after": cursor} if cursor is not None else {})}
+        response = await client.get("/transactions/", params=page)
+        response.raise_for_status()
+        received += len(response.content)
+        cursor = response.headers.get("x-next-cursor")
+        if cursor is None:
+            return received
+
+
+async def main(rows: int, port: int):
+    await database.connect()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env={**os.environ, "ADMISSION_CONTROL": "false"},
+    )
+    user_id = None
+    try:
+        async with database.connection() as connection:
+            raw = connection.raw_connection
+            user_id = await raw.fetchval(SEED_USER, str(int(time.time())))
+            await raw.execute(SEED_TRANSACTIONS, rows, user_id)
+        params = {"user": user_id}
+        modes = [
+            ("export CSV (COPY)", lambda client: download(client, "/transactions/export", params)),
+            ("export CSV + gzip", lambda client: download(client, "/transactions/export", {**params, "gzip": "true"})),
+            ("stream=ndjson", lambda client: download(client, "/transactions/", {**params, "stream": "ndjson"})),
+            ("páginas de 1000", lambda client: paginate(client, params)),
+        ]
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            await wait_ready(client)
+            print(f"{rows:,} transações")
+            for name, run in modes:
+                rss_before = peak_rss_mb(server.pid)
+                started = time.perf_counter()
+                received = await run(client)
+                elapsed = time.perf_counter() - started
+                print(
+                    f"  {name:<20} {elapsed:7.1f} s  {rows / elapsed:9.0f} linhas/s  {received / 1e6:8.1f} MB"
+                    f"  pico de RSS do servidor +{peak_rss_mb(server.pid) - rss_before:6.1f} MB"
+                )
+    finally:
+        server.terminate()
+        server.wait()
+        if user_id is not None:
+            async with database.connection() as connection:
+                await connection.raw_connection.execute('DELETE FROM transaction WHERE "user" = $1', user_id)
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--port", type=int, default=8798)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.port))
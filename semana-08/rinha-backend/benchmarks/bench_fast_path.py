@@ -0,0 +1,101 @@
+"""Compara o custo de CPU por requisição do caminho ormar com o caminho rápido (asyncpg).
+
+Roda dentro do processo, chamando a camada de serviços sem HTTP e sem cache, contra o
+banco de `DATABASE_URL`. Mede `time.process_time()`, ou seja, só a CPU gasta pelo Python
+da aplicação (o trabalho do Postgres fica de fora).
+
+    cd backend && python ../benchmarks/bench_fast_path.py --requests 2000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from database import repository  # noqa: E402
+from database.postgres import database, metadata  # noqa: E402
+from database.schema import create_schema  # noqa: E402
+from services import transactions, users  # noqa: E402
+from services.cache import cache  # noqa: E402
+
+
+async def measure(name, count, operation):
+    start_cpu = time.process_time()
+    start_wall = time.perf_counter()
+    for i in range(count):
+        await operation(i)
+    cpu = time.process_time() - start_cpu
+    wall = time.perf_counter() - start_wall
+    print(f"  {name:<22} {cpu / count * 1e6:9.1f} µs CPU/req {wall / count * 1e6:9.1f} µs wall/req")
+    return cpu / count
+
+
+async def run_path(fast: bool, count: int, run_id: str):
+    repository.DB_FAST_PATH = fast
+    print("caminho rápido (asyncpg)" if fast else "caminho ormar")
+    prefix = f"bench-{run_id}-{'fast' if fast else 'ormar'}"
+
+    created_users = []
+    created_transactions = []
+
+    async def create_user(i):
+        email = f"{prefix}-{i}@bench.local"
+        created_users.append((await users.create_user({"name": "bench", "email": email, "password": "x"}))["id"])
+
+    async def get_user(i):
+        await users.get_user(created_users[i])
+
+    async def update_user(i):
+        await users.update_user(created_users[i], {"name": "bench2", "email": f"{prefix}-{i}-u@bench.local", "password": "y"})
+
+    async def create_transaction(i):
+        data = {"amount": i, "timestamp": datetime.now(timezone.utc), "status": "pending", "user": created_users[i]}
+        created_transactions.append((await transactions.create_transaction(data))["id"])
+
+    async def get_transaction(i):
+        await transactions.get_transaction(created_transactions[i])
+
+    async def delete_transaction(i):
+        await transactions.delete_transaction(created_transactions[i])
+
+    async def delete_user(i):
+        await users.delete_user(created_users[i])
+
+    results = {}
+    for name, operation in [
+        ("create user", create_user),
+        ("get user", get_user),
+        ("update user", update_user),
+        ("create transaction", create_transaction),
+        ("get transaction", get_transaction),
+        ("delete transaction", delete_transaction),
+        ("delete user", delete_user),
+    ]:
+        results[name] = await measure(name, count, operation)
+    return results
+
+
+async def main(count: int):
+    cache.client = None
+    await database.connect()
+    await create_schema(database, metadata)
+    run_id = str(int(time.time()))
+    try:
+        ormar_results = await run_path(False, count, run_id)
+        fast_results = await run_path(True, count, run_id)
+    finally:
+        await database.disconnect()
+
+    print("\nredução de CPU por requisição")
+    for name, ormar_cpu in ormar_results.items():
+        print(f"  {name:<22} {ormar_cpu / fast_results[name]:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,62 @@
+"""Mede o custo por requisição do MetricsMiddleware.
+
+Chama um app ASGI trivial diretamente (sem servidor nem HTTP), com e sem o middleware, e
+reporta a diferença de CPU por requisição. Não precisa de banco.
+
+    cd backend && python ../benchmarks/bench_metrics.py --requests 200000
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from middleware.metrics import MetricsMiddleware, Registry  # noqa: E402
+
+
+class Route:
+    path = "/users/{user_id}"
+
+
+async def app(scope, receive, send):
+    scope["route"] = Route
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def send(message):
+    pass
+
+
+async def measure(asgi_app, count: int) -> float:
+    start = time.process_time()
+    for _ in range(count):
+        await asgi_app({"type": "http", "method": "GET", "path": "/users/1"}, receive, send)
+    return (time.process_time() - start) / count
+
+
+async def main(count: int):
+    variants = {
+        "métricas": MetricsMiddleware(app, Registry("bench"), server_timing=False),
+        "métricas + Server-Timing": MetricsMiddleware(app, Registry("bench"), server_timing=True),
+    }
+    await measure(app, count // 10)  # aquecimento
+    bare = await measure(app, count)
+    print(f"  {'sem middleware':<26} {bare * 1e6:7.2f} µs CPU/req")
+    for name, instrumented in variants.items():
+        await measure(instrumented, count // 10)
+        cost = await measure(instrumented, count)
+        print(f"  {name:<26} {cost * 1e6:7.2f} µs CPU/req (+{(cost - bare) * 1e6:.2f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
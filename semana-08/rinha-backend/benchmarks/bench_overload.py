@@ -0,0 +1,82 @@
+"""Goodput sob sobrecarga, com e sem o controle de admissão.
+
+Roda o app ASGI dentro do processo (Postgres de `DATABASE_URL`, já migrado) com o gerador de
+carga de `loadgen.py` em algumas taxas acima da capacidade e conta como goodput só as
+respostas sem erro que chegaram dentro do SLO. Sem admissão as requisições se acumulam na
+espera por conexão do pool e quase tudo estoura o SLO; com admissão o excedente recebe 503
+na hora e o goodput fica perto da capacidade.
+
+    cd backend && DB_POOL_MAX_SIZE=2 python ../benchmarks/bench_overload.py --rates 100,200,300
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+# O middleware só é registrado com a admissão ligada; a rodada "sem" a desliga por dentro
+os.environ.setdefault("ADMISSION_CONTROL", "true")
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import httpx  # noqa: E402
+
+from loadgen import DEFAULT_MIX, Recorder, Workload, open_loop  # noqa: E402
+
+
+class GoodputRecorder(Recorder):
+    def __init__(self, slo: float):
+        super().__init__()
+        self.slo = slo
+        self.good = 0
+        self.rejected = 0
+
+    def record(self, name: str, latency: float, status):
+        super().record(name, latency, status)
+        if status == 503:
+            self.rejected += 1
+        elif status != "error" and status < 500 and latency <= self.slo:
+            self.good += 1
+
+
+def set_admission(admission, enabled: bool, limits: dict):
+    for limiter in (admission.read, admission.write):
+        limiter.concurrency = limits[limiter.name] if enabled else 10**9
+
+
+async def main(rates: list, duration: float, slo: float):
+    from main import app
+    from middleware.admission import admission
+
+    limits = {"read": admission.read.concurrency, "write": admission.write.concurrency}
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+            workload = Workload(DEFAULT_MIX, seed=1)
+            await workload.seed(client, 50, 200)
+            print(f"goodput = respostas sem erro em até {slo * 1e3:.0f} ms, por segundo")
+            for enabled in (False, True):
+                set_admission(admission, enabled, limits)
+                print("com admissão" if enabled else "sem admissão")
+                for rate in rates:
+                    recorder = GoodputRecorder(slo)
+                    elapsed = await open_loop(client, workload, recorder, rate, duration, max_in_flight=10_000)
+                    total = recorder.report(elapsed)["total"]
+                    print(
+                        f"  {rate:6.0f} req/s  goodput {recorder.good / elapsed:7.1f}/s  "
+                        f"503 {recorder.rejected:6d}  p99 {total['p99_ms']:8.1f} ms"
+                    )
+                    await asyncio.sleep(1)  # deixa a fila da rodada anterior escoar
+    finally:
+        set_admission(admission, True, limits)
+        await app.router.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rates", default="100,200,300", help="taxas em req/s, separadas por vírgula")
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--slo-ms", type=float, default=500)
+    args = parser.parse_args()
+    asyncio.run(main([float(rate) for rate in args.rates.split(",")], args.duration, args.slo_ms / 1000))
@@ -0,0 +1,153 @@
+"""Tabela comum x particionada por mês: latência de INSERT, de listagem por intervalo e de retenção.
+
+Cria as duas versões de `transaction` num schema temporário do banco de `DATABASE_URL`, com
+os mesmos índices do modelo, e carrega as duas em lotes de `--batch` linhas espalhadas por
+`--months` meses. Depois mede:
+
+- INSERT de uma linha no mês corrente (o caminho de `POST /transactions/`);
+- a listagem de `GET /transactions/?since=...&until=...` (uma janela de um dia), com o
+  número de partições que sobram no plano depois do pruning;
+- a retenção do mês mais antigo: DELETE linha a linha x DROP da partição.
+
+O schema é apagado no final. A carga de 50M linhas leva bastante tempo; `--rows` menor serve
+para uma checagem rápida.
+
+    cd backend && python ../benchmarks/bench_partitions.py --rows 50000000
+"""
+import argparse
+import asyncio
+import re
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from database.partitions import next_period, partition_name, periods  # noqa: E402
+from database.postgres import database  # noqa: E402
+
+SCHEMA = "bench_partitions"
+COLUMNS = """
+    id serial NOT NULL,
+    amount double precision NOT NULL,
+    "timestamp" timestamptz NOT NULL,
+    status varchar(20),
+    "user" integer
+"""
+INDEXES = (
+    'CREATE INDEX ON {table} ("user", "timestamp")',
+    'CREATE INDEX ON {table} (status, "timestamp")',
+    'CREATE INDEX ON {table} ("user", id DESC)',
+)
+# Linhas do lote espalhadas uniformemente entre $2 e $2 + $3
+LOAD = """
+INSERT INTO {table} (amount, "timestamp", status, "user")
+SELECT 1, $2::timestamptz + random() * $3::interval,
+       CASE WHEN g % 100 = 0 THEN 'failed' WHEN g % 10 = 0 THEN 'pending' ELSE 'completed' END,
+       1 + g % 1000
+FROM generate_series(1, $1) g
+"""
+INSERT_ONE = 'INSERT INTO {table} (amount, "timestamp", status, "user") VALUES (1, $1, \'pending\', 1) RETURNING id'
+LIST_RANGE = """
+SELECT id, amount, "timestamp", status FROM {table}
+WHERE "timestamp" >= $1 AND "timestamp" < $2 ORDER BY id LIMIT 100
+"""
+
+
+async def timed(raw, query: str, *args, runs: int) -> list:
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await raw.fetch(query, *args)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def summary(latencies: list) -> str:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"p50 {statistics.median(ordered) * 1e3:8.3f} ms  p99 {p99 * 1e3:8.3f} ms"
+
+
+async def create_tables(raw, start: datetime, end: datetime) -> None:
+    await raw.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    await raw.execute(f"CREATE SCHEMA {SCHEMA}")
+    await raw.execute(f"CREATE TABLE {SCHEMA}.plain ({COLUMNS}, PRIMARY KEY (id))")
+    await raw.execute(f'CREATE TABLE {SCHEMA}.parted ({COLUMNS}, PRIMARY KEY (id, "timestamp")) PARTITION BY RANGE ("timestamp")')
+    for month in periods(start, end, "month"):
+        await raw.execute(
+            f"CREATE TABLE {SCHEMA}.{partition_name(month)} PARTITION OF {SCHEMA}.parted "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_period(month, 'month').isoformat()}')"
+        )
+    for table in ("plain", "parted"):
+        for index in INDEXES:
+            await raw.execute(index.format(table=f"{SCHEMA}.{table}"))
+
+
+async def load(raw, table: str, rows: int, batch: int, start: datetime, span: timedelta) -> list:
+    latencies = []
+    loaded = 0
+    while loaded < rows:
+        size = min(batch, rows - loaded)
+        started = time.perf_counter()
+        await raw.execute(LOAD.format(table=table), size, start, span)
+        latencies.append((time.perf_counter() - started) / size)
+        loaded += size
+        print(f"\r  {table}: {loaded:>12,} linhas", end="", flush=True)
+    print()
+    await raw.execute(f"VACUUM ANALYZE {table}")
+    return latencies
+
+
+async def main(rows: int, months: int, batch: int, runs: int, keep: bool):
+    now = datetime.now(timezone.utc)
+    start = periods(now - timedelta(days=30 * (months - 1)), now, "month")[0]
+    span = now - start
+    await database.connect()
+    try:
+        async with database.connection() as connection:
+            raw = connection.raw_connection
+            await create_tables(raw, start, now)
+            print(f"{rows:,} linhas em {months} meses, lotes de {batch:,}")
+            load_latency = {}
+            for table in ("plain", "parted"):
+                load_latency[table] = await load(raw, f"{SCHEMA}.{table}", rows, batch, start, span)
+
+            window = (now - timedelta(days=15), now - timedelta(days=14))
+            for table in ("plain", "parted"):
+                name = f"{SCHEMA}.{table}"
+                print(table)
+                print(f"  carga (por linha)         {summary(load_latency[table])}")
+                print(f"  INSERT de uma linha       {summary(await timed(raw, INSERT_ONE.format(table=name), now, runs=runs))}")
+                print(f"  listagem de um dia        {summary(await timed(raw, LIST_RANGE.format(table=name), *window, runs=runs))}")
+                plan = "\n".join(row[0] for row in await raw.fetch("EXPLAIN " + LIST_RANGE.format(table=name), *window))
+                scanned = len(set(re.findall(r" on (transaction_p\d+)", plan)))
+                print(f"  partições no plano        {scanned if table == 'parted' else '-'}")
+
+            retention = {}
+            started = time.perf_counter()
+            await raw.execute(f'DELETE FROM {SCHEMA}.plain WHERE "timestamp" < $1', next_period(start, "month"))
+            retention["plain (DELETE)"] = time.perf_counter() - started
+            started = time.perf_counter()
+            await raw.execute(f"DROP TABLE {SCHEMA}.{partition_name(start)}")
+            retention["parted (DROP)"] = time.perf_counter() - started
+            print("retenção do mês mais antigo")
+            for name, seconds in retention.items():
+                print(f"  {name:<24}  {seconds * 1e3:10.0f} ms")
+            if not keep:
+                await raw.execute(f"DROP SCHEMA {SCHEMA} CASCADE")
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=50_000_000)
+    parser.add_argument("--months", type=int, default=12)
+    parser.add_argument("--batch", type=int, default=1_000_000)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--keep", action="store_true", help="não apaga o schema no final")
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.months, args.batch, args.runs, args.keep))
@@ -0,0 +1,80 @@
+"""Latência do /ping durante uma rajada de cadastros: hash no event loop x no pool de threads.
+
+Roda o app ASGI dentro do processo contra o Postgres de `DATABASE_URL` (já migrado). Um
+cliente faz `GET /ping` a cada `--ping-interval` ms enquanto `--signups` `POST /users/`
+concorrentes são disparados. Com o hash no event loop (`PASSWORD_HASH_WORKERS=0`) cada bcrypt
+trava o loop e o /ping espera junto; no pool o p99 do /ping fica perto do de repouso.
+
+    cd backend && python ../benchmarks/bench_password_hashing.py --signups 200 --rounds 12
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import httpx  # noqa: E402
+
+
+async def ping_latencies(client: httpx.AsyncClient, interval: float, stop: asyncio.Event) -> list:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get("/ping")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+def summary(latencies: list) -> str:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return f"/ping p50 {statistics.median(ordered) * 1e3:7.2f} ms  p99 {p99 * 1e3:7.2f} ms  max {ordered[-1] * 1e3:7.2f} ms"
+
+
+async def main(signups: int, rounds: int, interval: float):
+    from main import app
+    from services.passwords import hasher
+
+    hasher.rounds = rounds
+    workers = hasher.workers
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            run_id = int(time.time())
+            stop = asyncio.Event()
+            pinger = asyncio.create_task(ping_latencies(client, interval, stop))
+            await asyncio.sleep(1)
+            stop.set()
+            print(f"  {'em repouso':<28} {summary(await pinger)}")
+
+            for name, pool_workers in (("hash no event loop", 0), (f"pool de {max(workers, 1)} thread(s)", max(workers, 1))):
+                hasher.workers = pool_workers
+                # Fila grande o bastante para a rajada inteira: aqui só interessa o event loop
+                hasher.queue_size = signups
+                stop = asyncio.Event()
+                pinger = asyncio.create_task(ping_latencies(client, interval, stop))
+                started = time.perf_counter()
+                responses = await asyncio.gather(*(
+                    client.post("/users/", json={"name": "bench", "email": f"hash-{run_id}-{pool_workers}-{i}@bench.local", "password": "secret"})
+                    for i in range(signups)
+                ))
+                elapsed = time.perf_counter() - started
+                stop.set()
+                created = sum(response.status_code == 201 for response in responses)
+                print(f"  {name:<28} {summary(await pinger)}  {created} cadastros em {elapsed:5.1f} s")
+    finally:
+        await app.router.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--signups", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--ping-interval", type=float, default=10, help="ms entre dois /ping")
+    args = parser.parse_args()
+    asyncio.run(main(args.signups, args.rounds, args.ping_interval / 1000))
@@ -0,0 +1,86 @@
+"""Custo por requisição do RateLimitMiddleware.
+
+Chama um app ASGI trivial diretamente (sem servidor nem HTTP) e mede o custo por checagem com os
+buckets locais e, com `--redis-url`, contra um Redis de verdade (latência por checagem, p50/p99,
+incluindo a ida ao servidor e o script Lua). O comportamento do limite, com o script rodando no
+`fakeredis`, fica em `backend/tests/test_ratelimit.py`.
+
+    cd backend && python ../benchmarks/bench_rate_limit.py --requests 100000 --redis-url redis://localhost:6379/0
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from middleware.ratelimit import RateLimiter, RateLimitMiddleware  # noqa: E402
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+def request(ip: str) -> dict:
+    return {"type": "http", "method": "GET", "path": "/users/1", "headers": [(b"x-real-ip", ip.encode())], "client": ("172.18.0.2", 40000)}
+
+
+async def measure(asgi_app, count: int) -> float:
+    scopes = [request(ip=f"10.1.{i // 256 % 256}.{i % 256}") for i in range(1000)]
+
+    async def send(message):
+        pass
+
+    start = time.process_time()
+    for i in range(count):
+        await asgi_app(scopes[i % len(scopes)], receive, send)
+    return (time.process_time() - start) / count
+
+
+async def redis_latency(url: str, count: int) -> None:
+    import redis.asyncio as aioredis
+
+    client = aioredis.from_url(url, decode_responses=True)
+    limiter = RateLimiter(client, "1000000/1000000", "", prefix="bench:rl")
+    rule = limiter.default
+    await limiter.check(rule, "warmup")  # carrega o script (EVALSHA daí em diante)
+    samples = []
+    for i in range(count):
+        start = time.perf_counter()
+        await limiter.check(rule, f"ip:10.2.0.{i % 256}")
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    print(
+        f"  {'Redis (' + url + ')':<26} p50 {samples[len(samples) // 2] * 1e3:.3f} ms"
+        f"  p99 {samples[int(len(samples) * 0.99)] * 1e3:.3f} ms  fallbacks {limiter.fallbacks}"
+    )
+    await client.aclose()
+
+
+async def main(count: int, redis_url: str):
+    variants = {
+        "buckets locais": RateLimitMiddleware(app, RateLimiter(None, "1000000/1000000", "")),
+    }
+    await measure(app, count // 10)  # aquecimento
+    bare = await measure(app, count)
+    print(f"  {'sem middleware':<26} {bare * 1e6:7.2f} µs CPU/req")
+    for name, limited in variants.items():
+        await measure(limited, count // 10)
+        cost = await measure(limited, count)
+        print(f"  {name:<26} {cost * 1e6:7.2f} µs CPU/req (+{(cost - bare) * 1e6:.2f})")
+    if redis_url:
+        await redis_latency(redis_url, min(count, 20_000))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--redis-url", help="mede também a latência contra um Redis de verdade")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.redis_url))
@@ -0,0 +1,121 @@
+"""Compara o tempo de uma listagem de 10k transações em cada modo de resposta.
+
+Monta um app FastAPI mínimo com as três variantes da mesma rota (todas com
+`response_model=List[TransactionSchema]`) e faz as requisições dentro do processo via
+`httpx.ASGITransport`, contra o banco de `DATABASE_URL`:
+
+- `ormar`: modelos ormar devolvidos ao FastAPI (o caminho original da API);
+- `rows`: linhas do banco como dict, revalidadas pelo response_model (padrão atual);
+- `fast`: linhas do banco serializadas direto com orjson (`FAST_RESPONSES=true`).
+
+    cd backend && python ../benchmarks/bench_serialization.py --rows 10000 --requests 20
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+import httpx  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+
+from database.postgres import database, metadata  # noqa: E402
+from database.schema import create_schema  # noqa: E402
+from models.models import Transaction  # noqa: E402
+from schemas.schemas import TransactionSchema  # noqa: E402
+from services import serialization  # noqa: E402
+from services.pagination import keyset_query  # noqa: E402
+from services.transactions import TRANSACTION_COLUMNS  # noqa: E402
+
+table = Transaction.ormar_config.table
+
+
+def build_app(count: int) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ormar", response_model=List[TransactionSchema])
+    async def list_ormar():
+        return await Transaction.objects.order_by("id").limit(count).all()
+
+    async def fetch_rows():
+        rows = await database.fetch_all(keyset_query(table, TRANSACTION_COLUMNS, limit=count))
+        return [dict(row._mapping) for row in rows]
+
+    @app.get("/rows", response_model=List[TransactionSchema])
+    async def list_rows():
+        return await fetch_rows()
+
+    @app.get("/fast", response_model=List[TransactionSchema])
+    async def list_fast():
+        return serialization.respond(await fetch_rows())
+
+    return app
+
+
+async def seed(count: int):
+    """Garante ao menos `count` transações no banco; devolve os ids criados para limpeza."""
+    existing = await database.fetch_val("SELECT count(*) FROM transaction")
+    missing = count - existing
+    if missing <= 0:
+        return None
+    user_id = await database.fetch_val(
+        "INSERT INTO \"user\" (name, email, password) VALUES ('bench', :email, 'x') RETURNING id",
+        {"email": f"bench-serialization-{int(time.time())}@bench.local"},
+    )
+    start = datetime.now(timezone.utc)
+    async with database.connection() as connection:
+        await connection.raw_connection.executemany(
+            'INSERT INTO transaction (amount, "timestamp", status, "user") VALUES ($1, $2, $3, $4)',
+            [(i % 100, start + timedelta(seconds=i), "pending", user_id) for i in range(missing)],
+        )
+    print(f"{missing} transações criadas para o benchmark")
+    return user_id
+
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int, count: int):
+    response = await client.get(path)  # aquecimento
+    response.raise_for_status()
+    assert len(response.json()) == count, f"{path} devolveu {len(response.json())} linhas"
+
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.get(path)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    median = timings[len(timings) // 2]
+    print(f"  {path:<8} {median * 1e3:9.1f} ms mediana {timings[0] * 1e3:9.1f} ms mínimo")
+    return median
+
+
+async def main(count: int, requests: int):
+    serialization.FAST_RESPONSES = True
+    await database.connect()
+    await create_schema(database, metadata)
+    user_id = await seed(count)
+    try:
+        transport = httpx.ASGITransport(app=build_app(count))
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"listagem de {count} transações, {requests} requisições por modo")
+            results = {path: await measure(client, path, requests, count) for path in ("/ormar", "/rows", "/fast")}
+    finally:
+        if user_id is not None:
+            await database.execute("DELETE FROM transaction WHERE \"user\" = :user", {"user": user_id})
+            await database.execute("DELETE FROM \"user\" WHERE id = :id", {"id": user_id})
+        await database.disconnect()
+
+    print("\nganho sobre o caminho ormar")
+    for path in ("/rows", "/fast"):
+        print(f"  {path:<8} {results['/ormar'] / results[path]:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.requests))
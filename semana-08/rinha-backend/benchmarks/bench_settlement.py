@@ -0,0 +1,93 @@
+"""Vazão da liquidação com 1, 2, 4... processos `worker.py` drenando o mesmo backlog.
+
+Para cada número de workers, insere `--rows` transações "pending" no banco de `DATABASE_URL`
+(já migrado), sobe os processos e mede o tempo até o backlog zerar. Com `SKIP LOCKED` os
+workers não esperam uns pelos outros, então a vazão deve crescer quase linearmente até o
+Postgres virar o gargalo. As transações criadas são apagadas no final de cada rodada.
+
+    cd backend && python ../benchmarks/bench_settlement.py --rows 200000 --workers 1,2,4
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from database.postgres import database  # noqa: E402
+
+SEED_USER = """
+INSERT INTO "user" (name, email, password) VALUES ('settlement', 'settlement-' || $1 || '@bench.local', 'x')
+RETURNING id
+"""
+SEED_TRANSACTIONS = """
+INSERT INTO transaction (amount, timestamp, status, "user")
+SELECT 1 + g % 100, now(), 'pending', $2 FROM generate_series(1, $1) g
+"""
+BACKLOG = "SELECT count(*) FROM transaction WHERE status = 'pending'"
+
+
+async def drain(raw, workers: int, rows: int, user_id: int, concurrency: int, batch_size: int) -> float:
+    await raw.execute(SEED_TRANSACTIONS, rows, user_id)
+    env = {
+        **os.environ,
+        "SETTLEMENT_CONCURRENCY": str(concurrency),
+        "SETTLEMENT_BATCH_SIZE": str(batch_size),
+        "SETTLEMENT_IDLE_MS": "20",
+    }
+    started = time.perf_counter()
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "worker.py"],
+            cwd=BACKEND_DIR,
+            env={**env, "SETTLEMENT_METRICS_PORT": str(9200 + index)},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        for index in range(workers)
+    ]
+    try:
+        while await raw.fetchval(BACKLOG):
+            await asyncio.sleep(0.05)
+        return time.perf_counter() - started
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+        await raw.execute('DELETE FROM transaction WHERE "user" = $1', user_id)
+
+
+async def main(rows: int, workers: list, concurrency: int, batch_size: int):
+    await database.connect()
+    try:
+        async with database.connection() as connection:
+            raw = connection.raw_connection
+            if await raw.fetchval(BACKLOG):
+                sys.exit("there are pending transactions already; run against a database without backlog")
+            user_id = await raw.fetchval(SEED_USER, str(int(time.time())))
+            baseline = None
+            for count in workers:
+                elapsed = await drain(raw, count, rows, user_id, concurrency, batch_size)
+                throughput = rows / elapsed
+                baseline = baseline or throughput / count
+                print(
+                    f"  {count} worker(s) x {concurrency} loops  {elapsed:6.1f} s  {throughput:9.0f} transações/s"
+                    f"  ({throughput / (baseline * count):4.0%} do linear)"
+                )
+    finally:
+        await database.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--workers", default="1,2,4", help="números de processos, separados por vírgula")
+    parser.add_argument("--concurrency", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, [int(value) for value in args.workers.split(",")], args.concurrency, args.batch_size))
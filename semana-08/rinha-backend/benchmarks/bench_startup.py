@@ -0,0 +1,70 @@
+"""Mede o cold start: tempo do `exec` do processo até o primeiro `GET /ping` respondido.
+
+Sobe o app com uvicorn várias vezes (com e sem DDL no startup, via `RUN_MIGRATIONS`) contra
+o banco de `DATABASE_URL` e reporta a mediana. A meta é ficar pronto em menos de 1 s.
+
+    cd backend && python ../benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+TARGET_SECONDS = 1.0
+
+
+def time_to_ready(port: int, env: dict, timeout: float = 30):
+    """Devolve o tempo até o primeiro /ping e o detalhamento que o app grava em /stats/startup."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/ping", timeout=1) as response:
+                    if response.status == 200:
+                        ready = time.perf_counter() - started
+                        break
+            except OSError:
+                time.sleep(0.01)
+        else:
+            raise TimeoutError(f"app not ready after {timeout}s")
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/stats/startup", timeout=1) as response:
+            return ready, json.load(response)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(runs: int, port: int):
+    for label, migrations in (("com DDL no startup", "true"), ("sem DDL (migrate.py separado)", "false")):
+        env = {**os.environ, "RUN_MIGRATIONS": migrations}
+        results = [time_to_ready(port, env) for _ in range(runs)]
+        timings = [ready for ready, _ in results]
+        median = statistics.median(timings)
+        status = "ok" if median < TARGET_SECONDS else "acima da meta"
+        imports = statistics.median(stats["imports_ms"] for _, stats in results)
+        startup = statistics.median(stats["startup_ms"] for _, stats in results)
+        print(
+            f"  {label:<30} mediana {median * 1e3:7.0f} ms  mínimo {min(timings) * 1e3:7.0f} ms  ({status})"
+            f"  imports do app {imports:5.0f} ms  startup {startup:5.0f} ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8799)
+    args = parser.parse_args()
+    main(args.runs, args.port)
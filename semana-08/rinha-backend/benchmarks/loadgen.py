@@ -0,0 +1,359 @@
+"""Gerador de carga assíncrono (open-loop) para a API, com histogramas HDR e modo de regressão.
+
+As requisições saem numa taxa fixa (`--rate` por segundo), independente de quanto o servidor
+demora para responder, e a latência é medida a partir do instante em que cada requisição
+*deveria* ter saído. Assim um servidor lento aparece como latência alta, e não como uma
+carga menor (o problema do pool de threads do `test_suite.py`/`advanced_tests.py`).
+
+O alvo pode ser a stack do docker-compose (via Nginx) ou o app ASGI dentro do próprio
+processo, contra o Postgres de `DATABASE_URL`:
+
+    python benchmarks/loadgen.py run --url http://localhost --rate 500 --duration 30 --report atual.json
+    python benchmarks/loadgen.py run --in-process --rate 200 --duration 10 --baseline base.json
+    python benchmarks/loadgen.py compare base.json atual.json
+
+Com `--baseline` (ou no subcomando `compare`) o processo sai com código 1 quando o p99 ou o
+throughput pioram além das tolerâncias em relação ao relatório de referência.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+
+import httpx
+from hdrh.histogram import HdrHistogram
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+
+# Latências guardadas em microssegundos, de 1 µs a 60 s, com 3 dígitos significativos
+LOWEST_US = 1
+HIGHEST_US = 60_000_000
+SIGNIFICANT_FIGURES = 3
+PERCENTILES = (50, 90, 99, 99.9)
+
+DEFAULT_MIX = {
+    "get_user": 3,
+    "list_users": 1,
+    "create_user": 1,
+    "update_user": 1,
+    "get_transaction": 4,
+    "list_transactions": 2,
+    "create_transaction": 4,
+    "update_transaction": 1,
+    "delete_transaction": 1,
+}
+# Operações com menos amostras que isso ficam fora da comparação (ruído demais no p99)
+MIN_SAMPLES_TO_COMPARE = 100
+
+
+class Workload:
+    """Mix de operações de CRUD sobre /users e /transactions, com os ids criados durante o teste."""
+
+    def __init__(self, mix: dict, seed: int = None):
+        self.mix = mix
+        self.random = random.Random(seed)
+        self.run_id = int(time.time())
+        self.counter = 0
+        self.user_ids = []
+        self.transaction_ids = []
+        self.operations = {name: getattr(self, name) for name in mix}
+
+    def pick(self) -> str:
+        return self.random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+
+    def _email(self) -> str:
+        self.counter += 1
+        return f"load-{self.run_id}-{self.counter}@load.local"
+
+    def _transaction_body(self, user_id: int, status: str = "pending") -> dict:
+        return {
+            "amount": round(self.random.uniform(1, 100), 2),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "status": status,
+            "user": user_id,
+        }
+
+    async def create_user(self, client: httpx.AsyncClient):
+        response = await client.post("/users/", json={"name": "load", "email": self._email(), "password": "load"})
+        if response.status_code == 201:
+            self.user_ids.append(response.json()["id"])
+        return response
+
+    async def get_user(self, client: httpx.AsyncClient):
+        if not self.user_ids:
+            return None
+        return await client.get(f"/users/{self.random.choice(self.user_ids)}")
+
+    async def list_users(self, client: httpx.AsyncClient):
+        if not self.user_ids:
+            return None
+        return await client.get("/users/", params={"limit": 50, "after": self.random.choice(self.user_ids)})
+
+    async def update_user(self, client: httpx.AsyncClient):
+        if not self.user_ids:
+            return None
+        user_id = self.random.choice(self.user_ids)
+        return await client.put(f"/users/{user_id}", json={"name": "load2", "email": self._email(), "password": "load"})
+
+    async def create_transaction(self, client: httpx.AsyncClient):
+        if not self.user_ids:
+            return None
+        response = await client.post("/transactions/", json=self._transaction_body(self.random.choice(self.user_ids)))
+        if response.status_code == 201:
+            self.transaction_ids.append(response.json()["id"])
+        return response
+
+    async def get_transaction(self, client: httpx.AsyncClient):
+        if not self.transaction_ids:
+            return None
+        return await client.get(f"/transactions/{self.random.choice(self.transaction_ids)}")
+
+    async def list_transactions(self, client: httpx.AsyncClient):
+        if not self.user_ids:
+            return None
+        return await client.get("/transactions/", params={"user": self.random.choice(self.user_ids), "limit": 20})
+
+    async def update_transaction(self, client: httpx.AsyncClient):
+        if not self.transaction_ids or not self.user_ids:
+            return None
+        transaction_id = self.random.choice(self.transaction_ids)
+        body = self._transaction_body(self.random.choice(self.user_ids), status="completed")
+        return await client.put(f"/transactions/{transaction_id}", json=body)
+
+    async def delete_transaction(self, client: httpx.AsyncClient):
+        if not self.transaction_ids:
+            return None
+        transaction_id = self.transaction_ids.pop(self.random.randrange(len(self.transaction_ids)))
+        return await client.delete(f"/transactions/{transaction_id}")
+
+    async def seed(self, client: httpx.AsyncClient, users: int, transactions: int):
+        """Cria usuários e transações iniciais para as leituras terem o que buscar."""
+        for _ in range(users):
+            (await self.create_user(client)).raise_for_status()
+        for _ in range(transactions):
+            (await self.create_transaction(client)).raise_for_status()
+
+
+def new_histogram() -> HdrHistogram:
+    return HdrHistogram(LOWEST_US, HIGHEST_US, SIGNIFICANT_FIGURES)
+
+
+class Recorder:
+    """Histograma HDR, códigos de status e erros por operação."""
+
+    def __init__(self):
+        self.histograms = {}
+        self.statuses = {}
+        self.errors = Counter()
+        self.skipped = Counter()
+        self.dropped = 0
+
+    def record(self, name: str, latency: float, status):
+        histogram = self.histograms.setdefault(name, new_histogram())
+        histogram.record_value(min(max(int(latency * 1e6), LOWEST_US), HIGHEST_US))
+        self.statuses.setdefault(name, Counter())[str(status)] += 1
+        if status == "error" or status >= 500:
+            self.errors[name] += 1
+
+    async def execute(self, name: str, workload: Workload, client: httpx.AsyncClient, scheduled: float):
+        try:
+            response = await workload.operations[name](client)
+        except httpx.HTTPError:
+            self.record(name, time.perf_counter() - scheduled, "error")
+            return
+        if response is None:
+            self.skipped[name] += 1
+            return
+        self.record(name, time.perf_counter() - scheduled, response.status_code)
+
+    def report(self, elapsed: float) -> dict:
+        operations = {
+            name: summarize(histogram, self.statuses[name], self.errors[name], elapsed)
+            for name, histogram in sorted(self.histograms.items())
+        }
+        total = new_histogram()
+        for histogram in self.histograms.values():
+            total.add(histogram)
+        statuses = sum(self.statuses.values(), Counter())
+        summary = summarize(total, statuses, sum(self.errors.values()), elapsed)
+        summary["skipped"] = sum(self.skipped.values())
+        summary["dropped"] = self.dropped
+        return {"total": summary, "operations": operations}
+
+
+def summarize(histogram: HdrHistogram, statuses: Counter, errors: int, elapsed: float) -> dict:
+    count = histogram.get_total_count()
+    summary = {
+        "count": count,
+        "errors": errors,
+        "throughput": (count - errors) / elapsed if elapsed else 0.0,
+        "mean_ms": histogram.get_mean_value() / 1e3,
+        "max_ms": histogram.get_max_value() / 1e3,
+        "statuses": dict(statuses),
+        "histogram": histogram.encode().decode(),
+    }
+    for percentile in PERCENTILES:
+        summary[f"p{percentile:g}_ms"] = histogram.get_value_at_percentile(percentile) / 1e3
+    return summary
+
+
+async def open_loop(client: httpx.AsyncClient, workload: Workload, recorder: Recorder, rate: float, duration: float, max_in_flight: int) -> float:
+    """Dispara `rate` requisições por segundo durante `duration` segundos; devolve o tempo total."""
+    interval = 1 / rate
+    pending = set()
+    start = time.perf_counter()
+    sent = 0
+    while sent * interval < duration:
+        scheduled = start + sent * interval
+        sent += 1
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(pending) >= max_in_flight:
+            # O cliente chegou no limite: conta a requisição como descartada em vez de atrasar as próximas
+            recorder.dropped += 1
+            continue
+        task = asyncio.create_task(recorder.execute(workload.pick(), workload, client, scheduled))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+    return time.perf_counter() - start
+
+
+def compare(baseline: dict, current: dict, p99_tolerance: float, throughput_tolerance: float) -> list:
+    """Lista as regressões de p99 e throughput do relatório atual em relação ao de referência."""
+    failures = []
+    sections = [("total", baseline["total"], current["total"])]
+    for name, base in baseline["operations"].items():
+        if name in current["operations"]:
+            sections.append((name, base, current["operations"][name]))
+    for name, base, now in sections:
+        if min(base["count"], now["count"]) < MIN_SAMPLES_TO_COMPARE:
+            continue
+        if now["p99_ms"] > base["p99_ms"] * (1 + p99_tolerance):
+            failures.append(f"{name}: p99 {base['p99_ms']:.2f} ms -> {now['p99_ms']:.2f} ms")
+        if now["throughput"] < base["throughput"] * (1 - throughput_tolerance):
+            failures.append(f"{name}: throughput {base['throughput']:.1f}/s -> {now['throughput']:.1f}/s")
+    return failures
+
+
+def print_report(report: dict):
+    header = f"  {'operação':<20} {'n':>7} {'erros':>6} {'req/s':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'p99.9':>8} {'max':>8}"
+    print(header)
+    rows = list(report["operations"].items()) + [("total", report["total"])]
+    for name, stats in rows:
+        print(
+            f"  {name:<20} {stats['count']:>7} {stats['errors']:>6} {stats['throughput']:>8.1f} "
+            f"{stats['p50_ms']:>8.2f} {stats['p90_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['p99.9_ms']:>8.2f} {stats['max_ms']:>8.2f}"
+        )
+    total = report["total"]
+    print(f"  latências em ms; {total['skipped']} puladas (sem ids), {total['dropped']} descartadas (limite de requisições em voo)")
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in DEFAULT_MIX:
+            raise argparse.ArgumentTypeError(f"unknown operation {name!r}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run(args) -> dict:
+    workload = Workload(args.mix, seed=args.seed)
+    if args.in_process:
+        sys.path.insert(0, str(BACKEND_DIR))
+        from main import app
+
+        await app.router.startup()
+        transport = httpx.ASGITransport(app=app)
+        base_url = "http://loadgen"
+    else:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=args.max_in_flight))
+        base_url = args.url
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout) as client:
+            await workload.seed(client, args.seed_users, args.seed_transactions)
+            if args.warmup:
+                await open_loop(client, workload, Recorder(), args.rate, args.warmup, args.max_in_flight)
+            recorder = Recorder()
+            elapsed = await open_loop(client, workload, recorder, args.rate, args.duration, args.max_in_flight)
+    finally:
+        if args.in_process:
+            await app.router.shutdown()
+
+    report = recorder.report(elapsed)
+    report["meta"] = {
+        "target": "in-process" if args.in_process else args.url,
+        "rate": args.rate,
+        "duration": args.duration,
+        "elapsed": elapsed,
+        "mix": args.mix,
+        "started_at": datetime.now(timezone.utc).isoformat(),
+    }
+    return report
+
+
+def check_regressions(baseline_path: str, report: dict, args) -> int:
+    baseline = json.loads(Path(baseline_path).read_text())
+    failures = compare(baseline, report, args.p99_tolerance, args.throughput_tolerance)
+    if failures:
+        print("\nregressões em relação a", baseline_path)
+        for failure in failures:
+            print("  " + failure)
+        return 1
+    print(f"\nsem regressões em relação a {baseline_path}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    tolerances = argparse.ArgumentParser(add_help=False)
+    tolerances.add_argument("--p99-tolerance", type=float, default=0.10, help="aumento máximo aceito do p99 (fração)")
+    tolerances.add_argument("--throughput-tolerance", type=float, default=0.05, help="queda máxima aceita do throughput (fração)")
+
+    run_parser = commands.add_parser("run", parents=[tolerances], help="gera carga e mede")
+    target = run_parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--url", help="URL base da API (ex.: http://localhost)")
+    target.add_argument("--in-process", action="store_true", help="usa o app ASGI de backend/main.py neste processo")
+    run_parser.add_argument("--rate", type=float, default=200, help="requisições por segundo")
+    run_parser.add_argument("--duration", type=float, default=30, help="segundos de medição")
+    run_parser.add_argument("--warmup", type=float, default=5, help="segundos de aquecimento fora da medição")
+    run_parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="pesos, ex.: get_user=3,create_transaction=1")
+    run_parser.add_argument("--max-in-flight", type=int, default=1000)
+    run_parser.add_argument("--timeout", type=float, default=10)
+    run_parser.add_argument("--seed-users", type=int, default=50)
+    run_parser.add_argument("--seed-transactions", type=int, default=200)
+    run_parser.add_argument("--seed", type=int, help="semente do sorteio das operações")
+    run_parser.add_argument("--report", help="arquivo JSON para gravar o relatório")
+    run_parser.add_argument("--baseline", help="relatório de referência para checar regressões")
+
+    compare_parser = commands.add_parser("compare", parents=[tolerances], help="compara dois relatórios")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        return check_regressions(args.baseline, json.loads(Path(args.current).read_text()), args)
+
+    report = asyncio.run(run(args))
+    print(f"{report['meta']['target']}: {args.rate:g} req/s por {args.duration:g}s")
+    print_report(report)
+    if args.report:
+        Path(args.report).write_text(json.dumps(report, indent=2))
+    if args.baseline:
+        return check_regressions(args.baseline, report, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())